@@ -0,0 +1,206 @@
+"""
+Shared API dependencies
+=======================
+JWT authentication for the service routers. A token is verified once;
+its decoded claims are then served from a bounded TTL/LRU cache keyed by
+the token's SHA-256, so high-rate endpoints (IoT ingest) skip HMAC
+verification and JSON decoding on repeat calls. Logged-out tokens are
+kept in an in-memory revocation set, optionally shared through Redis.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, WebSocketException, status
+from fastapi.requests import HTTPConnection
+from jose import JWTError
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+
+REVOCATION_KEY = "auth:revoked"
+
+
+class ClaimsCache:
+    """LRU of token digest -> (claims, expires at), bounded in size and age"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key: bytes, claims: dict) -> None:
+        # Never serve claims past the token's own expiry
+        expires_at = min(time.time() + self.ttl, float(claims.get("exp", 0)))
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RevocationSet:
+    """Revoked token ids (jti) until their tokens would have expired anyway"""
+
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self._revoked[jti] = expires_at
+        if len(self._revoked) > self.PRUNE_THRESHOLD:
+            self.prune()
+
+    def update(self, entries: Dict[str, float]) -> None:
+        self._revoked.update(entries)
+
+    def prune(self) -> None:
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+
+
+claims_cache = ClaimsCache(settings.AUTH_CLAIMS_CACHE_SIZE, settings.AUTH_CLAIMS_CACHE_TTL_SECONDS)
+revoked_tokens = RevocationSet()
+
+
+def _token_from(connection: HTTPConnection) -> Optional[str]:
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token.strip()
+    if connection.scope["type"] == "websocket":
+        # Browsers cannot set headers on WebSocket handshakes
+        return connection.query_params.get("token")
+    return None
+
+
+def _unauthorized(connection: HTTPConnection, detail: str) -> Exception:
+    if connection.scope["type"] == "websocket":
+        return WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=detail)
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def verify_token(token: str) -> dict:
+    """Decoded claims of a valid, unrevoked token (raises JWTError otherwise)"""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = decode_access_token(token)
+        claims_cache.put(key, claims)
+    if claims.get("jti") in revoked_tokens:
+        raise JWTError("Token has been revoked")
+    return claims
+
+
+async def get_current_claims(connection: HTTPConnection) -> dict:
+    """Dependency: claims of the bearer token on an HTTP or WebSocket request"""
+    token = _token_from(connection)
+    if not token:
+        raise _unauthorized(connection, "Not authenticated")
+    try:
+        return verify_token(token)
+    except JWTError:
+        raise _unauthorized(connection, "Invalid or expired token")
+
+
+async def get_patient_id(claims: dict = Depends(get_current_claims)) -> str:
+    """Dependency: patient profile id of the caller (403 for staff accounts)"""
+    patient_id = claims.get("pid")
+    if not patient_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Patient profile required")
+    return patient_id
+
+
+def require_role(*roles: str):
+    """Dependency factory restricting a route to the given token roles"""
+
+    async def check(connection: HTTPConnection) -> dict:
+        claims = await get_current_claims(connection)
+        if claims.get("role") not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        return claims
+
+    return check
+
+
+def _redis():
+    import redis.asyncio as redis
+
+    return redis.from_url(settings.REDIS_URL)
+
+
+async def revoke_token(claims: dict) -> None:
+    """Revoke a token locally and, when enabled, for every worker via Redis"""
+    jti, expires_at = claims.get("jti"), float(claims.get("exp", 0))
+    if not jti:
+        return
+    revoked_tokens.add(jti, expires_at)
+    if settings.AUTH_REVOCATION_REDIS:
+        try:
+            async with _redis() as client:
+                await client.zadd(REVOCATION_KEY, {jti: expires_at})
+        except Exception as exc:
+            print(f"⚠️  Could not publish token revocation: {exc}")
+
+
+async def _sync_revocations() -> None:
+    """Periodically pull revocations made by other workers"""
+    async with _redis() as client:
+        while True:
+            try:
+                now = time.time()
+                await client.zremrangebyscore(REVOCATION_KEY, 0, now)
+                entries = await client.zrangebyscore(REVOCATION_KEY, now, "+inf", withscores=True)
+                revoked_tokens.update({jti.decode(): exp for jti, exp in entries})
+                revoked_tokens.prune()
+            except Exception as exc:
+                print(f"⚠️  Token revocation sync failed: {exc}")
+            await asyncio.sleep(settings.AUTH_REVOCATION_SYNC_SECONDS)
+
+
+_sync_task: Optional[asyncio.Task] = None
+
+
+def start_revocation_sync() -> None:
+    global _sync_task
+    if settings.AUTH_REVOCATION_REDIS and _sync_task is None:
+        _sync_task = asyncio.create_task(_sync_revocations())
+
+
+async def stop_revocation_sync() -> None:
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
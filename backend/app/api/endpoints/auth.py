@@ -2,8 +2,20 @@
 Authentication endpoints
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.deps import get_current_claims, revoke_token
+from app.core.security import (
+    create_access_token,
+    get_password_hash_async,
+    verify_and_update_password,
+    verify_dummy_password,
+)
+from app.db import users as users_db
+from app.db.session import get_db, transaction
 
 router = APIRouter()
 
@@ -36,10 +48,21 @@ async def login(data: LoginRequest):
     Login with email and password.
     Returns JWT access token.
     """
-    # TODO: Implement actual authentication with database
-    # For now, return mock response
+    async with transaction() as conn:
+        user = await users_db.get_user_by_email(conn, data.email)
+    # The pool connection is released while bcrypt runs
+    if user is None or not user["password"]:
+        # Unknown emails take as long as wrong passwords
+        await verify_dummy_password(data.password)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    valid, new_hash = await verify_and_update_password(data.password, user["password"])
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    if new_hash:
+        async with transaction() as conn:
+            await users_db.set_password_hash(conn, user["id"], new_hash)
     return TokenResponse(
-        access_token="mock_token_for_development",
+        access_token=create_access_token(user["id"], role=user["role"], patient_id=user["patient_id"]),
         token_type="bearer",
     )
 
@@ -49,28 +72,29 @@ async def register(data: RegisterRequest):
     """
     Register new user.
     """
-    # TODO: Implement actual registration with database
-    return UserResponse(
-        id="mock_id",
-        name=data.name,
-        email=data.email,
-    )
+    password_hash = await get_password_hash_async(data.password)
+    try:
+        async with transaction() as conn:
+            user = await users_db.create_patient_user(conn, data.name, data.email, password_hash)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email is already registered")
+    return UserResponse(id=user["id"], name=user["name"], email=user["email"])
 
 
 @router.post("/logout")
-async def logout():
-    """Logout current user"""
+async def logout(claims: dict = Depends(get_current_claims)):
+    """Logout current user (revokes the presented token)"""
+    await revoke_token(claims)
     return {"message": "Successfully logged out"}
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user():
+async def get_current_user(
+    claims: dict = Depends(get_current_claims),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Get current authenticated user"""
-    # TODO: Implement JWT validation
-    return UserResponse(
-        id="mock_id",
-        name="Test User",
-        email="test@example.com",
-    )
-
-
+    user = await users_db.get_user(conn, claims["sub"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return UserResponse(id=user["id"], name=user["name"] or "", email=user["email"])
@@ -9,26 +9,46 @@ Team: Nursultan (master), Damir
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+
+from app.api.deps import get_current_claims, get_patient_id, require_role
+from app.api.pagination import PageParams, ndjson_export, paginated
+from app.core.cache import cache_key, result_cache
+from app.core.catalog import catalog
+from app.core.config import settings
+from app.db import analyses as analyses_db
+from app.db.session import transaction
+from app.db.tables import new_id, utcnow
+from app.services.blood import ocr, scoring, sketches, trends
+from app.services.blood.markers import TRACKED_MARKERS
 
 router = APIRouter()
 
+SEX_PATTERN = "^(MALE|FEMALE|OTHER)$"
+
 
 class BloodMarker(BaseModel):
     name: str
     value: float
     unit: str
-    reference_min: float
-    reference_max: float
-    status: str  # "normal", "low", "high", "critical"
+    reference_min: Optional[float] = None
+    reference_max: Optional[float] = None
+    status: Optional[str] = None  # "normal", "low", "high", "critical", "unknown"
 
 
 class BloodTestInput(BaseModel):
     markers: List[BloodMarker]
     test_date: Optional[datetime] = None
     lab_name: Optional[str] = None
+    sex: Optional[str] = Field(None, pattern=SEX_PATTERN)
+    date_of_birth: Optional[date] = None
+
+
+class BloodBatchInput(BaseModel):
+    panels: List[BloodTestInput]
 
 
 class BiomarkerRisk(BaseModel):
@@ -37,20 +57,45 @@ class BiomarkerRisk(BaseModel):
     risk_level: str
     trend: str  # "improving", "stable", "worsening"
     interpretation: str
+    percentile: Optional[float] = None  # within the patient's cohort stratum
 
 
 class BloodAnalysisResult(BaseModel):
     id: str
     analyzed_at: datetime
     markers_analyzed: int
+    markers: List[BloodMarker] = []
     risk_factors: List[BiomarkerRisk]
     overall_risk: str
     neuro_markers: dict
     recommendations: List[str]
 
 
+def _analysis_result(scored: dict) -> BloodAnalysisResult:
+    return BloodAnalysisResult(
+        id=new_id(),
+        analyzed_at=utcnow(),
+        markers_analyzed=scored["markers_analyzed"],
+        markers=scored["markers"],
+        risk_factors=scored["risk_factors"],
+        overall_risk=scored["overall_risk"],
+        neuro_markers=scored["neuro_markers"],
+        recommendations=scored["recommendations"],
+    )
+
+
+def _score_panels(panels: List[BloodTestInput], patient_id: Optional[str] = None) -> List[dict]:
+    """Score panels, add them to the cohort and record the caller's markers when a patient"""
+    scored = scoring.score_panels([panel.markers for panel in panels])
+    for panel, result in zip(panels, scored):
+        sketches.record_results(result, panel.sex, sketches.age_at(panel.date_of_birth, panel.test_date))
+        if patient_id:
+            trends.record_results(patient_id, panel.test_date, result)
+    return scored
+
+
 @router.post("/analyze", response_model=BloodAnalysisResult)
-async def analyze_blood_test(data: BloodTestInput):
+async def analyze_blood_test(data: BloodTestInput, claims: dict = Depends(get_current_claims)):
     """
     Analyze blood test results using ML models.
     
@@ -60,114 +105,177 @@ async def analyze_blood_test(data: BloodTestInput):
     - Tau protein
     - Inflammatory markers
     """
-    return BloodAnalysisResult(
-        id="blood_001",
-        analyzed_at=datetime.now(),
-        markers_analyzed=len(data.markers),
-        risk_factors=[
-            BiomarkerRisk(
-                marker="NfL",
-                current_value=12.5,
-                risk_level="normal",
-                trend="stable",
-                interpretation="Уровень нейрофиламента лёгких цепей в норме",
-            ),
-        ],
-        overall_risk="low",
-        neuro_markers={
-            "nfl_level": "normal",
-            "inflammation_score": 2.3,
-            "oxidative_stress": "low",
-        },
-        recommendations=[
-            "Показатели в пределах нормы",
-            "Рекомендуется повторный анализ через 6 месяцев",
-            "Поддерживайте физическую активность",
-        ],
-    )
+    scored = await run_in_threadpool(_score_panels, [data], claims.get("pid"))
+    result = _analysis_result(scored[0])
+    if claims.get("pid"):
+        async with transaction() as conn:
+            await analyses_db.create_analysis(
+                conn,
+                claims["pid"],
+                "BLOOD",
+                result.model_dump(mode="json"),
+                analysis_id=result.id,
+                input_data={"test_date": data.test_date and data.test_date.isoformat(), "lab_name": data.lab_name},
+                risk=result.overall_risk,
+                findings=[factor.interpretation for factor in result.risk_factors],
+            )
+        await result_cache.put(cache_key("blood", claims["pid"], result.id), result.model_dump(mode="json"))
+    return result
+
+
+@router.post(
+    "/analyze/batch",
+    response_model=List[BloodAnalysisResult],
+    dependencies=[Depends(require_role("ADMIN", "DOCTOR"))],
+)
+async def analyze_blood_test_batch(data: BloodBatchInput):
+    """
+    Score many panels in one call (e.g. a lab's nightly import).
+    Results are returned in input order.
+    """
+    if len(data.panels) > settings.BLOOD_BATCH_MAX_PANELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BLOOD_BATCH_MAX_PANELS} panels per batch",
+        )
+    scored = await run_in_threadpool(_score_panels, data.panels)
+    return [_analysis_result(result) for result in scored]
 
 
 @router.post("/upload")
-async def upload_blood_test_file(file: UploadFile = File(...)):
+async def upload_blood_test_file(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    claims: dict = Depends(get_current_claims),
+):
     """
     Upload blood test results file (PDF or image).
     OCR will extract markers automatically.
     """
-    allowed_types = ["application/pdf", "image/png", "image/jpeg"]
-    if file.content_type not in allowed_types:
+    if file.content_type not in ocr.CONTENT_TYPES:
         raise HTTPException(status_code=400, detail="Invalid file type")
-    
-    # TODO: Implement OCR extraction
+
+    metadata = await run_in_threadpool(ocr.save_upload, file.filename or "", file.content_type, file.file, claims["sub"])
+    if metadata["status"] == "processing":
+        background_tasks.add_task(ocr.process_upload, metadata["upload_id"])
+        message = "File uploaded. Extracting markers..."
+    else:
+        message = "File already processed. Markers restored from cache."
     return {
-        "upload_id": "upload_001",
-        "status": "processing",
-        "message": "File uploaded. Extracting markers...",
+        "upload_id": metadata["upload_id"],
+        "status": metadata["status"],
+        "message": message,
+    }
+
+
+@router.get("/upload/{upload_id}")
+async def get_upload_status(upload_id: str, claims: dict = Depends(get_current_claims)):
+    """OCR progress and extracted markers of one of the caller's uploaded reports"""
+    try:
+        metadata = ocr.read_upload(upload_id)
+    except KeyError:
+        metadata = None
+    # Someone else's upload is indistinguishable from a missing one
+    if metadata is None or metadata.get("owner") != claims["sub"]:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {
+        "upload_id": upload_id,
+        "status": metadata["status"],
+        "pages": metadata["pages"],
+        "pages_done": metadata["pages_done"],
+        "markers": [BloodMarker(**marker) for marker in metadata["markers"]],
+        "error": metadata.get("error"),
     }
 
 
 @router.get("/history", response_model=List[BloodAnalysisResult])
-async def get_analysis_history():
-    """Get history of blood analyses"""
-    return []
+async def get_analysis_history(
+    response: Response,
+    page: PageParams = Depends(),
+    patient_id: str = Depends(get_patient_id),
+):
+    """
+    Get history of blood analyses, newest first.
+    Paginate with the X-Next-Cursor header; ``format=ndjson`` exports all.
+    """
+    if page.ndjson:
+        return ndjson_export(
+            lambda conn: analyses_db.stream_analyses(conn, patient_id, "BLOOD", page.cursor),
+            _stored_results,
+        )
+    async with transaction() as conn:
+        rows, next_cursor = await analyses_db.list_analyses(conn, patient_id, "BLOOD", page.limit, page.cursor)
+    return paginated(response, _stored_results(rows), next_cursor)
+
+
+def _stored_results(rows) -> List[dict]:
+    # Stored as the serialised BloodAnalysisResult already
+    return [row["result"] for row in rows]
 
 
 @router.get("/analysis/{analysis_id}", response_model=BloodAnalysisResult)
-async def get_analysis_result(analysis_id: str):
+async def get_analysis_result(analysis_id: str, patient_id: str = Depends(get_patient_id)):
     """Get specific blood analysis result"""
-    raise HTTPException(status_code=404, detail="Analysis not found")
+    async def load():
+        async with transaction() as conn:
+            row = await analyses_db.get_analysis(conn, analysis_id, patient_id, "BLOOD")
+        return row and row["result"]
+
+    result = await result_cache.get_or_load(cache_key("blood", patient_id, analysis_id), load)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return result
+
+
+catalog.register("blood.markers", lambda: {"markers": TRACKED_MARKERS})
 
 
 @router.get("/markers")
-async def get_tracked_markers():
+async def get_tracked_markers(request: Request):
     """Get list of tracked biomarkers and their reference ranges"""
-    return {
-        "markers": [
-            {
-                "name": "Neurofilament Light Chain (NfL)",
-                "description": "Маркер повреждения нейронов",
-                "unit": "pg/mL",
-                "reference_range": {"min": 0, "max": 20},
-                "relevance": "high",
-            },
-            {
-                "name": "Amyloid-beta 42",
-                "description": "Связан с болезнью Альцгеймера",
-                "unit": "pg/mL",
-                "reference_range": {"min": 500, "max": 1000},
-                "relevance": "high",
-            },
-            {
-                "name": "Tau protein",
-                "description": "Маркер нейродегенерации",
-                "unit": "pg/mL",
-                "reference_range": {"min": 0, "max": 400},
-                "relevance": "high",
-            },
-            {
-                "name": "C-Reactive Protein (CRP)",
-                "description": "Маркер воспаления",
-                "unit": "mg/L",
-                "reference_range": {"min": 0, "max": 3},
-                "relevance": "medium",
-            },
-            {
-                "name": "Homocysteine",
-                "description": "Связан с когнитивными нарушениями",
-                "unit": "μmol/L",
-                "reference_range": {"min": 5, "max": 15},
-                "relevance": "medium",
-            },
-        ]
-    }
+    return catalog.respond(request, "blood.markers")
 
 
 @router.get("/trends/{marker_name}")
-async def get_marker_trends(marker_name: str):
-    """Get historical trends for specific marker"""
+async def get_marker_trends(
+    marker_name: str,
+    patient_id: str = Depends(get_patient_id),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=10000),
+):
+    """Get the caller's historical trends for specific marker"""
+    key = scoring.marker_key(marker_name)
+    if not key:
+        raise HTTPException(status_code=404, detail="Marker is not tracked")
+
+    store = trends.get_store()
+    summary, data_points = await run_in_threadpool(
+        lambda: (store.summary(patient_id, key), store.history(patient_id, key, start, end, limit))
+    )
     return {
         "marker": marker_name,
-        "data_points": [],
-        "trend": "stable",
+        "patient_id": patient_id,
+        "data_points": data_points,
+        **summary,
     }
 
 
+@router.get("/percentiles/{marker_name}")
+async def get_marker_percentile(
+    marker_name: str,
+    value: Optional[float] = None,
+    sex: Optional[str] = Query(None, pattern=SEX_PATTERN),
+    age: Optional[int] = Query(None, ge=0, le=130),
+):
+    """Population quantiles of a marker and, given a value, its percentile"""
+    key = scoring.marker_key(marker_name)
+    if not key:
+        raise HTTPException(status_code=404, detail="Marker is not tracked")
+    cohort = sketches.get_sketches()
+    return {
+        "marker": marker_name,
+        "value": value,
+        "percentile": None if value is None else cohort.percentile(key, value, sex, age),
+        **cohort.describe(key, sex, age),
+    }
@@ -8,8 +8,17 @@ Team: Murat, Adilet
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Response
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.deps import get_current_claims, get_patient_id
+from app.api.pagination import PageParams, ndjson_export, paginated
+from app.core.cache import cache_key, result_cache
+from app.core.catalog import catalog
+from app.db import analyses as analyses_db
+from app.db.session import get_db, transaction
+from app.db.tables import new_id
 
 router = APIRouter()
 
@@ -25,8 +34,8 @@ class ScanAnalysisResult(BaseModel):
     scan_type: str
     status: str
     findings: List[str]
-    confidence: float
-    risk_level: str  # "low", "medium", "high"
+    confidence: Optional[float] = None
+    risk_level: Optional[str] = None  # "low", "medium", "high"; None until analysed
     recommendations: List[str]
     processing_time_ms: int
 
@@ -35,7 +44,7 @@ class ScanHistory(BaseModel):
     id: str
     scan_type: str
     date: str
-    risk_level: str
+    risk_level: Optional[str] = None
     status: str
 
 
@@ -43,6 +52,7 @@ class ScanHistory(BaseModel):
 async def analyze_scan(
     file: UploadFile = File(...),
     scan_type: str = "mri",
+    claims: dict = Depends(get_current_claims),
 ):
     """
     Upload and analyze CT/MRI scan.
@@ -58,70 +68,118 @@ async def analyze_scan(
         )
     
     # TODO: Implement actual ML model inference
-    # For now, return mock response
-    return ScanAnalysisResult(
-        id="scan_001",
+    # Until a model runs the scan is only recorded as pending: no findings,
+    # confidence or risk are made up for it
+    result = ScanAnalysisResult(
+        id=new_id(),
         scan_type=scan_type,
-        status="completed",
-        findings=[
-            "No significant abnormalities detected",
-            "Brain structure within normal parameters",
-        ],
-        confidence=0.95,
-        risk_level="low",
-        recommendations=[
-            "Continue regular health monitoring",
-            "Schedule follow-up scan in 12 months",
-        ],
-        processing_time_ms=2500,
+        status="pending",
+        findings=[],
+        recommendations=[],
+        processing_time_ms=0,
     )
+    if claims.get("pid"):
+        async with transaction() as conn:
+            await analyses_db.create_analysis(
+                conn,
+                claims["pid"],
+                "CT_MRI",
+                result.model_dump(mode="json"),
+                analysis_id=result.id,
+                input_data={"scan_type": scan_type, "filename": file.filename, "content_type": file.content_type},
+                status="PENDING",
+            )
+        await result_cache.put(cache_key("ct_mri", claims["pid"], result.id), result.model_dump(mode="json"))
+    return result
 
 
 @router.get("/history", response_model=List[ScanHistory])
-async def get_scan_history():
-    """Get history of all scans for current user"""
-    # TODO: Implement with database
-    return []
+async def get_scan_history(
+    response: Response,
+    page: PageParams = Depends(),
+    patient_id: str = Depends(get_patient_id),
+):
+    """
+    Get history of all scans for current user, newest first.
+    Paginate with the X-Next-Cursor header; ``format=ndjson`` exports all.
+    """
+    if page.ndjson:
+        return ndjson_export(
+            lambda conn: analyses_db.stream_analyses(conn, patient_id, "CT_MRI", page.cursor),
+            _scan_history,
+        )
+    async with transaction() as conn:
+        rows, next_cursor = await analyses_db.list_analyses(conn, patient_id, "CT_MRI", page.limit, page.cursor)
+    return paginated(response, _scan_history(rows), next_cursor)
+
+
+def _scan_history(rows) -> List[ScanHistory]:
+    return [
+        ScanHistory(
+            id=row["id"],
+            scan_type=(row["input_data"] or {}).get("scan_type", ""),
+            date=row["created_at"].isoformat(),
+            risk_level=(row["result"] or {}).get("risk_level"),
+            status=row["status"].lower(),
+        )
+        for row in rows
+    ]
 
 
 @router.get("/scan/{scan_id}", response_model=ScanAnalysisResult)
-async def get_scan_result(scan_id: str):
+async def get_scan_result(scan_id: str, patient_id: str = Depends(get_patient_id)):
     """Get specific scan result by ID"""
-    # TODO: Implement with database
-    raise HTTPException(status_code=404, detail="Scan not found")
+    async def load():
+        async with transaction() as conn:
+            row = await analyses_db.get_analysis(conn, scan_id, patient_id, "CT_MRI")
+        return row and row["result"]
+
+    result = await result_cache.get_or_load(cache_key("ct_mri", patient_id, scan_id), load)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return result
 
 
 @router.delete("/scan/{scan_id}")
-async def delete_scan(scan_id: str):
+async def delete_scan(
+    scan_id: str,
+    patient_id: str = Depends(get_patient_id),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Delete scan and its results"""
-    # TODO: Implement with database
+    if await analyses_db.delete_analysis(conn, scan_id, patient_id, "CT_MRI") is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    await result_cache.invalidate(cache_key("ct_mri", patient_id, scan_id))
     return {"message": "Scan deleted"}
 
 
+ANALYSIS_MODELS = [
+    {
+        "id": "brain_segmentation_v1",
+        "name": "Brain Segmentation Model",
+        "type": "segmentation",
+        "accuracy": 0.94,
+    },
+    {
+        "id": "alzheimer_detection_v1",
+        "name": "Alzheimer Detection Model",
+        "type": "classification",
+        "accuracy": 0.91,
+    },
+    {
+        "id": "tumor_detection_v1",
+        "name": "Brain Tumor Detection",
+        "type": "detection",
+        "accuracy": 0.93,
+    },
+]
+
+catalog.register("ct_mri.models", lambda: {"models": ANALYSIS_MODELS})
+
+
 @router.get("/models")
-async def get_available_models():
+async def get_available_models(request: Request):
     """Get list of available ML models for analysis"""
-    return {
-        "models": [
-            {
-                "id": "brain_segmentation_v1",
-                "name": "Brain Segmentation Model",
-                "type": "segmentation",
-                "accuracy": 0.94,
-            },
-            {
-                "id": "alzheimer_detection_v1",
-                "name": "Alzheimer Detection Model",
-                "type": "classification",
-                "accuracy": 0.91,
-            },
-            {
-                "id": "tumor_detection_v1",
-                "name": "Brain Tumor Detection",
-                "type": "detection",
-                "accuracy": 0.93,
-            },
-        ]
-    }
+    return catalog.respond(request, "ct_mri.models")
 
 
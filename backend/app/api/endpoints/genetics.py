@@ -7,13 +7,29 @@ for protein structure prediction and genetic risk assessment.
 Team: Bekzat, Kaisar
 """
 
+import gzip
+import json
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 
+from app.api.deps import get_current_claims
+from app.core.cache import cache_key, result_cache
+from app.core.catalog import accepts_encoding, catalog, etag_matches
+from app.core.config import settings
+from app.services.genetics import analysis, ingest, parsers, repeats, risk, storage, structures
+
 router = APIRouter()
 
+MAX_REGION_LENGTH = 1_000_000
+MAX_VARIANTS_PER_QUERY = 10_000
+MAX_READS_PER_SCAN = 10_000
+STRUCTURE_CHUNK_SIZE = 64 * 1024
+
 
 class GeneticSequence(BaseModel):
     id: str
@@ -23,12 +39,22 @@ class GeneticSequence(BaseModel):
     length: int
 
 
+class StructureFile(BaseModel):
+    format: str  # "pdb"
+    media_type: str
+    size_bytes: int
+    compressed_size_bytes: int
+
+
 class ProteinStructure(BaseModel):
     id: str
     sequence_id: str
-    pdb_data: Optional[str] = None  # PDB format structure
+    length: int
     confidence_score: float
     method: str  # "alphafold", "esmfold"
+    model_version: str
+    structure_url: str  # streamed, gzip-compressed structure file
+    files: List[StructureFile]
 
 
 class GeneticRiskFactor(BaseModel):
@@ -39,10 +65,40 @@ class GeneticRiskFactor(BaseModel):
     population_frequency: float
 
 
+class RepeatScanRequest(BaseModel):
+    reads: List[str]
+    motif: str = "CAG"
+    min_repeats: int = 3
+    both_strands: bool = True
+
+
+class RepeatRunResult(BaseModel):
+    read: int
+    start: int
+    end: int
+    motif: str
+    repeats: int
+
+
+class RepeatScanResult(BaseModel):
+    motif: str
+    reads_scanned: int
+    longest_repeats: List[int]  # per read
+    max_repeats: int
+    htt_classification: Optional[str] = None  # only for CAG
+    runs: List[RepeatRunResult]
+
+
+class BatchAnalysisRequest(BaseModel):
+    sequence_ids: List[str]
+
+
 class GeneticAnalysisResult(BaseModel):
     id: str
+    sequence_id: str
     submitted_at: datetime
     status: str
+    overall_risk: str
     risk_factors: List[GeneticRiskFactor]
     protein_structures: List[str]  # IDs of predicted structures
     summary: str
@@ -51,122 +107,479 @@ class GeneticAnalysisResult(BaseModel):
 
 @router.post("/sequence/upload")
 async def upload_genetic_sequence(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     sequence_type: str = "dna",
+    claims: dict = Depends(get_current_claims),
 ):
     """
     Upload genetic sequence file for analysis.
     
-    Supported formats: FASTA, GenBank, VCF
+    Supported formats: FASTA, GenBank, VCF (optionally gzip/bgzip compressed)
     """
     allowed_extensions = [".fasta", ".fa", ".gb", ".vcf"]
+    fmt = parsers.detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {allowed_extensions} (+ .gz/.bgz)"
+        )
+    
+    sequence_id = storage.new_sequence_id()
+    path = await run_in_threadpool(storage.save_upload, sequence_id, file.filename, file.file)
+    storage.write_metadata(sequence_id, {
+        "sequence_id": sequence_id,
+        "filename": file.filename,
+        "stored_as": path.name,
+        "format": fmt,
+        "sequence_type": sequence_type,
+        "uploaded_at": datetime.now().isoformat(),
+        "status": "uploaded",
+        "owner": claims["sub"],
+    })
+    background_tasks.add_task(ingest.ingest_upload, sequence_id)
     
-    # TODO: Implement file processing
     return {
-        "sequence_id": "seq_001",
+        "sequence_id": sequence_id,
         "status": "uploaded",
         "message": "Sequence uploaded successfully. Analysis in progress.",
     }
 
 
+def _check_owner(sequence_id: str, claims: dict, detail: str = "Sequence not found") -> dict:
+    """Metadata of one of the caller's uploads (404 for missing and foreign ids alike)"""
+    metadata = storage.find_metadata(sequence_id, claims["sub"])
+    if metadata is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return metadata
+
+
+@router.get("/sequence/{sequence_id}")
+async def get_sequence_status(sequence_id: str, claims: dict = Depends(get_current_claims)):
+    """Get upload parsing status, progress and summary"""
+    return _check_owner(sequence_id, claims)
+
+
+@router.get("/sequence/{sequence_id}/region", response_model=GeneticSequence)
+async def get_sequence_region(
+    sequence_id: str,
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    record: Optional[str] = None,
+    strand: str = Query("+", pattern="^[+-]$"),
+    claims: dict = Depends(get_current_claims),
+):
+    """
+    Extract a region of an uploaded DNA/RNA sequence.
+    
+    Coordinates are 0-based, end-exclusive; the minus strand returns the
+    reverse complement.
+    """
+    _check_owner(sequence_id, claims)
+    try:
+        entry, packed = storage.open_packed(sequence_id, record)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Sequence not found")
+    
+    end = len(packed) if end is None else min(end, len(packed))
+    if start > end:
+        raise HTTPException(status_code=400, detail="Invalid region")
+    if end - start > MAX_REGION_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Region too long. Maximum: {MAX_REGION_LENGTH} bases"
+        )
+    
+    if strand == "-":
+        sequence = packed.reverse_complement(start, end)
+    else:
+        sequence = packed.fetch(start, end)
+    return GeneticSequence(
+        id=f"{sequence_id}:{entry['name']}:{start}-{end}",
+        name=entry["name"],
+        sequence=sequence,
+        type="rna" if packed.rna else "dna",
+        length=len(sequence),
+    )
+
+
+@router.get("/sequence/{sequence_id}/variants")
+async def get_sequence_variants(
+    sequence_id: str,
+    chrom: str,
+    start: int = Query(..., ge=1),
+    end: int = Query(..., ge=1),
+    limit: int = Query(1000, ge=1, le=MAX_VARIANTS_PER_QUERY),
+    claims: dict = Depends(get_current_claims),
+):
+    """Get uploaded VCF variants overlapping a region (1-based, inclusive)"""
+    _check_owner(sequence_id, claims, "Variant index not found")
+    try:
+        index = storage.open_variant_index(sequence_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Variant index not found")
+    if start > end:
+        raise HTTPException(status_code=400, detail="Invalid region")
+    
+    return {
+        "sequence_id": sequence_id,
+        "region": f"{chrom}:{start}-{end}",
+        "total": index.count(chrom, start, end),
+        "variants": index.region(chrom, start, end, limit=limit),
+    }
+
+
+@router.get("/sequence/{sequence_id}/risk-variants")
+async def get_sequence_risk_variants(sequence_id: str, claims: dict = Depends(get_current_claims)):
+    """Annotate uploaded VCF variants against the local risk-variant table"""
+    _check_owner(sequence_id, claims, "Variant index not found")
+    try:
+        index = storage.open_variant_index(sequence_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Variant index not found")
+    
+    return {
+        "sequence_id": sequence_id,
+        "risk_factors": [GeneticRiskFactor(**factor) for factor in risk.annotate(index)],
+        "risk_genes": risk.gene_variant_counts(index),
+    }
+
+
+@router.post("/repeats/scan", response_model=RepeatScanResult)
+async def scan_tandem_repeats(data: RepeatScanRequest):
+    """
+    Find and size tandem repeat runs (CAG by default) across a batch of reads.
+    
+    Used for HTT CAG repeat expansion screening.
+    """
+    if len(data.reads) > MAX_READS_PER_SCAN:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many reads. Maximum: {MAX_READS_PER_SCAN}"
+        )
+    try:
+        motif = repeats.validate_motif(data.motif)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    runs = await run_in_threadpool(
+        repeats.scan_reads, data.reads, motif, data.min_repeats, data.both_strands
+    )
+    longest = repeats.longest_per_read(runs, len(data.reads))
+    max_repeats = int(longest.max()) if len(longest) else 0
+    return RepeatScanResult(
+        motif=motif,
+        reads_scanned=len(data.reads),
+        longest_repeats=longest.tolist(),
+        max_repeats=max_repeats,
+        htt_classification=repeats.classify_htt_cag(max_repeats) if motif == "CAG" else None,
+        runs=[RepeatRunResult(**run._asdict()) for run in runs],
+    )
+
+
+@router.get("/sequence/{sequence_id}/repeats", response_model=RepeatScanResult)
+async def scan_sequence_repeats(
+    sequence_id: str,
+    record: Optional[str] = None,
+    motif: str = "CAG",
+    min_repeats: int = Query(10, ge=1),
+    claims: dict = Depends(get_current_claims),
+):
+    """Scan an uploaded DNA sequence record for tandem repeat runs"""
+    _check_owner(sequence_id, claims)
+    try:
+        motif = repeats.validate_motif(motif)
+        _, packed = storage.open_packed(sequence_id, record)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Sequence not found")
+    
+    runs = await run_in_threadpool(repeats.scan_packed, packed, motif, min_repeats)
+    max_repeats = max((run.repeats for run in runs), default=0)
+    return RepeatScanResult(
+        motif=motif,
+        reads_scanned=1,
+        longest_repeats=[max_repeats],
+        max_repeats=max_repeats,
+        htt_classification=repeats.classify_htt_cag(max_repeats) if motif == "CAG" else None,
+        runs=[RepeatRunResult(**run._asdict()) for run in runs],
+    )
+
+
 @router.post("/analyze")
-async def analyze_sequence(sequence_id: str):
-    """Start genetic analysis for uploaded sequence"""
+async def analyze_sequence(
+    sequence_id: str,
+    background_tasks: BackgroundTasks,
+    claims: dict = Depends(get_current_claims),
+):
+    """Start genetic analysis for uploaded sequence (a completed one is not repeated)"""
+    metadata = _check_owner(sequence_id, claims)
+    state = metadata.get("analysis")
+    if state is None or state["status"] != "completed":
+        state = await run_in_threadpool(analysis.mark_processing, sequence_id)
+        background_tasks.add_task(analysis.run_analysis, sequence_id, claims["sub"])
     return {
-        "analysis_id": "analysis_001",
+        "analysis_id": state["id"],
         "sequence_id": sequence_id,
-        "status": "processing",
-        "estimated_time_minutes": 15,
+        "status": state["status"],
+        "estimated_time_minutes": 15 if state["status"] == "processing" else 0,
     }
 
 
+@router.post("/analyze/batch")
+async def analyze_sequence_batch(data: BatchAnalysisRequest, claims: dict = Depends(get_current_claims)):
+    """
+    Analyse many uploaded samples in parallel.
+    
+    Returns an NDJSON stream with one line per sample, in completion order.
+    A sample that fails, or is not one of the caller's uploads, is reported
+    as `"status": "failed"` without stopping the rest of the batch.
+    """
+    if not data.sequence_ids:
+        raise HTTPException(status_code=400, detail="No sequence ids given")
+    if len(data.sequence_ids) > settings.GENETICS_BATCH_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many samples. Maximum: {settings.GENETICS_BATCH_MAX_SAMPLES}"
+        )
+    
+    async def events():
+        async for event in analysis.analyze_batch(data.sequence_ids, claims["sub"]):
+            # A batch re-runs completed samples too
+            analysis_id = analysis.analysis_id(event["sequence_id"])
+            await result_cache.invalidate(cache_key("genetics", claims["sub"], analysis_id))
+            yield json.dumps(jsonable_encoder(event), ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @router.get("/analysis/{analysis_id}", response_model=GeneticAnalysisResult)
-async def get_analysis_result(analysis_id: str):
-    """Get genetic analysis result"""
-    return GeneticAnalysisResult(
-        id=analysis_id,
-        submitted_at=datetime.now(),
-        status="completed",
-        risk_factors=[
-            GeneticRiskFactor(
-                gene="APOE",
-                variant="ε4",
-                risk_level="elevated",
-                associated_conditions=["Alzheimer's disease", "Cardiovascular disease"],
-                population_frequency=0.14,
-            ),
-        ],
-        protein_structures=["struct_001"],
-        summary="Анализ выявил один вариант с повышенным риском",
-        recommendations=[
-            "Рекомендуется регулярный мониторинг когнитивных функций",
-            "Консультация с генетиком для детального обсуждения",
-            "Поддержание здорового образа жизни снижает риски",
-        ],
-    )
+async def get_analysis_result(analysis_id: str, claims: dict = Depends(get_current_claims)):
+    """Get genetic analysis result (202 while it runs)"""
+    try:
+        sequence_id = analysis.sequence_id_of(analysis_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    async def stored():
+        metadata = await run_in_threadpool(storage.find_metadata, sequence_id, claims["sub"])
+        return metadata and metadata.get("analysis")
+
+    async def completed():
+        # Running and failed states change in pool workers, so only final results are cached
+        result = await stored()
+        return result if result and result["status"] == "completed" else None
+
+    # Keyed by the caller, so a cache hit never skips the loader's owner check
+    result = await result_cache.get_or_load(cache_key("genetics", claims["sub"], analysis_id), completed)
+    if result is None:
+        result = await stored()
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if result["status"] == "processing":
+        return JSONResponse(
+            status_code=202,
+            content={"analysis_id": analysis_id, "status": "processing"},
+        )
+    if result["status"] == "failed":
+        raise HTTPException(status_code=422, detail=f"Analysis failed: {result['error']}")
+    return result
 
 
 @router.post("/protein/predict")
 async def predict_protein_structure(
     sequence: str,
-    method: str = "alphafold",
+    method: Optional[str] = None,
+    sequence_id: Optional[str] = None,
 ):
     """
     Predict protein structure from amino acid sequence.
     
-    Methods: alphafold, esmfold
+    Methods: alphafold, esmfold (those with a configured backend; the
+    first one in PROTEIN_PREDICTOR_BACKENDS by default)
+    
+    Identical requests share one job: a sequence that was already predicted
+    with the same method and model version is answered from the cache.
     """
-    if method not in ["alphafold", "esmfold"]:
-        raise HTTPException(status_code=400, detail="Invalid method")
+    scheduler = structures.get_scheduler()
+    method = method or next(iter(scheduler.predictors))
+    if method not in scheduler.predictors:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid method. Available: {list(scheduler.predictors)}",
+        )
     
-    # TODO: Implement actual prediction
+    try:
+        prediction_id, status = await scheduler.submit(sequence, method, sequence_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     return {
-        "prediction_id": "pred_001",
+        "prediction_id": prediction_id,
         "method": method,
-        "status": "processing",
-        "estimated_time_minutes": 10,
+        "status": status,
+        "estimated_time_minutes": 10 if status == "processing" else 0,
     }
 
 
 @router.get("/protein/{prediction_id}", response_model=ProteinStructure)
 async def get_protein_structure(prediction_id: str):
-    """Get predicted protein structure"""
+    """
+    Get predicted protein structure.
+    
+    Running and failed jobs are only known to the worker that runs them;
+    other workers answer 404 until the structure is stored.
+    """
+    scheduler = structures.get_scheduler()
+    status = await run_in_threadpool(scheduler.status, prediction_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    if status == "failed":
+        # The cause is in the worker's log; it may name internal hosts
+        raise HTTPException(status_code=500, detail="Structure prediction failed")
+    if status == "processing":
+        return JSONResponse(
+            status_code=202,
+            content={"prediction_id": prediction_id, "status": "processing"},
+        )
+    
+    record = await run_in_threadpool(scheduler.cache.get_record, prediction_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
     return ProteinStructure(
         id=prediction_id,
-        sequence_id="seq_001",
-        pdb_data=None,  # Would contain actual PDB data
-        confidence_score=0.89,
-        method="alphafold",
+        sequence_id=record.sequence_id or f"sha256:{record.sequence_hash[:16]}",
+        length=record.length,
+        confidence_score=record.confidence,
+        method=record.method,
+        model_version=record.model_version,
+        structure_url=f"{settings.API_V1_STR}/services/genetics/protein/{prediction_id}/structure",
+        files=[
+            StructureFile(
+                format=name,
+                media_type=structures.STRUCTURE_FORMATS[name].media_type,
+                **sizes,
+            )
+            for name, sizes in record.formats.items()
+            if name in structures.STRUCTURE_FORMATS
+        ],
+    )
+
+
+@router.get("/protein/{prediction_id}/structure")
+async def download_protein_structure(
+    prediction_id: str,
+    request: Request,
+    format: Optional[str] = None,
+):
+    """
+    Stream a predicted structure file.
+    
+    The format is chosen by `format` or the Accept header. Files are stored
+    gzip-compressed and sent as-is to clients that accept gzip (with Range
+    support); other clients get a decompressed stream.
+    """
+    fmt = format or _negotiate_structure_format(request.headers.get("accept"))
+    if fmt not in structures.STRUCTURE_FORMATS:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Unsupported format. Available: {list(structures.STRUCTURE_FORMATS)}"
+        )
+    
+    scheduler = structures.get_scheduler()
+    record = await run_in_threadpool(scheduler.cache.get_record, prediction_id)
+    if record is None or fmt not in record.formats:
+        raise HTTPException(status_code=404, detail="Structure not found")
+    
+    path = scheduler.cache.structure_path(prediction_id, fmt)
+    media_type = structures.STRUCTURE_FORMATS[fmt].media_type
+    filename = f"{prediction_id}.{fmt}"
+    headers = {
+        "Cache-Control": "private, max-age=86400, immutable",
+        "Vary": "Accept, Accept-Encoding",
+    }
+    
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        etag = f'"{prediction_id}-{fmt}-gz"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+        return FileResponse(
+            path,
+            media_type=media_type,
+            filename=filename,
+            content_disposition_type="inline",
+            headers={**headers, "ETag": etag, "Content-Encoding": "gzip"},
+        )
+    
+    etag = f'"{prediction_id}-{fmt}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+    
+    def decompressed():
+        with gzip.open(path, "rb") as f:
+            while chunk := f.read(STRUCTURE_CHUNK_SIZE):
+                yield chunk
+    
+    return StreamingResponse(
+        decompressed(),
+        media_type=media_type,
+        headers={
+            **headers,
+            "ETag": etag,
+            "Content-Length": str(record.formats[fmt]["size_bytes"]),
+            "Content-Disposition": f'inline; filename="{filename}"',
+        },
     )
 
 
-@router.get("/history")
-async def get_analysis_history():
-    """Get history of genetic analyses"""
-    return {"analyses": []}
+def _negotiate_structure_format(accept: Optional[str]) -> Optional[str]:
+    if not accept:
+        return "pdb"
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(ranked):
+        if media_type in ("*/*", "text/*", "text/plain", "chemical/*"):
+            return "pdb"
+        for fmt in structures.STRUCTURE_FORMATS.values():
+            if fmt.media_type == media_type:
+                return fmt.name
+    return None
+
+
+KNOWN_RISK_FACTORS = [
+    {
+        "gene": "APOE",
+        "description": "Apolipoprotein E - связан с риском болезни Альцгеймера",
+        "variants": ["ε2", "ε3", "ε4"],
+    },
+    {
+        "gene": "SNCA",
+        "description": "Alpha-synuclein - связан с болезнью Паркинсона",
+        "variants": ["A53T", "A30P"],
+    },
+    {
+        "gene": "HTT",
+        "description": "Huntingtin - связан с болезнью Хантингтона",
+        "variants": ["CAG repeat expansion"],
+    },
+]
+
+catalog.register("genetics.risk_factors", lambda: {"risk_factors": KNOWN_RISK_FACTORS})
 
 
 @router.get("/risk-factors")
-async def get_known_risk_factors():
+async def get_known_risk_factors(request: Request):
     """Get list of known genetic risk factors for neurodegenerative diseases"""
-    return {
-        "risk_factors": [
-            {
-                "gene": "APOE",
-                "description": "Apolipoprotein E - связан с риском болезни Альцгеймера",
-                "variants": ["ε2", "ε3", "ε4"],
-            },
-            {
-                "gene": "SNCA",
-                "description": "Alpha-synuclein - связан с болезнью Паркинсона",
-                "variants": ["A53T", "A30P"],
-            },
-            {
-                "gene": "HTT",
-                "description": "Huntingtin - связан с болезнью Хантингтона",
-                "variants": ["CAG repeat expansion"],
-            },
-        ]
-    }
+    return catalog.respond(request, "genetics.risk_factors")
 
 
@@ -1,33 +1,65 @@
 """
 Health check endpoints
+
+Every response is built from the cached results of the background
+probes in ``app.core.health``; none of these routes touches a dependency.
 """
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.cache import result_cache
+from app.core.health import monitor
+from app.db.session import pool_status
 
 router = APIRouter()
 
+SERVICES = (
+    "s1_ct_mri",
+    "s2_iot",
+    "s3_questionnaire",
+    "s4_genetics",
+    "s5_blood",
+    "s6_rehabilitation",
+)
+
 
 @router.get("")
 async def health_check():
-    """Basic health check"""
+    """Basic health check (liveness)"""
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness: 503 while this worker is saturated or cannot reach the database"""
+    ready, reasons = monitor.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "reasons": reasons},
+        headers={"Cache-Control": "no-store"},
+    )
+
+
 @router.get("/detailed")
 async def detailed_health_check():
     """Detailed health check with service status"""
+    snapshot = monitor.snapshot()
+    checks = snapshot["checks"]
+    database = checks.get("database", {}).get("status", "unknown")
+    redis = checks.get("redis", {}).get("status", "unknown")
+    ready, reasons = monitor.readiness()
     return {
-        "status": "ok",
+        "status": "ok" if database == "ok" and redis in ("ok", "disabled") else "degraded",
+        "ready": ready,
+        "not_ready_reasons": reasons,
+        **snapshot,
+        "database_pool": pool_status(),
+        "result_cache": result_cache.status(),
         "services": {
-            "database": "connected",
-            "redis": "connected",
-            "s1_ct_mri": "ready",
-            "s2_iot": "ready",
-            "s3_questionnaire": "ready",
-            "s4_genetics": "ready",
-            "s5_blood": "ready",
-            "s6_rehabilitation": "ready",
-        }
+            "database": "connected" if database == "ok" else database,
+            "redis": "connected" if redis == "ok" else redis,
+            # Every service stores its results in the database
+            **{service: "ready" if database == "ok" else "unavailable" for service in SERVICES},
+        },
     }
-
-
@@ -7,10 +7,19 @@ and nervous system monitoring.
 Team: Mukhammedzhan
 """
 
+import time
 from typing import List, Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.deps import get_current_claims, get_patient_id
+from app.core.config import settings
+from app.db import iot as iot_db
+from app.db.session import get_db, transaction
+from app.services.iot import tiering as iot_tiering
 
 router = APIRouter()
 
@@ -23,6 +32,8 @@ class PPGData(BaseModel):
     hrv_rmssd: float  # HRV RMSSD in ms
     spo2: float  # SpO2 percentage
     stress_level: float  # 0-100
+    session_id: Optional[str] = None  # store into this active session
+
 
 
 class IMUData(BaseModel):
@@ -31,6 +42,7 @@ class IMUData(BaseModel):
     acceleration: dict  # x, y, z
     gyroscope: dict  # x, y, z
     orientation: dict  # roll, pitch, yaw
+    session_id: Optional[str] = None
 
 
 class EMGData(BaseModel):
@@ -39,15 +51,16 @@ class EMGData(BaseModel):
     muscle_activity: float  # 0-100
     fatigue_index: float  # 0-100
     channel_data: List[float]
+    session_id: Optional[str] = None
 
 
 class SessionSummary(BaseModel):
     id: str
     start_time: datetime
     end_time: Optional[datetime]
-    avg_heart_rate: int
-    avg_stress_level: float
-    avg_spo2: float
+    avg_heart_rate: Optional[int] = None
+    avg_stress_level: Optional[float] = None
+    avg_spo2: Optional[float] = None
     status: str
 
 
@@ -59,38 +72,89 @@ class StressAnalysis(BaseModel):
 
 
 @router.post("/session/start")
-async def start_monitoring_session():
+async def start_monitoring_session(
+    patient_id: str = Depends(get_patient_id),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Start a new IoT monitoring session"""
+    session = await iot_db.start_session(conn, patient_id)
     return {
-        "session_id": "session_001",
+        "session_id": session["id"],
         "status": "active",
-        "started_at": datetime.now().isoformat(),
-        "websocket_url": "/api/v1/services/iot/ws/session_001",
+        "started_at": session["started_at"].isoformat(),
+        "websocket_url": f"/api/v1/services/iot/ws/{session['id']}",
     }
 
 
 @router.post("/session/{session_id}/stop")
-async def stop_monitoring_session(session_id: str):
-    """Stop an active monitoring session"""
+async def stop_monitoring_session(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    patient_id: str = Depends(get_patient_id),
+    conn: AsyncConnection = Depends(get_db),
+):
+    """Stop an active monitoring session; its readings are then compacted to cold storage"""
+    session = await iot_db.end_session(conn, session_id, patient_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Active session not found")
+    background_tasks.add_task(iot_tiering.compact_session, session_id, patient_id)
     return {
         "session_id": session_id,
         "status": "completed",
-        "duration_minutes": 30,
+        "duration_minutes": round(session["duration"] / 60, 1),
     }
 
 
 @router.get("/session/{session_id}", response_model=SessionSummary)
-async def get_session_summary(session_id: str):
-    """Get summary of a monitoring session"""
+async def get_session_summary(
+    session_id: str,
+    patient_id: str = Depends(get_patient_id),
+    conn: AsyncConnection = Depends(get_db),
+):
+    """Get summary of a monitoring session (live and compacted readings)"""
+    session = await iot_db.get_session(conn, session_id, patient_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    stats = await iot_tiering.session_stats(conn, session_id, patient_id)
     return SessionSummary(
-        id=session_id,
-        start_time=datetime.now(),
-        end_time=None,
-        avg_heart_rate=72,
-        avg_stress_level=35.5,
-        avg_spo2=98.2,
-        status="active",
+        id=session["id"],
+        start_time=session["started_at"],
+        end_time=session["ended_at"],
+        status="active" if session["ended_at"] is None else "completed",
+        **iot_tiering.averages(stats),
+    )
+
+
+@router.get("/session/{session_id}/readings")
+async def get_session_readings(
+    session_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(10000, ge=1, le=100000),
+    patient_id: str = Depends(get_patient_id),
+    conn: AsyncConnection = Depends(get_db),
+):
+    """
+    Readings of a session between ``start`` and ``end``, oldest first, as
+    columns: ``timestamp`` in epoch milliseconds plus one list per sensor
+    field (null where a reading lacks it).
+    """
+    session = await iot_db.get_session(conn, session_id, patient_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    columns = await iot_tiering.read_range(
+        conn,
+        session_id,
+        patient_id,
+        iot_tiering.naive_utc(start) if start else iot_tiering.EPOCH,
+        iot_tiering.naive_utc(end) if end else datetime.max,
+        limit,
     )
+    return JSONResponse({
+        "session_id": session_id,
+        "count": len(columns["timestamp"]),
+        **iot_tiering.columns_json(columns),
+    })
 
 
 @router.get("/stress/analysis", response_model=StressAnalysis)
@@ -108,49 +172,107 @@ async def get_stress_analysis():
     )
 
 
+async def _store_reading(data: BaseModel, claims: dict) -> bool:
+    """Store a reading posted with a ``session_id``; 404 unless that session is the caller's and active"""
+    if data.session_id is None:
+        return False
+    patient_id = claims.get("pid")
+    stored = False
+    if patient_id:
+        async with transaction() as conn:
+            stored = await iot_db.add_readings(
+                conn, data.session_id, patient_id, [iot_tiering.reading_values(data.model_dump())]
+            )
+    if not stored:
+        raise HTTPException(status_code=404, detail="Active session not found")
+    return True
+
+
 @router.post("/data/ppg")
-async def submit_ppg_data(data: PPGData):
+async def submit_ppg_data(data: PPGData, claims: dict = Depends(get_current_claims)):
     """Submit PPG sensor data"""
-    # TODO: Store and process data
-    return {"status": "received", "timestamp": data.timestamp}
+    stored = await _store_reading(data, claims)
+    return {"status": "received", "timestamp": data.timestamp, "stored": stored}
 
 
 @router.post("/data/imu")
-async def submit_imu_data(data: IMUData):
+async def submit_imu_data(data: IMUData, claims: dict = Depends(get_current_claims)):
     """Submit IMU sensor data"""
-    # TODO: Store and process data
-    return {"status": "received", "timestamp": data.timestamp}
+    stored = await _store_reading(data, claims)
+    return {"status": "received", "timestamp": data.timestamp, "stored": stored}
 
 
 @router.post("/data/emg")
-async def submit_emg_data(data: EMGData):
+async def submit_emg_data(data: EMGData, claims: dict = Depends(get_current_claims)):
     """Submit EMG sensor data"""
-    # TODO: Store and process data
-    return {"status": "received", "timestamp": data.timestamp}
+    stored = await _store_reading(data, claims)
+    return {"status": "received", "timestamp": data.timestamp, "stored": stored}
 
 
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, claims: dict = Depends(get_current_claims)):
     """
     WebSocket endpoint for real-time IoT data streaming.
     
     Send sensor data in JSON format:
     {"type": "ppg", "heart_rate": 72, "spo2": 98.5, ...}
+    
+    Readings are stored in batches of IOT_INGEST_BATCH_ROWS, or once
+    IOT_INGEST_FLUSH_SECONDS have passed since the last batch. Each reply
+    carries the session's mean stress level so far (null until one arrives).
     """
+    patient_id = claims.get("pid")
+    buffer: List[dict] = []
+    flushed_at = time.monotonic()
+
+    async def flush() -> bool:
+        """Store buffered readings; False once the session is no longer active"""
+        nonlocal buffer, flushed_at
+        batch, buffer = buffer, []
+        flushed_at = time.monotonic()
+        async with transaction() as conn:
+            return await iot_db.add_readings(conn, session_id, patient_id, batch)
+
+    # An empty flush checks that the session is the caller's and still active
+    if not patient_id or not await flush():
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Active session not found")
+        return
+    # Seeded from both tiers once, then kept up to date from the stream
+    async with transaction() as conn:
+        stress = (await iot_tiering.session_stats(conn, session_id, patient_id))["stress_level"]
+    stress_count, stress_sum = stress["count"], stress["sum"]
     await websocket.accept()
     try:
         while True:
             data = await websocket.receive_json()
-            # Process incoming sensor data
-            # TODO: Implement real-time processing
+            try:
+                values = iot_tiering.reading_values(data)
+            except (TypeError, ValueError) as exc:
+                await websocket.send_json({"status": "error", "detail": f"Invalid reading: {exc}"})
+                continue
+            buffer.append(values)
+            if "stress_level" in values:
+                stress_count += 1
+                stress_sum += values["stress_level"]
+            if (
+                len(buffer) >= settings.IOT_INGEST_BATCH_ROWS
+                or time.monotonic() - flushed_at >= settings.IOT_INGEST_FLUSH_SECONDS
+            ) and not await flush():
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Session has ended")
+                return
             
             # Send back processed results
             await websocket.send_json({
                 "status": "processed",
-                "stress_level": 35.5,
+                "stress_level": round(stress_sum / stress_count, 1) if stress_count else None,
                 "alert": None,
             })
     except WebSocketDisconnect:
         print(f"Session {session_id} disconnected")
-
-
+    finally:
+        pending = len(buffer)
+        if pending:
+            try:
+                await flush()
+            except Exception as exc:
+                print(f"⚠️  Lost {pending} readings of session {session_id}: {exc}")
@@ -0,0 +1,43 @@
+"""
+Profiling endpoints (admin only)
+
+Both act on the worker that happens to serve the request; the worker pid
+is returned so repeated calls can be matched up.
+"""
+
+import os
+import threading
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from app.core import profiling
+from app.core.config import settings
+
+router = APIRouter()
+
+
+@router.get("/cpu", response_class=PlainTextResponse)
+async def cpu_profile(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    loop_only: bool = False,
+):
+    """
+    Sample this worker's stacks for ``seconds`` and return collapsed stacks
+    (``flamegraph.pl`` / speedscope input), all threads or the event loop only.
+    """
+    thread = threading.get_ident() if loop_only else None
+    try:
+        stacks, rounds = await run_in_threadpool(profiling.sample, seconds, interval_ms / 1000, thread)
+    except profiling.ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    body = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return PlainTextResponse(body, headers={"X-Profile-Rounds": str(rounds), "X-Worker-Pid": str(os.getpid())})
+
+
+@router.get("/slow-callbacks")
+async def slow_callbacks():
+    """Recent event-loop stalls over the threshold, with route and stack"""
+    return {"pid": os.getpid(), **profiling.detector.snapshot()}
@@ -8,11 +8,23 @@ Based on: Omirai questionnaires
 Team: Mukhammedzhan
 """
 
+from collections import defaultdict
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from datetime import datetime
 
+from app.api.deps import get_current_claims, get_patient_id, require_role
+from app.api.pagination import PageParams, ndjson_export, paginated
+from app.core.cache import cache_key, result_cache
+from app.core.catalog import catalog
+from app.core.config import settings
+from app.db import questionnaires as questionnaires_db
+from app.db.session import transaction
+from app.db.tables import new_id, utcnow
+from app.services.questionnaire import scoring
+
 router = APIRouter()
 
 
@@ -44,6 +56,22 @@ class SubmissionRequest(BaseModel):
     answers: List[Answer]
 
 
+class RescoreItem(BaseModel):
+    id: str
+    answers: List[Answer]
+
+
+class RescoreRequest(BaseModel):
+    questionnaire_id: str
+    submissions: List[RescoreItem]
+
+
+class StoredRescoreRequest(BaseModel):
+    questionnaire_id: str
+    after: Optional[str] = None  # next_after of the previous page
+    limit: int = Field(1000, ge=1)
+
+
 class AnalysisResult(BaseModel):
     id: str
     questionnaire_id: str
@@ -54,122 +82,337 @@ class AnalysisResult(BaseModel):
     recommendations: List[str]
 
 
+QUESTIONNAIRES = [
+    Questionnaire(
+        id="stress_pss10",
+        title="Perceived Stress Scale (PSS-10)",
+        description="Оценка уровня воспринимаемого стресса за последний месяц",
+        category="stress",
+        estimated_time_minutes=5,
+        questions=[
+            Question(
+                id="q1",
+                text="Как часто за последний месяц вы были расстроены из-за того, что произошло что-то неожиданное?",
+                type="scale",
+                scale_min=0,
+                scale_max=4,
+            ),
+        ],
+    ),
+    Questionnaire(
+        id="cognitive_mmse",
+        title="Mini-Mental State Examination (MMSE)",
+        description="Краткая шкала оценки психического статуса",
+        category="cognitive",
+        estimated_time_minutes=10,
+        questions=[],
+    ),
+    Questionnaire(
+        id="sleep_psqi",
+        title="Pittsburgh Sleep Quality Index",
+        description="Оценка качества сна за последний месяц",
+        category="sleep",
+        estimated_time_minutes=7,
+        questions=[],
+    ),
+]
+
+
+PSS10_QUESTIONS = [
+    "Как часто за последний месяц вы были расстроены из-за того, что произошло что-то неожиданное?",
+    "Как часто за последний месяц вы чувствовали, что не можете контролировать важные вещи в своей жизни?",
+    "Как часто за последний месяц вы чувствовали нервозность и стресс?",
+    "Как часто за последний месяц вы чувствовали уверенность в своей способности справляться с личными проблемами?",
+    "Как часто за последний месяц вы чувствовали, что всё идет так, как вы хотите?",
+    "Как часто за последний месяц вы обнаруживали, что не можете справиться со всем, что нужно сделать?",
+    "Как часто за последний месяц вы могли контролировать раздражение в своей жизни?",
+    "Как часто за последний месяц вы чувствовали, что владеете ситуацией?",
+    "Как часто за последний месяц вы злились из-за того, что было вне вашего контроля?",
+    "Как часто за последний месяц вы чувствовали, что трудности накапливаются настолько, что вы не можете их преодолеть?",
+]
+
+PSQI_FREQUENCY = ["Ни разу за последний месяц", "Реже раза в неделю", "1-2 раза в неделю", "3 и более раз в неделю"]
+PSQI_QUESTIONS = [
+    ("Сколько часов в среднем вы проводили в постели за ночь?", 0, 24),
+    ("Сколько минут обычно требовалось, чтобы уснуть?", 0, 600),
+    ("Сколько часов в среднем вы действительно спали за ночь?", 0, 24),
+    ("Как часто вы не могли уснуть в течение 30 минут?", None, None),
+    ("Как часто вы просыпались среди ночи или рано утром?", None, None),
+    ("Как часто вам приходилось вставать в туалет?", None, None),
+    ("Как часто вам было трудно дышать?", None, None),
+    ("Как часто вы громко кашляли или храпели?", None, None),
+    ("Как часто вам было слишком холодно?", None, None),
+    ("Как часто вам было слишком жарко?", None, None),
+    ("Как часто вам снились плохие сны?", None, None),
+    ("Как часто у вас были боли?", None, None),
+    ("Как часто сон нарушался по другим причинам?", None, None),
+    ("Как часто вы принимали снотворные препараты?", None, None),
+    ("Как часто вам было трудно не заснуть днём (за рулём, за едой, в обществе)?", None, None),
+    ("Насколько трудно вам было сохранять энтузиазм в делах?", None, None),
+    ("Как бы вы оценили качество своего сна в целом?", None, None),
+]
+PSQI_OPTIONS = {
+    16: ["Совсем не трудно", "Немного трудно", "Довольно трудно", "Очень трудно"],
+    17: ["Очень хорошее", "Довольно хорошее", "Довольно плохое", "Очень плохое"],
+}
+
+MMSE_QUESTIONS = [
+    ("orientation_time", "Ориентировка во времени: год, время года, месяц, число, день недели", 5),
+    ("orientation_place", "Ориентировка в месте: страна, город, район, здание, этаж", 5),
+    ("registration", "Восприятие: повторение трёх слов", 3),
+    ("attention", "Концентрация внимания и счёт: серийное вычитание 7 из 100", 5),
+    ("recall", "Память: воспроизведение трёх слов", 3),
+    ("naming", "Речь: назвать два предмета (ручка, часы)", 2),
+    ("repetition", "Речь: повторить фразу", 1),
+    ("command", "Выполнение трёхэтапной команды", 3),
+    ("reading", "Чтение: прочитать и выполнить написанное", 1),
+    ("writing", "Письмо: написать предложение", 1),
+    ("copying", "Рисунок: скопировать пересекающиеся пятиугольники", 1),
+]
+
+
+def _psqi_question(number: int, text: str, scale_min: Optional[int], scale_max: Optional[int]) -> Question:
+    if scale_min is not None:
+        return Question(id=f"q{number}", text=text, type="scale", scale_min=scale_min, scale_max=scale_max)
+    return Question(
+        id=f"q{number}",
+        text=text,
+        type="multiple_choice",
+        options=PSQI_OPTIONS.get(number, PSQI_FREQUENCY),
+        scale_min=0,
+        scale_max=3,
+    )
+
+
+QUESTIONNAIRE_DETAILS = {
+    "stress_pss10": Questionnaire(
+        id="stress_pss10",
+        title="Perceived Stress Scale (PSS-10)",
+        description="Оценка уровня воспринимаемого стресса",
+        category="stress",
+        estimated_time_minutes=5,
+        questions=[
+            Question(id=f"q{number}", text=text, type="scale", scale_min=0, scale_max=4)
+            for number, text in enumerate(PSS10_QUESTIONS, start=1)
+        ],
+    ),
+    "sleep_psqi": Questionnaire(
+        id="sleep_psqi",
+        title="Pittsburgh Sleep Quality Index",
+        description="Оценка качества сна за последний месяц",
+        category="sleep",
+        estimated_time_minutes=7,
+        questions=[
+            _psqi_question(number, *question)
+            for number, question in enumerate(PSQI_QUESTIONS, start=1)
+        ],
+    ),
+    "cognitive_mmse": Questionnaire(
+        id="cognitive_mmse",
+        title="Mini-Mental State Examination (MMSE)",
+        description="Краткая шкала оценки психического статуса (заполняется специалистом)",
+        category="cognitive",
+        estimated_time_minutes=10,
+        questions=[
+            Question(id=question_id, text=text, type="scale", scale_min=0, scale_max=points)
+            for question_id, text, points in MMSE_QUESTIONS
+        ],
+    ),
+}
+
+catalog.register("questionnaire.list", lambda: QUESTIONNAIRES)
+for _questionnaire_id, _questionnaire in QUESTIONNAIRE_DETAILS.items():
+    catalog.register(f"questionnaire.{_questionnaire_id}", lambda q=_questionnaire: q)
+
+
 @router.get("/list", response_model=List[Questionnaire])
-async def get_available_questionnaires():
+async def get_available_questionnaires(request: Request):
     """Get list of available questionnaires"""
-    return [
-        Questionnaire(
-            id="stress_pss10",
-            title="Perceived Stress Scale (PSS-10)",
-            description="Оценка уровня воспринимаемого стресса за последний месяц",
-            category="stress",
-            estimated_time_minutes=5,
-            questions=[
-                Question(
-                    id="q1",
-                    text="Как часто за последний месяц вы чувствовали, что не можете контролировать важные вещи в своей жизни?",
-                    type="scale",
-                    scale_min=0,
-                    scale_max=4,
-                ),
-            ],
-        ),
-        Questionnaire(
-            id="cognitive_mmse",
-            title="Mini-Mental State Examination (MMSE)",
-            description="Краткая шкала оценки психического статуса",
-            category="cognitive",
-            estimated_time_minutes=10,
-            questions=[],
-        ),
-        Questionnaire(
-            id="sleep_psqi",
-            title="Pittsburgh Sleep Quality Index",
-            description="Оценка качества сна за последний месяц",
-            category="sleep",
-            estimated_time_minutes=7,
-            questions=[],
-        ),
-    ]
+    return catalog.respond(request, "questionnaire.list")
 
 
-@router.get("/{questionnaire_id}", response_model=Questionnaire)
-async def get_questionnaire(questionnaire_id: str):
-    """Get specific questionnaire with all questions"""
-    # TODO: Implement with database
-    if questionnaire_id == "stress_pss10":
-        return Questionnaire(
-            id="stress_pss10",
-            title="Perceived Stress Scale (PSS-10)",
-            description="Оценка уровня воспринимаемого стресса",
-            category="stress",
-            estimated_time_minutes=5,
-            questions=[
-                Question(
-                    id="q1",
-                    text="Как часто за последний месяц вы чувствовали, что не можете контролировать важные вещи в своей жизни?",
-                    type="scale",
-                    scale_min=0,
-                    scale_max=4,
-                ),
-                Question(
-                    id="q2",
-                    text="Как часто за последний месяц вы чувствовали уверенность в своей способности справляться с личными проблемами?",
-                    type="scale",
-                    scale_min=0,
-                    scale_max=4,
-                ),
-                Question(
-                    id="q3",
-                    text="Как часто за последний месяц вы чувствовали, что всё идет так, как вы хотите?",
-                    type="scale",
-                    scale_min=0,
-                    scale_max=4,
-                ),
-            ],
-        )
-    raise HTTPException(status_code=404, detail="Questionnaire not found")
+def _compiled_spec(questionnaire_id: str) -> scoring.CompiledSpec:
+    try:
+        return scoring.get_spec(questionnaire_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Questionnaire not found")
 
 
 @router.post("/submit", response_model=AnalysisResult)
-async def submit_questionnaire(submission: SubmissionRequest):
+async def submit_questionnaire(submission: SubmissionRequest, claims: dict = Depends(get_current_claims)):
     """
     Submit completed questionnaire for AI analysis.
     Returns risk assessment and personalized recommendations.
     """
-    # TODO: Implement actual AI analysis
-    return AnalysisResult(
-        id="result_001",
+    spec = _compiled_spec(submission.questionnaire_id)
+    result = spec.score([[(answer.question_id, answer.value) for answer in submission.answers]])[0]
+    if "error" in result:
+        raise HTTPException(status_code=422, detail=result["error"])
+    if not claims.get("pid"):
+        return AnalysisResult(
+            id=new_id(),
+            questionnaire_id=submission.questionnaire_id,
+            submitted_at=utcnow(),
+            **result,
+        )
+    async with transaction() as conn:
+        row = await questionnaires_db.create_result(
+            conn,
+            claims["pid"],
+            submission.questionnaire_id,
+            {answer.question_id: answer.value for answer in submission.answers},
+            result,
+        )
+    stored = AnalysisResult(
+        id=row["id"],
         questionnaire_id=submission.questionnaire_id,
-        submitted_at=datetime.now(),
-        scores={
-            "total_score": 15,
-            "stress_category": "moderate",
-            "percentile": 45,
-        },
-        risk_level="moderate",
-        insights=[
-            "Ваш уровень стресса находится в умеренном диапазоне",
-            "Выявлены потенциальные триггеры: рабочая нагрузка",
+        submitted_at=row["created_at"],
+        **result,
+    )
+    await result_cache.put(cache_key("questionnaire", claims["pid"], stored.id), stored.model_dump(mode="json"))
+    return stored
+
+
+@router.post("/rescore", dependencies=[Depends(require_role("ADMIN", "DOCTOR"))])
+async def rescore_submissions(request: RescoreRequest):
+    """
+    Score answer sets sent by the caller in one vectorised pass, e.g. to
+    re-score an export against the current norm tables. Nothing is read
+    from or written to the database (see /rescore/stored for that).
+
+    Norm tables are loaded by each worker on its first scoring call; a
+    changed QUESTIONNAIRE_NORMS_PATH takes effect after a restart (or
+    SIGHUP to ``app.serve``), which replaces every worker.
+    """
+    if len(request.submissions) > settings.QUESTIONNAIRE_RESCORE_MAX_SUBMISSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.QUESTIONNAIRE_RESCORE_MAX_SUBMISSIONS} submissions per call",
+        )
+    spec = _compiled_spec(request.questionnaire_id)
+    results = await run_in_threadpool(
+        spec.score,
+        [[(answer.question_id, answer.value) for answer in item.answers] for item in request.submissions],
+    )
+    return {
+        "questionnaire_id": request.questionnaire_id,
+        "norm_version": spec.norm.version,
+        "results": [
+            {"id": item.id, **result}
+            for item, result in zip(request.submissions, results)
         ],
-        recommendations=[
-            "Практикуйте техники релаксации (дыхательные упражнения, медитация)",
-            "Соблюдайте режим сна не менее 7-8 часов",
-            "Рекомендуется консультация с психологом",
+    }
+
+
+@router.post("/rescore/stored", dependencies=[Depends(require_role("ADMIN"))])
+async def rescore_stored_results(request: StoredRescoreRequest):
+    """
+    Re-score one page of stored results of an instrument with the current
+    spec and norms, and save the new totals, categories, percentiles and
+    advice. Pages follow result ids; repeat with ``after`` set to the
+    returned ``next_after`` until it is null.
+    """
+    if request.limit > settings.QUESTIONNAIRE_RESCORE_MAX_SUBMISSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.QUESTIONNAIRE_RESCORE_MAX_SUBMISSIONS} results per call",
+        )
+    spec = _compiled_spec(request.questionnaire_id)
+    async with transaction() as conn:
+        rows = await questionnaires_db.list_for_rescore(
+            conn, request.questionnaire_id, request.after or "", request.limit + 1
+        )
+        page = rows[:request.limit]
+        results = await run_in_threadpool(spec.score, [list(row["answers"].items()) for row in page])
+        rescored = [(row, result) for row, result in zip(page, results) if "error" not in result]
+        await questionnaires_db.update_scores(conn, [(row["id"], result) for row, result in rescored])
+    for row, _ in rescored:
+        await result_cache.invalidate(cache_key("questionnaire", row["patient_id"], row["id"]))
+    return {
+        "questionnaire_id": request.questionnaire_id,
+        "norm_version": spec.norm.version,
+        "rescored": len(rescored),
+        "failed": [
+            {"id": row["id"], "error": result["error"]}
+            for row, result in zip(page, results)
+            if "error" in result
         ],
-    )
+        "next_after": page[-1]["id"] if len(rows) > request.limit else None,
+    }
+
+
+def _stored_results(rows) -> List[AnalysisResult]:
+    """
+    Stored results with their score breakdown, recomputed from the saved
+    answers in one batch per instrument (the table keeps only the total).
+    """
+    groups = defaultdict(list)
+    for index, row in enumerate(rows):
+        groups[row["questionnaire_id"]].append(index)
+    scores: List[dict] = [{} for _ in rows]
+    for questionnaire_id, indices in groups.items():
+        if questionnaire_id not in scoring.SPECS:
+            continue
+        spec = scoring.get_spec(questionnaire_id)
+        batch = spec.score([list(rows[index]["answers"].items()) for index in indices])
+        for index, result in zip(indices, batch):
+            scores[index] = result.get("scores", {})
+    results = []
+    for row, row_scores in zip(rows, scores):
+        # The recomputed percentile follows the current norms; the stored one
+        # only stands in when the instrument can no longer be scored
+        if row["percentile"] is not None:
+            row_scores.setdefault("percentile", row["percentile"])
+        results.append(AnalysisResult(
+            id=row["id"],
+            questionnaire_id=row["questionnaire_id"],
+            submitted_at=row["created_at"],
+            scores={"total_score": row["total_score"], **row_scores},
+            risk_level=row["category"] or "",
+            insights=row["insights"],
+            recommendations=row["recommendations"],
+        ))
+    return results
 
 
 @router.get("/history", response_model=List[AnalysisResult])
-async def get_questionnaire_history():
-    """Get history of completed questionnaires"""
-    # TODO: Implement with database
-    return []
+async def get_questionnaire_history(
+    response: Response,
+    page: PageParams = Depends(),
+    patient_id: str = Depends(get_patient_id),
+):
+    """
+    Get history of completed questionnaires, newest first.
+    Paginate with the X-Next-Cursor header; ``format=ndjson`` exports all.
+    """
+    if page.ndjson:
+        return ndjson_export(
+            lambda conn: questionnaires_db.stream_results(conn, patient_id, page.cursor),
+            _stored_results,
+        )
+    async with transaction() as conn:
+        rows, next_cursor = await questionnaires_db.list_results(conn, patient_id, page.limit, page.cursor)
+    return paginated(response, _stored_results(rows), next_cursor)
 
 
 @router.get("/result/{result_id}", response_model=AnalysisResult)
-async def get_result(result_id: str):
+async def get_result(result_id: str, patient_id: str = Depends(get_patient_id)):
     """Get specific questionnaire result"""
-    raise HTTPException(status_code=404, detail="Result not found")
+    async def load():
+        async with transaction() as conn:
+            row = await questionnaires_db.get_result(conn, result_id, patient_id)
+        return row and _stored_results([row])[0].model_dump(mode="json")
 
+    result = await result_cache.get_or_load(cache_key("questionnaire", patient_id, result_id), load)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    return result
 
+
+# Registered last so the catch-all path does not shadow /history
+@router.get("/{questionnaire_id}", response_model=Questionnaire)
+async def get_questionnaire(questionnaire_id: str, request: Request):
+    """Get specific questionnaire with all questions"""
+    if questionnaire_id not in QUESTIONNAIRE_DETAILS:
+        raise HTTPException(status_code=404, detail="Questionnaire not found")
+    return catalog.respond(request, f"questionnaire.{questionnaire_id}")
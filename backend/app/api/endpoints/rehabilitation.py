@@ -8,10 +8,12 @@ Team: Murat, Adilet
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, UploadFile, File, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from datetime import datetime
 
+from app.core.catalog import catalog
+
 router = APIRouter()
 
 
@@ -56,82 +58,92 @@ class RehabProgram(BaseModel):
     exercises: List[Exercise]
 
 
+EXERCISES = [
+    Exercise(
+        id="ex_001",
+        name="Подъём руки",
+        description="Медленный подъём руки над головой",
+        category="motor",
+        difficulty="easy",
+        duration_minutes=5,
+        target_muscles=["deltoid", "trapezius"],
+        instructions=[
+            "Встаньте прямо, руки вдоль тела",
+            "Медленно поднимите правую руку над головой",
+            "Задержите на 3 секунды",
+            "Медленно опустите руку",
+            "Повторите с левой рукой",
+        ],
+    ),
+    Exercise(
+        id="ex_002",
+        name="Балансировка",
+        description="Упражнение на равновесие на одной ноге",
+        category="balance",
+        difficulty="medium",
+        duration_minutes=5,
+        target_muscles=["core", "leg muscles"],
+        instructions=[
+            "Встаньте рядом со стулом для поддержки",
+            "Поднимите одну ногу",
+            "Удерживайте баланс 30 секунд",
+            "Поменяйте ногу",
+        ],
+    ),
+    Exercise(
+        id="ex_003",
+        name="Координация рук",
+        description="Упражнение на координацию движений рук",
+        category="coordination",
+        difficulty="medium",
+        duration_minutes=10,
+        target_muscles=["arms", "shoulders"],
+        instructions=[
+            "Вытяните обе руки перед собой",
+            "Коснитесь носа правой рукой",
+            "Вернитесь в исходное положение",
+            "Повторите с левой рукой",
+        ],
+    ),
+]
+
+
+REHAB_PROGRAMS = [
+    RehabProgram(
+        id="prog_001",
+        name="Программа восстановления после инсульта",
+        description="12-недельная программа для восстановления моторных функций",
+        duration_weeks=12,
+        exercises_per_week=5,
+        target_condition="stroke",
+        exercises=[],
+    ),
+    RehabProgram(
+        id="prog_002",
+        name="Программа при болезни Паркинсона",
+        description="Упражнения для поддержания подвижности",
+        duration_weeks=0,  # Ongoing
+        exercises_per_week=4,
+        target_condition="parkinson",
+        exercises=[],
+    ),
+]
+
+
+catalog.register("rehabilitation.exercises", lambda: EXERCISES)
+catalog.register("rehabilitation.programs", lambda: REHAB_PROGRAMS)
+
+
 @router.get("/exercises", response_model=List[Exercise])
-async def get_available_exercises():
+async def get_available_exercises(request: Request):
     """Get list of available rehabilitation exercises"""
-    return [
-        Exercise(
-            id="ex_001",
-            name="Подъём руки",
-            description="Медленный подъём руки над головой",
-            category="motor",
-            difficulty="easy",
-            duration_minutes=5,
-            target_muscles=["deltoid", "trapezius"],
-            instructions=[
-                "Встаньте прямо, руки вдоль тела",
-                "Медленно поднимите правую руку над головой",
-                "Задержите на 3 секунды",
-                "Медленно опустите руку",
-                "Повторите с левой рукой",
-            ],
-        ),
-        Exercise(
-            id="ex_002",
-            name="Балансировка",
-            description="Упражнение на равновесие на одной ноге",
-            category="balance",
-            difficulty="medium",
-            duration_minutes=5,
-            target_muscles=["core", "leg muscles"],
-            instructions=[
-                "Встаньте рядом со стулом для поддержки",
-                "Поднимите одну ногу",
-                "Удерживайте баланс 30 секунд",
-                "Поменяйте ногу",
-            ],
-        ),
-        Exercise(
-            id="ex_003",
-            name="Координация рук",
-            description="Упражнение на координацию движений рук",
-            category="coordination",
-            difficulty="medium",
-            duration_minutes=10,
-            target_muscles=["arms", "shoulders"],
-            instructions=[
-                "Вытяните обе руки перед собой",
-                "Коснитесь носа правой рукой",
-                "Вернитесь в исходное положение",
-                "Повторите с левой рукой",
-            ],
-        ),
-    ]
+    return catalog.respond(request, "rehabilitation.exercises")
 
 
 @router.get("/programs", response_model=List[RehabProgram])
-async def get_rehabilitation_programs():
+async def get_rehabilitation_programs(request: Request):
     """Get available rehabilitation programs"""
-    return [
-        RehabProgram(
-            id="prog_001",
-            name="Программа восстановления после инсульта",
-            description="12-недельная программа для восстановления моторных функций",
-            duration_weeks=12,
-            exercises_per_week=5,
-            target_condition="stroke",
-            exercises=[],
-        ),
-        RehabProgram(
-            id="prog_002",
-            name="Программа при болезни Паркинсона",
-            description="Упражнения для поддержания подвижности",
-            duration_weeks=0,  # Ongoing
-            exercises_per_week=4,
-            target_condition="parkinson",
-            exercises=[],
-        ),
-    ]
+    return catalog.respond(request, "rehabilitation.programs")
 
 
 @router.post("/session/start")
@@ -3,8 +3,15 @@ User management endpoints
 """
 
 from typing import List
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel, EmailStr
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.deps import get_current_claims, require_role
+from app.api.pagination import PageParams, ndjson_export, paginated
+from app.db import users as users_db
+from app.db.session import get_db, transaction
 
 router = APIRouter()
 
@@ -21,31 +28,77 @@ class UserUpdate(BaseModel):
     email: EmailStr | None = None
 
 
+def _user_response(user) -> UserResponse:
+    return UserResponse(id=user["id"], name=user["name"] or "", email=user["email"], role=user["role"])
+
+
+def _check_access(claims: dict, user_id: str) -> None:
+    """Users may manage their own account; admins any account"""
+    if claims["sub"] != user_id and claims.get("role") != "ADMIN":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+
 @router.get("", response_model=List[UserResponse])
-async def get_users():
-    """Get all users (admin only)"""
-    # TODO: Implement with database
-    return []
+async def get_users(
+    response: Response,
+    page: PageParams = Depends(),
+    claims: dict = Depends(require_role("ADMIN")),
+):
+    """
+    Get all users, newest first (admin only).
+    Paginate with the X-Next-Cursor header; ``format=ndjson`` exports all.
+    """
+    if page.ndjson:
+        return ndjson_export(lambda conn: users_db.stream_users(conn, page.cursor), _user_responses)
+    async with transaction() as conn:
+        users, next_cursor = await users_db.list_users(conn, page.limit, page.cursor)
+    return paginated(response, _user_responses(users), next_cursor)
+
+
+def _user_responses(users) -> List[UserResponse]:
+    return [_user_response(user) for user in users]
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str):
+async def get_user(
+    user_id: str,
+    claims: dict = Depends(get_current_claims),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Get user by ID"""
-    # TODO: Implement with database
-    raise HTTPException(status_code=404, detail="User not found")
+    _check_access(claims, user_id)
+    user = await users_db.get_user(conn, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return _user_response(user)
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
-async def update_user(user_id: str, data: UserUpdate):
+async def update_user(
+    user_id: str,
+    data: UserUpdate,
+    claims: dict = Depends(get_current_claims),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Update user"""
-    # TODO: Implement with database
-    raise HTTPException(status_code=404, detail="User not found")
+    _check_access(claims, user_id)
+    try:
+        user = await users_db.update_user(conn, user_id, data.model_dump(exclude_none=True))
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Email is already registered")
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return _user_response(user)
 
 
 @router.delete("/{user_id}")
-async def delete_user(user_id: str):
+async def delete_user(
+    user_id: str,
+    claims: dict = Depends(get_current_claims),
+    conn: AsyncConnection = Depends(get_db),
+):
     """Delete user"""
-    # TODO: Implement with database
+    _check_access(claims, user_id)
+    if not await users_db.delete_user(conn, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted"}
-
-
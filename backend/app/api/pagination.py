@@ -0,0 +1,76 @@
+"""
+History pagination
+==================
+History endpoints return one keyset page as a plain JSON list and put the
+cursor of the following page in the ``X-Next-Cursor`` header (absent on
+the last page), so existing clients that ignore it keep working.
+
+``?format=ndjson`` exports everything from the cursor on instead: rows are
+read through a server-side cursor and written out in small batches as
+they arrive, so memory and time to first byte do not grow with history
+length.
+"""
+
+import json
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.pagination import decode_cursor
+from app.db.session import transaction
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_BATCH_ROWS = 200
+
+
+class PageParams:
+    """Dependency: ``limit``, ``cursor`` and ``format`` query parameters"""
+
+    def __init__(
+        self,
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+        output: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    ):
+        try:
+            self.cursor = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        self.limit = limit
+        self.ndjson = output == "ndjson"
+
+
+def paginated(response: Response, items: List[Any], next_cursor: Optional[str]) -> List[Any]:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
+
+
+def _line(item: Any) -> str:
+    if isinstance(item, BaseModel):
+        return item.model_dump_json() + "\n"
+    return json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+
+def ndjson_export(
+    rows: Callable[[AsyncConnection], AsyncIterator[RowMapping]],
+    serialize: Callable[[List[RowMapping]], List[Any]],
+) -> StreamingResponse:
+    """Stream every row as NDJSON; ``serialize`` maps a batch of rows to items"""
+
+    async def lines():
+        async with transaction() as conn:
+            batch = []
+            async for row in rows(conn):
+                batch.append(row)
+                if len(batch) >= EXPORT_BATCH_ROWS:
+                    yield "".join(_line(item) for item in serialize(batch))
+                    batch = []
+            if batch:
+                yield "".join(_line(item) for item in serialize(batch))
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
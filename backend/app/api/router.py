@@ -1,34 +1,100 @@
 """
 API Router - combines all service routers
+
+Health, auth and users are always mounted. The S1-S6 service routers are
+imported only when listed in ``settings.ENABLED_SERVICES``, so a worker
+that serves IoT ingest never loads the imaging or genetics stacks. Every
+router import is timed (with the modules it pulled in) for the startup
+report.
 """
 
-from fastapi import APIRouter
-
-from app.api.endpoints import (
-    health,
-    auth,
-    users,
-    ct_mri,
-    iot,
-    questionnaire,
-    genetics,
-    blood,
-    rehabilitation,
-)
+import importlib
+import sys
+import time
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_claims, require_role
+from app.core import metrics
+from app.core.config import settings
+
+# (module in app.api.endpoints, prefix, tag); S-numbers follow this order
+SERVICES = [
+    ("ct_mri", "/services/ct-mri", "S1: CT/MRI Analysis"),
+    ("iot", "/services/iot", "S2: IoT Monitoring"),
+    ("questionnaire", "/services/questionnaire", "S3: Questionnaire"),
+    ("genetics", "/services/genetics", "S4: Genetics"),
+    ("blood", "/services/blood", "S5: Blood Analysis"),
+    ("rehabilitation", "/services/rehabilitation", "S6: Rehabilitation"),
+]
+SERVICE_ALIASES = {f"S{number}": name for number, (name, _, _) in enumerate(SERVICES, 1)}
+
+# endpoint module -> {"seconds", "modules" (newly imported), "packages" (new third-party packages)}
+import_costs: Dict[str, dict] = {}
+
+
+def _enabled_services() -> List[str]:
+    known = [name for name, _, _ in SERVICES]
+    enabled = set()
+    for entry in settings.ENABLED_SERVICES:
+        name = SERVICE_ALIASES.get(entry.upper(), entry)
+        if name not in known:
+            raise ValueError(f"Unknown service in ENABLED_SERVICES: {entry!r} (expected one of {known} or S1-S6)")
+        enabled.add(name)
+    return [name for name in known if name in enabled]
 
+
+def _load(name: str):
+    before = set(sys.modules)
+    started = time.perf_counter()
+    module = importlib.import_module(f"app.api.endpoints.{name}")
+    elapsed = time.perf_counter() - started
+    new = set(sys.modules) - before
+    import_costs[name] = {
+        "seconds": elapsed,
+        "modules": len(new),
+        "packages": sorted(
+            package
+            for package in {module_name.split(".")[0] for module_name in new}
+            if package != "app" and not package.startswith("_") and package not in sys.stdlib_module_names
+        ),
+    }
+    return module
+
+
+def import_report() -> str:
+    """One line per router: import time, modules loaded, third-party packages first loaded by it"""
+    total = sum(cost["seconds"] for cost in import_costs.values())
+    lines = [f"📦 Router imports: {total * 1000:.0f} ms ({', '.join(enabled_services) or 'no services'})"]
+    for name, cost in sorted(import_costs.items(), key=lambda item: -item[1]["seconds"]):
+        packages = ", ".join(cost["packages"][:8]) + (" …" if len(cost["packages"]) > 8 else "")
+        lines.append(f"   {name:15} {cost['seconds'] * 1000:7.1f} ms  {cost['modules']:4} modules  {packages}")
+    return "\n".join(lines)
+
+
+enabled_services = _enabled_services()
 api_router = APIRouter()
+authenticated = [Depends(get_current_claims)]
 
 # Health & Auth
-api_router.include_router(health.router, prefix="/health", tags=["Health"])
-api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-api_router.include_router(users.router, prefix="/users", tags=["Users"])
+api_router.include_router(_load("health").router, prefix="/health", tags=["Health"])
+api_router.include_router(_load("auth").router, prefix="/auth", tags=["Authentication"])
+api_router.include_router(_load("users").router, prefix="/users", tags=["Users"], dependencies=authenticated)
 
-# AI Services
-api_router.include_router(ct_mri.router, prefix="/services/ct-mri", tags=["S1: CT/MRI Analysis"])
-api_router.include_router(iot.router, prefix="/services/iot", tags=["S2: IoT Monitoring"])
-api_router.include_router(questionnaire.router, prefix="/services/questionnaire", tags=["S3: Questionnaire"])
-api_router.include_router(genetics.router, prefix="/services/genetics", tags=["S4: Genetics"])
-api_router.include_router(blood.router, prefix="/services/blood", tags=["S5: Blood Analysis"])
-api_router.include_router(rehabilitation.router, prefix="/services/rehabilitation", tags=["S6: Rehabilitation"])
+if settings.PROFILER_ENABLED:
+    api_router.include_router(
+        _load("profiling").router, prefix="/admin/profile", tags=["Admin"], dependencies=[Depends(require_role("ADMIN"))]
+    )
 
+# AI Services
+for name, prefix, tag in SERVICES:
+    if name in enabled_services:
+        api_router.include_router(_load(name).router, prefix=prefix, tags=[tag], dependencies=authenticated)
 
+metrics.registry.collect(
+    "router_import_seconds",
+    "Startup import time of each API router module",
+    lambda: [((name,), cost["seconds"]) for name, cost in import_costs.items()],
+    labels=("router",),
+)
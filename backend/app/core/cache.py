@@ -0,0 +1,290 @@
+"""
+Result cache
+============
+Two tiers for read-heavy result endpoints that dashboards poll:
+
+- L1: a bounded in-process LRU with a short TTL, no I/O at all
+- L2: Redis when ``CACHE_REDIS`` is on, shared by every worker. Without
+  Redis there is no L2: a per-process one would keep values for
+  ``CACHE_TTL_SECONDS`` that other workers' writes never invalidate, so
+  staleness is bounded by the L1 TTL instead
+
+Concurrent misses on one key are coalesced: the first request starts the
+load as its own task and the rest await it, so a dashboard refresh storm
+costs one query. Writers call ``put`` (write-through) or ``invalidate``;
+with Redis, other workers are told over pub/sub to drop their L1 copy,
+and the short L1 TTL bounds staleness if a message is lost.
+
+Cached values must be JSON-serialisable; endpoints cache
+``model_dump(mode="json")`` dicts. ``None`` (not found) is never cached.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+KEY_PREFIX = "cache:"
+# Lets a worker skip its own invalidation messages
+ORIGIN = uuid.uuid4().hex
+
+_MISSING = object()
+
+
+class LocalCache:
+    """LRU of key -> (value, expires at), bounded in size and age"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NoStore:
+    """Empty L2 used when Redis is not configured: every L1 miss loads"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def publish(self, key: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisStore:
+    """Shared L2 tier; after an error it is skipped for a few seconds"""
+
+    RETRY_SECONDS = 5.0
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self._down_until = 0.0
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, exc: Exception) -> None:
+        if self._available():
+            print(f"⚠️  Redis cache unavailable: {exc}")
+        self._down_until = time.monotonic() + self.RETRY_SECONDS
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not self._available():
+            return None
+        try:
+            return await self.client.get(KEY_PREFIX + key)
+        except Exception as exc:
+            self._failed(exc)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if self._available():
+            try:
+                await self.client.set(KEY_PREFIX + key, value, px=int(ttl * 1000))
+            except Exception as exc:
+                self._failed(exc)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(KEY_PREFIX + key)
+        except Exception as exc:
+            self._failed(exc)
+
+    async def publish(self, key: str) -> None:
+        try:
+            await self.client.publish(INVALIDATION_CHANNEL, json.dumps({"origin": ORIGIN, "key": key}))
+        except Exception as exc:
+            self._failed(exc)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class ResultCache:
+    """L1 over L2 with single-flight loads and write-side invalidation"""
+
+    def __init__(self, local: LocalCache, store, ttl: float):
+        self.local = local
+        self.store = store
+        self.ttl = ttl
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[Any]]],
+        ttl: Optional[float] = None,
+    ) -> Optional[Any]:
+        """Cached value for ``key``, loading it once on a miss"""
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self.stats["l1_hits"] += 1
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, ttl or self.ttl))
+            self._loading[key] = task
+            task.add_done_callback(lambda done, key=key: self._loaded(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # A cancelled caller must not cancel the load the others are awaiting
+        return await asyncio.shield(task)
+
+    def _loaded(self, key: str, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            task.exception()  # retrieved even if every caller went away
+
+    async def _load(self, key: str, loader, ttl: float) -> Optional[Any]:
+        raw = await self.store.get(key)
+        if raw is not None:
+            self.stats["l2_hits"] += 1
+            value = json.loads(raw)
+        else:
+            self.stats["misses"] += 1
+            value = await loader()
+            if value is None or not self._current(key):
+                return value
+            await self.store.set(key, json.dumps(value, ensure_ascii=False).encode(), ttl)
+        if self._current(key):
+            self.local.put(key, value, ttl)
+        return value
+
+    def _current(self, key: str) -> bool:
+        """False once a write invalidated the key while this load was running"""
+        return self._loading.get(key) is asyncio.current_task()
+
+    async def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Write-through a freshly written result"""
+        ttl = ttl or self.ttl
+        self._loading.pop(key, None)
+        await self.store.set(key, json.dumps(value, ensure_ascii=False).encode(), ttl)
+        self.local.put(key, value, ttl)
+        await self.store.publish(key)
+
+    async def invalidate(self, key: str) -> None:
+        self.stats["invalidations"] += 1
+        self._loading.pop(key, None)
+        self.local.delete(key)
+        await self.store.delete(key)
+        await self.store.publish(key)
+
+    def status(self) -> dict:
+        return {"backend": type(self.store).__name__, "l1_entries": len(self.local), **self.stats}
+
+
+def cache_key(*parts: Any) -> str:
+    return ":".join(str(part) for part in parts)
+
+
+def _create_cache() -> ResultCache:
+    local = LocalCache(settings.CACHE_L1_SIZE, settings.CACHE_L1_TTL_SECONDS)
+    if settings.CACHE_REDIS:
+        store = RedisStore(settings.REDIS_URL)
+    else:
+        store = NoStore()
+    return ResultCache(local, store, settings.CACHE_TTL_SECONDS)
+
+
+result_cache = _create_cache()
+registry.collect(
+    "result_cache_events_total",
+    "Result cache lookups by outcome, and invalidations",
+    lambda: [((event,), count) for event, count in result_cache.stats.items()],
+    kind="counter",
+    labels=("event",),
+)
+registry.collect("result_cache_l1_entries", "Entries in this worker's L1", lambda: [((), len(result_cache.local))])
+
+
+async def _listen_for_invalidations() -> None:
+    """Drop L1 entries that another worker invalidated or rewrote"""
+    while True:
+        try:
+            async with result_cache.store.client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload["origin"] != ORIGIN:
+                        result_cache.local.delete(payload["key"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            print(f"⚠️  Cache invalidation listener failed: {exc}")
+            # Entries may have been missed while disconnected
+            result_cache.local.clear()
+            await asyncio.sleep(RedisStore.RETRY_SECONDS)
+
+
+_listener_task: Optional[asyncio.Task] = None
+
+
+def start_invalidation_listener() -> None:
+    global _listener_task
+    if isinstance(result_cache.store, RedisStore) and _listener_task is None:
+        _listener_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    await result_cache.store.close()
@@ -0,0 +1,153 @@
+"""
+Static catalog responses
+========================
+Catalog endpoints (exercise lists, questionnaires, marker reference
+ranges, model lists) never change while the process is running, so they
+are built once per locale, serialised to JSON, gzip-compressed and served
+as immutable bytes with a strong ETag per content-coding (the gzip body's
+tag carries a ``-gz`` suffix, so caches never mix the two).
+"""
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Pre-serialised catalog payload"""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gz"'
+
+
+class Catalog:
+    """Registry of static catalog payloads keyed by name and locale"""
+
+    def __init__(self, default_locale: str = "ru"):
+        self.default_locale = default_locale
+        self._loaders: Dict[str, Dict[str, Callable[[], Any]]] = {}
+        self._entries: Dict[Tuple[str, str], CatalogEntry] = {}
+        self._lock = Lock()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        locale: str | None = None,
+    ) -> None:
+        """Register a loader that builds the payload for a catalog name"""
+        self._loaders.setdefault(name, {})[locale or self.default_locale] = loader
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._loaders
+
+    def entry(self, name: str, locale: str | None = None) -> CatalogEntry:
+        """Get (building on first use) the serialised entry for a locale"""
+        locales = self._loaders[name]
+        if locale not in locales:
+            locale = self.default_locale
+        key = (name, locale)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _build_entry(locales[locale]())
+                    self._entries[key] = entry
+        return entry
+
+    def respond(self, request: Request, name: str) -> Response:
+        """Answer a catalog request, honouring If-None-Match and gzip"""
+        if name not in self._loaders:
+            raise HTTPException(status_code=404, detail="Not found")
+
+        locale = _preferred_locale(request, self._loaders[name].keys())
+        entry = self.entry(name, locale)
+        gzipped = accepts_encoding(request.headers.get("accept-encoding"), "gzip")
+        headers = {
+            "ETag": entry.gzip_etag if gzipped else entry.etag,
+            "Cache-Control": f"public, max-age={settings.CATALOG_MAX_AGE_SECONDS}",
+            "Vary": "Accept-Encoding, Accept-Language",
+        }
+
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(entry.gzip_body, media_type="application/json", headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def _build_entry(payload: Any) -> CatalogEntry:
+    body = json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return CatalogEntry(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+        etag=f'"{digest}"',
+    )
+
+
+def _preferred_locale(request: Request, available) -> str | None:
+    header = request.headers.get("accept-language")
+    if not header:
+        return None
+    for part in header.split(","):
+        tag = part.split(";")[0].strip().lower()
+        for candidate in (tag, tag.split("-")[0]):
+            if candidate in available:
+                return candidate
+    return None
+
+
+def accepts_encoding(header: str | None, coding: str) -> bool:
+    """Whether an Accept-Encoding header allows ``coding`` (q-values honoured, ``gzip;q=0`` refuses)"""
+    if not header:
+        return False
+    wildcard = None
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return bool(wildcard)
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header (``*`` or a list, weak tags included) names ``etag``"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+catalog = Catalog()
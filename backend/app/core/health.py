@@ -0,0 +1,214 @@
+"""
+Health probes
+=============
+The database, Redis and the model registry are probed by a background
+task every ``HEALTH_PROBE_INTERVAL_SECONDS`` and the results cached, so
+health endpoints answer from memory and load-balancer probe traffic never
+reaches the database.
+
+Readiness combines the last probe with saturation signals of this
+worker: event-loop lag (sampled by a sleeper task), the depth of
+registered job queues, and the worst pool checkout wait since the last
+probe. Past a threshold the worker reports not-ready until the next probe
+sees it recover, so the proxy can route around it.
+"""
+
+import asyncio
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.core import model_store
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db import session as db
+
+# name -> (current depth, capacity or None)
+_queues: Dict[str, Tuple[Callable[[], int], Optional[int]]] = {}
+
+
+def register_queue(name: str, depth: Callable[[], int], capacity: Optional[int] = None) -> None:
+    """Report a job queue in health checks and metrics, and count it towards readiness"""
+    _queues[name] = (depth, capacity)
+
+
+def queue_depths() -> Dict[str, dict]:
+    return {name: {"depth": depth(), "capacity": capacity} for name, (depth, capacity) in _queues.items()}
+
+
+registry.collect(
+    "job_queue_depth",
+    "Jobs queued or running per registered queue",
+    lambda: [((name,), depth()) for name, (depth, _) in _queues.items()],
+    labels=("queue",),
+)
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late a periodic sleeper woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class LoopLagMonitor:
+    """How late a periodic sleeper wakes up: time the loop spent blocked"""
+
+    def __init__(self, interval: float, window: int = 20):
+        self.interval = interval
+        self.last = 0.0
+        self.peak = 0.0
+        self._recent = deque(maxlen=window)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - expected, 0.0))
+
+    def record(self, lag: float) -> None:
+        self.last = lag
+        self.peak = max(self.peak, lag)
+        self._recent.append(lag)
+        LOOP_LAG.observe(lag)
+
+    @property
+    def recent_max(self) -> float:
+        return max(self._recent, default=0.0)
+
+    def snapshot(self) -> dict:
+        return {
+            "last_ms": round(1000 * self.last, 3),
+            "recent_max_ms": round(1000 * self.recent_max, 3),
+            "peak_ms": round(1000 * self.peak, 3),
+        }
+
+
+# A probe that outlives its timeout keeps running (it may be mid-reconnect)
+# and is awaited again by the next round instead of being started twice
+_running: Dict[Callable, asyncio.Task] = {}
+
+
+async def _timed(probe: Callable) -> dict:
+    started = time.perf_counter()
+    task = _running.get(probe)
+    if task is None or task.done():
+        task = _running[probe] = asyncio.create_task(probe())
+    try:
+        result = dict(await asyncio.wait_for(asyncio.shield(task), settings.HEALTH_PROBE_TIMEOUT_SECONDS))
+    except asyncio.TimeoutError:
+        result = {"status": "unavailable", "error": "probe timed out"}
+    except Exception as exc:
+        result = {"status": "unavailable", "error": str(exc) or type(exc).__name__}
+    result["latency_ms"] = round(1000 * (time.perf_counter() - started), 3)
+    return result
+
+
+async def _probe_database() -> dict:
+    async with db.transaction() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {"status": "ok"}
+
+
+async def _probe_redis() -> dict:
+    if not (settings.CACHE_REDIS or settings.AUTH_REVOCATION_REDIS):
+        return {"status": "disabled"}
+    import redis.asyncio as redis
+
+    async with redis.from_url(settings.REDIS_URL) as client:
+        await client.ping()
+    return {"status": "ok"}
+
+
+def _model_registry() -> dict:
+    path = Path(settings.MODEL_PATH)
+    files = sum(1 for entry in path.rglob("*") if entry.is_file()) if path.is_dir() else 0
+    loaded = model_store.loaded()
+    return {
+        "status": "ok" if path.is_dir() else "missing",
+        "path": str(path),
+        "files": files,
+        "loaded": len(loaded),
+        "loaded_bytes": sum(loaded.values()),
+        "predictors": {
+            method: {"backend": backend, "version": settings.PROTEIN_MODEL_VERSIONS.get(method)}
+            for method, backend in settings.PROTEIN_PREDICTOR_BACKENDS.items()
+        },
+    }
+
+
+async def _probe_models() -> dict:
+    return await run_in_threadpool(_model_registry)
+
+
+class HealthMonitor:
+    """Background probes and readiness evaluation for one worker"""
+
+    def __init__(self):
+        self.loop_lag = LoopLagMonitor(settings.HEALTH_LOOP_LAG_SAMPLE_SECONDS)
+        self.checks: Dict[str, dict] = {}
+        self.pool_wait = {"max_wait": 0.0, "timeouts": 0}
+        self.checked_at: Optional[float] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def probe(self) -> None:
+        database, redis, models = await asyncio.gather(
+            _timed(_probe_database), _timed(_probe_redis), _timed(_probe_models)
+        )
+        self.checks = {"database": database, "redis": redis, "models": models}
+        self.pool_wait = db.metrics.take_interval()
+        self.checked_at = time.time()
+
+    async def _probe_forever(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(settings.HEALTH_PROBE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._probe_forever()),
+                asyncio.create_task(self.loop_lag.run()),
+            ]
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, *_running.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *_running.values(), return_exceptions=True)
+        self._tasks = []
+        _running.clear()
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        """Whether to take traffic, and why not"""
+        reasons = []
+        if self.checked_at is None:
+            reasons.append("health probes have not run yet")
+        elif self.checks["database"]["status"] != "ok":
+            reasons.append("database unavailable")
+        lag_ms = 1000 * self.loop_lag.recent_max
+        if lag_ms > settings.READY_MAX_LOOP_LAG_MS:
+            reasons.append(f"event loop lag {lag_ms:.0f} ms")
+        for name, queue in queue_depths().items():
+            if queue["depth"] >= settings.READY_MAX_QUEUE_DEPTH:
+                reasons.append(f"{name} queue depth {queue['depth']}")
+        wait_ms = 1000 * self.pool_wait["max_wait"]
+        if self.pool_wait["timeouts"]:
+            reasons.append(f"{self.pool_wait['timeouts']} database pool timeouts")
+        elif wait_ms > settings.READY_MAX_POOL_WAIT_MS:
+            reasons.append(f"database pool wait {wait_ms:.0f} ms")
+        return not reasons, reasons
+
+    def snapshot(self) -> dict:
+        return {
+            "checked_at": self.checked_at,
+            "checks": self.checks,
+            "event_loop_lag": self.loop_lag.snapshot(),
+            "queues": queue_depths(),
+            "pool_wait_ms_max": round(1000 * self.pool_wait["max_wait"], 3),
+        }
+
+
+monitor = HealthMonitor()
@@ -0,0 +1,258 @@
+"""
+Metrics
+=======
+A small in-process registry rendered in the Prometheus text format on
+``GET /metrics``. Counters, gauges and histograms are plain dicts keyed
+by label values, updated from the event loop without locks. Subsystems
+add their own metrics with ``registry.counter`` / ``gauge`` /
+``histogram``, or expose existing state at scrape time with
+``registry.collect``. Every sample carries a ``pid`` label: behind the
+pre-fork server each scrape is answered by one worker, and the label
+keeps the workers' series apart (aggregate with ``sum without (pid)``).
+
+``MetricsMiddleware`` (pure ASGI, so it adds one call frame rather than a
+task per request) records request latency per method, route template and
+status, requests in flight, and WebSocket connections and messages per
+route. Templates come from the matched route (``/api/v1/services/ct-mri/
+scan/{scan_id}``, never the raw path); unmatched paths share one label.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# (label values, value) pairs produced by a collector at scrape time
+Samples = Iterable[Tuple[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    pairs.append(f'pid="{os.getpid()}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._lines()]
+
+    def _lines(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def _lines(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (last is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def _lines(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Collected(Metric):
+    """Metric whose samples are read from existing state at scrape time"""
+
+    def __init__(self, name: str, help: str, kind: str, collect: Callable[[], Samples], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def _lines(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collect(
+        self, name: str, help: str, collect: Callable[[], Samples], kind: str = "gauge", labels: Sequence[str] = ()
+    ) -> None:
+        """Register a metric read from subsystem state on every scrape"""
+        self._add(Collected(name, help, kind, collect, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as exc:
+                lines.append(f"# {metric.name} failed: {_escape(exc)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+WEBSOCKET_CONNECTIONS = registry.gauge("websocket_connections", "Open WebSocket connections", ("route",))
+WEBSOCKET_MESSAGES = registry.counter(
+    "websocket_messages_total", "WebSocket messages by route and direction", ("route", "direction")
+)
+
+
+_templates: Optional[Dict[Callable, str]] = None
+
+
+def route_template(scope) -> str:
+    """Path template of the route a request matched (once routing has run)"""
+    global _templates
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    if _templates is None:
+        # Routes are final once the app serves traffic
+        _templates = {
+            route.endpoint: route.path
+            for route in scope["app"].routes
+            if getattr(route, "endpoint", None) is not None
+        }
+    return _templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """Request and WebSocket instrumentation labelled by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], route_template(scope), str(status))
+
+    async def _websocket(self, scope, receive, send):
+        route = None
+
+        async def counted_receive():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                WEBSOCKET_MESSAGES.inc(route or route_template(scope), "in")
+            return message
+
+        async def counted_send(message):
+            nonlocal route
+            if message["type"] == "websocket.accept":
+                route = route_template(scope)
+                WEBSOCKET_CONNECTIONS.inc(route)
+            elif message["type"] == "websocket.send":
+                WEBSOCKET_MESSAGES.inc(route or route_template(scope), "out")
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, counted_send)
+        finally:
+            if route is not None:
+                WEBSOCKET_CONNECTIONS.dec(route)
@@ -0,0 +1,98 @@
+"""
+Model store
+===========
+Model weights under ``settings.MODEL_PATH`` are read once per process and
+kept in memory. ``app.serve`` calls ``preload()`` in the master before it
+forks, so all workers share the same physical pages copy-on-write: array
+buffers are never written, and ``gc.freeze()`` stops the collector from
+touching the objects that own them. Under a plain ``uvicorn`` run the
+first ``get`` of a model loads it instead.
+
+Files are loaded by suffix (``.npy`` arrays, ``.npz`` archives as a dict
+of arrays, ``.json``); other formats plug in with ``register_loader``. A
+model's name is its path below MODEL_PATH without the suffix, e.g.
+``ct_mri/encoder``. NumPy is imported by the loaders, not by this module.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+Loader = Callable[[Path], Any]
+
+
+def _load_npy(path: Path):
+    import numpy as np
+
+    return np.load(path, allow_pickle=False)
+
+
+def _load_npz(path: Path) -> dict:
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def _load_json(path: Path):
+    return json.loads(path.read_text())
+
+
+_loaders: Dict[str, Loader] = {".npy": _load_npy, ".npz": _load_npz, ".json": _load_json}
+_models: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def register_loader(suffix: str, loader: Loader) -> None:
+    """Load files ending in ``suffix`` (e.g. ``".onnx"``) with ``loader(path)``"""
+    _loaders[suffix] = loader
+
+
+def model_files() -> Dict[str, Path]:
+    """Loadable files below MODEL_PATH by model name"""
+    root = Path(settings.MODEL_PATH)
+    if not root.is_dir():
+        return {}
+    return {
+        path.relative_to(root).with_suffix("").as_posix(): path
+        for path in sorted(root.rglob("*"))
+        if path.is_file() and path.suffix in _loaders
+    }
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    return int(getattr(value, "nbytes", 0))
+
+
+def preload() -> dict:
+    """(Re)load every model file; returns counts for the startup log"""
+    files = model_files()
+    loaded = {name: _loaders[path.suffix](path) for name, path in files.items()}
+    with _lock:
+        _models.clear()
+        _models.update(loaded)
+    return {"models": len(loaded), "bytes": sum(_nbytes(value) for value in loaded.values())}
+
+
+def get(name: str) -> Any:
+    """A model by name, loading it on first use when it was not preloaded"""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            path = model_files().get(name)
+            if path is None:
+                raise KeyError(f"No model {name!r} under {settings.MODEL_PATH}")
+            _models[name] = _loaders[path.suffix](path)
+        return _models[name]
+
+
+def loaded() -> Dict[str, int]:
+    """Bytes held per loaded model"""
+    return {name: _nbytes(value) for name, value in list(_models.items())}
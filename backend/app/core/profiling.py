@@ -0,0 +1,205 @@
+"""
+Profiling
+=========
+Two tools for finding what blocks the event loop in production.
+
+``SlowCallbackDetector`` is always on. The loop stamps a heartbeat every
+quarter of ``SLOW_CALLBACK_THRESHOLD_MS`` and a watchdog thread checks
+it. When the heartbeat is late by more than the threshold, the loop is
+stuck in one callback right now, so the watchdog captures the loop
+thread's stack (``sys._current_frames``) and the request whose task is
+running. Once the loop recovers it prints the stall with its duration,
+route, handler and stack and counts it per route. The steady-state cost
+is a few dozen timer wakeups a second plus one dict insert per request
+(``RequestTaskMiddleware``).
+
+``sample`` is the on-demand sampling profiler behind the admin endpoint:
+it walks every thread's frames at a fixed interval for a bounded time
+and returns collapsed stacks (``thread;module:function;... count``), the
+input of flamegraph.pl and speedscope. One profile runs at a time per
+worker; nothing is sampled between profiles.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry, route_template
+
+SLOW_CALLBACKS = registry.counter(
+    "event_loop_slow_callbacks_total", "Event-loop stalls over SLOW_CALLBACK_THRESHOLD_MS by route", ("route",)
+)
+
+# asyncio task -> ASGI scope of the request it is serving
+_task_scopes: Dict[asyncio.Task, dict] = {}
+
+
+class RequestTaskMiddleware:
+    """Remembers which request each task serves, for the stall report"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        _task_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _task_scopes.pop(task, None)
+
+
+def _request(scope: Optional[dict]) -> dict:
+    if scope is None:
+        return {"method": None, "path": None, "route": "-", "handler": None}
+    endpoint = scope.get("endpoint")
+    return {
+        "method": scope.get("method", "WEBSOCKET"),
+        "path": scope.get("path"),
+        "route": route_template(scope),
+        "handler": f"{endpoint.__module__}.{endpoint.__qualname__}" if endpoint is not None else None,
+    }
+
+
+class SlowCallbackDetector:
+    """Watchdog thread reporting event-loop callbacks that run longer than ``threshold``"""
+
+    def __init__(self, threshold: float, depth: int, keep: int = 50):
+        self.threshold = threshold
+        self.depth = depth
+        self.recent = deque(maxlen=keep)
+        self._interval = threshold / 4
+        self._beat = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def _heartbeat(self) -> None:
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self._interval, self._heartbeat)
+
+    def start(self) -> None:
+        if self._watchdog is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._heartbeat()
+        self._watchdog = threading.Thread(target=self._watch, name="slow-callback-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._watchdog is None:
+            return
+        self._stopped.set()
+        self._handle.cancel()
+        self._watchdog.join()
+        self._watchdog = None
+
+    def _watch(self) -> None:
+        stall = None
+        while not self._stopped.wait(self._interval):
+            beat = self._beat
+            if stall is None:
+                if time.monotonic() - beat - self._interval > self.threshold:
+                    stall = self._capture(beat)
+            elif beat != stall["beat"]:
+                # The first heartbeat after the stall runs right after the slow callback
+                self._report(stall, beat - stall["beat"] - self._interval)
+                stall = None
+
+    def _capture(self, beat: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack: List[Tuple[str, int, str, None]] = []
+        while frame is not None and len(stack) < self.depth:
+            stack.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None))
+            frame = frame.f_back
+        task = asyncio.current_task(self._loop)
+        return {"beat": beat, "stack": stack[::-1], **_request(_task_scopes.get(task))}
+
+    def _report(self, stall: dict, duration: float) -> None:
+        stack = traceback.StackSummary.from_list(stall["stack"]).format()
+        entry = {
+            "at": time.time(),
+            "duration_ms": round(duration * 1000, 1),
+            "method": stall["method"],
+            "path": stall["path"],
+            "route": stall["route"],
+            "handler": stall["handler"],
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.recent.append(entry)
+        self._loop.call_soon_threadsafe(SLOW_CALLBACKS.inc, stall["route"])
+        request = f"{stall['method']} {stall['route']} ({stall['handler']})" if stall["method"] else "no request"
+        print(
+            f"⚠️  Event loop blocked {entry['duration_ms']:.0f} ms in {request}, pid {os.getpid()}:\n"
+            + "".join(stack),
+            end="",
+            flush=True,
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self._watchdog is not None,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "recent": list(self.recent),
+        }
+
+
+detector = SlowCallbackDetector(settings.SLOW_CALLBACK_THRESHOLD_MS / 1000, settings.SLOW_CALLBACK_STACK_DEPTH)
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this worker"""
+
+
+_profiling = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    name = f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+    return name.replace(";", ":").replace(" ", "_")
+
+
+def _collapse(thread: str, frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join([thread.replace(";", ":").replace(" ", "_"), *reversed(names)])
+
+
+def sample(duration: float, interval: float, thread: Optional[int] = None) -> Tuple[Counter, int]:
+    """Sample stacks of all threads (or one) for ``duration`` seconds; blocks, run it in a thread
+
+    Returns collapsed stack -> sample count, and the number of sampling rounds.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    try:
+        sampler = threading.get_ident()
+        stacks: Counter = Counter()
+        rounds = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == sampler or (thread is not None and ident != thread):
+                    continue
+                stacks[_collapse(names.get(ident, str(ident)), frame)] += 1
+            rounds += 1
+            time.sleep(interval)
+        return stacks, rounds
+    finally:
+        _profiling.release()
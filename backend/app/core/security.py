@@ -2,30 +2,92 @@
 Security utilities
 """
 
-from datetime import datetime, timedelta
-from typing import Any, Optional
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from app.core import health
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes passlib flag hashes
+# made with any other cost, so they are transparently rehashed on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when too many hashing jobs are already queued"""
+
+
+class _HashExecutor:
+    """Small dedicated thread pool with a bound on queued jobs"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _done(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHashingBusy("Password hashing queue is full")
+            self._pending += 1
+        # bcrypt releases the GIL, so the event loop keeps running meanwhile
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+
+_hash_executor = _HashExecutor(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+health.register_queue("password_hash", lambda: _hash_executor.pending, settings.PASSWORD_HASH_MAX_PENDING)
 
 
 def create_access_token(
     subject: str | Any,
     expires_delta: Optional[timedelta] = None,
+    role: Optional[str] = None,
+    patient_id: Optional[str] = None,
 ) -> str:
     """Create JWT access token"""
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(
+        expire = now + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {
+        "exp": expire,
+        "iat": now,
+        "sub": str(subject),
+        "jti": uuid.uuid4().hex,
+    }
+    if role:
+        to_encode["role"] = role
+    if patient_id:
+        # Saves a users -> patients lookup on every patient-scoped request
+        to_encode["pid"] = patient_id
     encoded_jwt = jwt.encode(
         to_encode,
         settings.SECRET_KEY,
@@ -34,6 +96,11 @@ def create_access_token(
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """Verify signature and expiry and return the claims (raises JWTError)"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -44,3 +111,35 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash off the event loop"""
+    return await _hash_executor.run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash password off the event loop"""
+    return await _hash_executor.run(pwd_context.hash, password)
+
+
+_dummy_hash: Optional[str] = None
+
+
+def _verify_dummy(plain_password: str) -> None:
+    global _dummy_hash
+    if _dummy_hash is None:
+        # Made with BCRYPT_ROUNDS, so checking against it costs what a real check costs
+        _dummy_hash = pwd_context.hash(uuid.uuid4().hex)
+    pwd_context.verify(plain_password, _dummy_hash)
+
+
+async def verify_dummy_password(plain_password: str) -> None:
+    """Spend a real check's bcrypt time for a login with no stored hash (no user-exists timing oracle)"""
+    await _hash_executor.run(_verify_dummy, plain_password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify password and, when the stored hash uses a different cost than
+    BCRYPT_ROUNDS, return a replacement hash to store (otherwise None).
+    """
+    return await _hash_executor.run(pwd_context.verify_and_update, plain_password, hashed_password)
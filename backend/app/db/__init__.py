@@ -0,0 +1,3 @@
+# Database access layer (PostgreSQL, tables owned by the Prisma schema)
+
+
@@ -0,0 +1,131 @@
+"""
+Analysis queries
+================
+Results of every AI service (CT/MRI, blood, genetics, ...) share the
+``analyses`` table, told apart by ``serviceType``. The full response is
+kept in ``result`` so history endpoints can return it unchanged.
+"""
+
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.pagination import START, Cursor, before_cursor, cursor_params, split_page
+from app.db.tables import analyses, new_id, utcnow
+
+_INSERT = insert(analyses).returning(analyses.c.id, analyses.c.created_at)
+_OWNED = (
+    (analyses.c.id == bindparam("analysis_id"))
+    & (analyses.c.patient_id == bindparam("patient_id"))
+    & (analyses.c.service_type == bindparam("service_type"))
+)
+_GET = select(analyses).where(_OWNED)
+_DELETE = delete(analyses).where(_OWNED).returning(analyses.c.id, analyses.c.file_url)
+# Served by analyses_patientId_serviceType_createdAt_id_idx
+_EXPORT = (
+    select(analyses)
+    .where(
+        (analyses.c.patient_id == bindparam("patient_id"))
+        & (analyses.c.service_type == bindparam("service_type"))
+        & before_cursor(analyses)
+    )
+    .order_by(analyses.c.created_at.desc(), analyses.c.id.desc())
+)
+_HISTORY = _EXPORT.limit(bindparam("limit"))
+
+RISK_LEVELS = {
+    "low": "LOW",
+    "medium": "MODERATE",
+    "moderate": "MODERATE",
+    "high": "HIGH",
+    "critical": "CRITICAL",
+}
+
+
+def risk_level(value: Optional[str]) -> Optional[str]:
+    """Service risk label ("low", "medium", ...) as the RiskLevel enum"""
+    return RISK_LEVELS.get((value or "").lower())
+
+
+async def create_analysis(
+    conn: AsyncConnection,
+    patient_id: str,
+    service_type: str,
+    result: dict,
+    *,
+    analysis_id: Optional[str] = None,
+    input_data: Optional[dict] = None,
+    file_url: Optional[str] = None,
+    confidence: Optional[float] = None,
+    risk: Optional[str] = None,
+    findings: Iterable[str] = (),
+    status: str = "COMPLETED",
+) -> RowMapping:
+    """Store an analysis (completed unless ``status`` says otherwise); returns its ``id`` and ``created_at``"""
+    now = utcnow()
+    row = await conn.execute(_INSERT, {
+        "id": analysis_id or new_id(),
+        "patient_id": patient_id,
+        "service_type": service_type,
+        "input_data": input_data,
+        "file_url": file_url,
+        "status": status,
+        "result": result,
+        "confidence": confidence,
+        "risk_level": risk_level(risk),
+        "findings": list(findings),
+        "created_at": now,
+        "completed_at": now if status == "COMPLETED" else None,
+    })
+    return row.mappings().one()
+
+
+async def get_analysis(
+    conn: AsyncConnection, analysis_id: str, patient_id: str, service_type: str
+) -> Optional[RowMapping]:
+    result = await conn.execute(_GET, {
+        "analysis_id": analysis_id,
+        "patient_id": patient_id,
+        "service_type": service_type,
+    })
+    return result.mappings().first()
+
+
+async def list_analyses(
+    conn: AsyncConnection, patient_id: str, service_type: str, limit: int = 50, cursor: Cursor = START
+) -> Tuple[List[RowMapping], Optional[str]]:
+    """One page of a patient's analyses of one service, newest first, and the next cursor"""
+    result = await conn.execute(_HISTORY, {
+        "patient_id": patient_id,
+        "service_type": service_type,
+        "limit": limit + 1,
+        **cursor_params(cursor),
+    })
+    return split_page(result.mappings().all(), limit)
+
+
+async def stream_analyses(
+    conn: AsyncConnection, patient_id: str, service_type: str, cursor: Cursor = START
+) -> AsyncIterator[RowMapping]:
+    """Every analysis below ``cursor``, read through a server-side cursor"""
+    result = await conn.stream(_EXPORT, {
+        "patient_id": patient_id,
+        "service_type": service_type,
+        **cursor_params(cursor),
+    })
+    async for row in result.mappings():
+        yield row
+
+
+async def delete_analysis(
+    conn: AsyncConnection, analysis_id: str, patient_id: str, service_type: str
+) -> Optional[RowMapping]:
+    """Delete an analysis; returns its ``id`` and ``file_url`` if it existed"""
+    result = await conn.execute(_DELETE, {
+        "analysis_id": analysis_id,
+        "patient_id": patient_id,
+        "service_type": service_type,
+    })
+    return result.mappings().first()
@@ -0,0 +1,141 @@
+"""
+IoT monitoring session queries
+==============================
+``iot_readings`` is the hot tier: readings of active sessions, plus those
+of closed sessions not yet compacted into segment files (see
+``app.services.iot.tiering``). Readings at or before a session's
+compacted-through timestamp live in its segment and are excluded here.
+"""
+
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import Integer, bindparam, cast, delete, exists, extract, func, insert, select, update
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.tables import Timestamp, iot_readings, iot_sessions, utcnow
+
+# Numeric reading columns summarised in SQL for the hot tier
+STAT_COLUMNS = ("heart_rate", "hrv_sdnn", "hrv_rmssd", "spo2", "stress_level", "muscle_activity")
+READING_COLUMNS = (
+    iot_readings.c.timestamp,
+    *(iot_readings.c[name] for name in STAT_COLUMNS),
+    iot_readings.c.acceleration,
+    iot_readings.c.gyroscope,
+)
+
+_OWNED = (iot_sessions.c.id == bindparam("session_id")) & (iot_sessions.c.patient_id == bindparam("owner_id"))
+_INSERT = insert(iot_sessions).returning(iot_sessions.c.id, iot_sessions.c.started_at)
+_GET = select(iot_sessions).where(_OWNED)
+# Holds off a concurrent stop until the readings are in
+_LOCK_ACTIVE = select(iot_sessions.c.id).where(_OWNED & iot_sessions.c.ended_at.is_(None)).with_for_update(read=True)
+_ENDED = bindparam("ended", type_=Timestamp)
+_END = (
+    update(iot_sessions)
+    .where(_OWNED & iot_sessions.c.ended_at.is_(None))
+    .values(ended_at=_ENDED, duration=cast(extract("epoch", _ENDED - iot_sessions.c.started_at), Integer))
+    .returning(iot_sessions)
+)
+_SET_AVERAGES = update(iot_sessions).where(iot_sessions.c.id == bindparam("session_id"))
+
+# Served by iot_readings_sessionId_timestamp_idx
+_HOT = (
+    (iot_readings.c.session_id == bindparam("session_id"))
+    & (iot_readings.c.timestamp > bindparam("after", type_=Timestamp))
+)
+_READINGS = select(*READING_COLUMNS).where(_HOT).order_by(iot_readings.c.timestamp)
+_RANGE = (
+    _READINGS
+    .where(iot_readings.c.timestamp <= bindparam("until", type_=Timestamp))
+    .limit(bindparam("limit"))
+)
+_STATS = select(*(
+    aggregate(iot_readings.c[name]).label(f"{name}_{label}")
+    for name in STAT_COLUMNS
+    for label, aggregate in (("count", func.count), ("sum", func.sum), ("min", func.min), ("max", func.max))
+)).where(_HOT)
+_DELETE_COMPACTED = delete(iot_readings).where(
+    (iot_readings.c.session_id == bindparam("session_id"))
+    & (iot_readings.c.timestamp <= bindparam("through", type_=Timestamp))
+)
+_PENDING = (
+    select(iot_sessions.c.id, iot_sessions.c.patient_id)
+    .where(
+        iot_sessions.c.ended_at.is_not(None)
+        & exists().where(iot_readings.c.session_id == iot_sessions.c.id)
+    )
+    .order_by(iot_sessions.c.ended_at)
+    .limit(bindparam("limit"))
+)
+
+
+async def start_session(conn: AsyncConnection, patient_id: str) -> RowMapping:
+    row = await conn.execute(_INSERT, {"patient_id": patient_id})
+    return row.mappings().one()
+
+
+async def get_session(conn: AsyncConnection, session_id: str, patient_id: str) -> Optional[RowMapping]:
+    result = await conn.execute(_GET, {"session_id": session_id, "owner_id": patient_id})
+    return result.mappings().first()
+
+
+async def end_session(conn: AsyncConnection, session_id: str, patient_id: str) -> Optional[RowMapping]:
+    """Close an active session; None if it is unknown or already ended"""
+    result = await conn.execute(_END, {"session_id": session_id, "owner_id": patient_id, "ended": utcnow()})
+    return result.mappings().first()
+
+
+async def add_readings(conn: AsyncConnection, session_id: str, patient_id: str, readings: List[dict]) -> bool:
+    """Insert readings into an active session; False if it is unknown or ended"""
+    active = await conn.execute(_LOCK_ACTIVE, {"session_id": session_id, "owner_id": patient_id})
+    if active.first() is None:
+        return False
+    if readings:
+        await conn.execute(insert(iot_readings), [{"session_id": session_id, **reading} for reading in readings])
+    return True
+
+
+async def stream_readings(
+    conn: AsyncConnection, session_id: str, after: datetime, partition_rows: int = 10000
+) -> AsyncIterator[List[RowMapping]]:
+    """Hot readings after ``after`` in time order, in partitions"""
+    result = await conn.stream(_READINGS, {"session_id": session_id, "after": after})
+    async for rows in result.mappings().partitions(partition_rows):
+        yield rows
+
+
+async def readings_in_range(
+    conn: AsyncConnection, session_id: str, after: datetime, until: datetime, limit: int
+) -> List[RowMapping]:
+    result = await conn.execute(_RANGE, {"session_id": session_id, "after": after, "until": until, "limit": limit})
+    return result.mappings().all()
+
+
+async def reading_stats(conn: AsyncConnection, session_id: str, after: datetime) -> Dict[str, dict]:
+    """count / sum / min / max per STAT_COLUMNS of the hot readings after ``after``"""
+    row = (await conn.execute(_STATS, {"session_id": session_id, "after": after})).mappings().one()
+    return {
+        name: {
+            "count": row[f"{name}_count"],
+            "sum": float(row[f"{name}_sum"] or 0.0),
+            "min": row[f"{name}_min"],
+            "max": row[f"{name}_max"],
+        }
+        for name in STAT_COLUMNS
+    }
+
+
+async def delete_compacted(conn: AsyncConnection, session_id: str, through: datetime) -> int:
+    result = await conn.execute(_DELETE_COMPACTED, {"session_id": session_id, "through": through})
+    return result.rowcount
+
+
+async def set_averages(conn: AsyncConnection, session_id: str, averages: dict) -> None:
+    await conn.execute(_SET_AVERAGES, {"session_id": session_id, **averages})
+
+
+async def pending_compaction(conn: AsyncConnection, limit: int = 100) -> List[RowMapping]:
+    """Closed sessions that still have hot readings, oldest first"""
+    result = await conn.execute(_PENDING, {"limit": limit})
+    return result.mappings().all()
@@ -0,0 +1,59 @@
+"""
+Keyset pagination
+=================
+History queries page on ``(createdAt, id)`` descending: the next page is
+everything strictly below the last row seen, which an index on
+``(..., createdAt DESC, id DESC)`` answers directly at any depth (unlike
+OFFSET, which reads and discards every skipped row). The cursor handed to
+clients is that last ``(createdAt, id)`` pair, base64url encoded.
+"""
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Table, bindparam, tuple_
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.sql.elements import ColumnElement
+
+Cursor = Tuple[datetime, str]
+
+# First page: strictly below any real row
+START: Cursor = (datetime.max, "")
+
+
+def encode_cursor(row: RowMapping) -> str:
+    raw = f"{row['created_at'].isoformat()}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Cursor:
+    """``(created_at, id)`` of a cursor (raises ValueError if malformed)"""
+    if not cursor:
+        return START
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), row_id
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def before_cursor(table: Table) -> ColumnElement:
+    """``(createdAt, id) < (:cursor_created_at, :cursor_id)``"""
+    return tuple_(table.c.created_at, table.c.id) < tuple_(
+        bindparam("cursor_created_at", type_=table.c.created_at.type),
+        bindparam("cursor_id", type_=table.c.id.type),
+    )
+
+
+def cursor_params(cursor: Cursor) -> dict:
+    return {"cursor_created_at": cursor[0], "cursor_id": cursor[1]}
+
+
+def split_page(rows: Sequence[RowMapping], limit: int) -> Tuple[List[RowMapping], Optional[str]]:
+    """Rows of a ``limit + 1`` query and the cursor of the next page, if any"""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,112 @@
+"""
+Questionnaire result queries
+"""
+
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.pagination import START, Cursor, before_cursor, cursor_params, split_page
+from app.db.tables import questionnaire_results
+
+_INSERT = insert(questionnaire_results).returning(questionnaire_results.c.id, questionnaire_results.c.created_at)
+_GET = select(questionnaire_results).where(
+    (questionnaire_results.c.id == bindparam("result_id"))
+    & (questionnaire_results.c.patient_id == bindparam("patient_id"))
+)
+# Served by questionnaire_results_patientId_createdAt_id_idx
+_EXPORT = (
+    select(questionnaire_results)
+    .where((questionnaire_results.c.patient_id == bindparam("patient_id")) & before_cursor(questionnaire_results))
+    .order_by(questionnaire_results.c.created_at.desc(), questionnaire_results.c.id.desc())
+)
+_HISTORY = _EXPORT.limit(bindparam("limit"))
+# Primary-key order, so each page of a re-scoring run is an index range scan
+_BY_QUESTIONNAIRE = (
+    select(questionnaire_results)
+    .where(
+        (questionnaire_results.c.questionnaire_id == bindparam("questionnaire_id"))
+        & (questionnaire_results.c.id > bindparam("after_id"))
+    )
+    .order_by(questionnaire_results.c.id)
+    .limit(bindparam("limit"))
+)
+_SCORE_COLUMNS = ("total_score", "category", "percentile", "insights", "recommendations")
+_UPDATE_SCORES = (
+    update(questionnaire_results)
+    .where(questionnaire_results.c.id == bindparam("result_id"))
+    .values({column: bindparam(f"new_{column}") for column in _SCORE_COLUMNS})
+)
+
+
+def _score_columns(scored: dict) -> dict:
+    """Stored columns of one ``CompiledSpec.score`` result"""
+    scores = scored["scores"]
+    return {
+        "total_score": round(scores["total_score"]),
+        "category": scored["risk_level"],
+        "percentile": scores.get("percentile"),
+        "insights": scored["insights"],
+        "recommendations": scored["recommendations"],
+    }
+
+
+async def create_result(
+    conn: AsyncConnection,
+    patient_id: str,
+    questionnaire_id: str,
+    answers: dict,
+    scored: dict,
+) -> RowMapping:
+    """Store a scored submission; ``scored`` is one ``CompiledSpec.score`` result"""
+    row = await conn.execute(_INSERT, {
+        "patient_id": patient_id,
+        "questionnaire_id": questionnaire_id,
+        "answers": answers,
+        **_score_columns(scored),
+    })
+    return row.mappings().one()
+
+
+async def get_result(conn: AsyncConnection, result_id: str, patient_id: str) -> Optional[RowMapping]:
+    result = await conn.execute(_GET, {"result_id": result_id, "patient_id": patient_id})
+    return result.mappings().first()
+
+
+async def list_results(
+    conn: AsyncConnection, patient_id: str, limit: int = 50, cursor: Cursor = START
+) -> Tuple[List[RowMapping], Optional[str]]:
+    """One page of a patient's questionnaire results, newest first, and the next cursor"""
+    result = await conn.execute(_HISTORY, {"patient_id": patient_id, "limit": limit + 1, **cursor_params(cursor)})
+    return split_page(result.mappings().all(), limit)
+
+
+async def stream_results(conn: AsyncConnection, patient_id: str, cursor: Cursor = START) -> AsyncIterator[RowMapping]:
+    """Every result below ``cursor``, read through a server-side cursor"""
+    result = await conn.stream(_EXPORT, {"patient_id": patient_id, **cursor_params(cursor)})
+    async for row in result.mappings():
+        yield row
+
+
+async def list_for_rescore(
+    conn: AsyncConnection, questionnaire_id: str, after_id: str = "", limit: int = 1000
+) -> List[RowMapping]:
+    """Up to ``limit`` stored results of one instrument with ids above ``after_id``, in id order"""
+    result = await conn.execute(_BY_QUESTIONNAIRE, {
+        "questionnaire_id": questionnaire_id,
+        "after_id": after_id,
+        "limit": limit,
+    })
+    return result.mappings().all()
+
+
+async def update_scores(conn: AsyncConnection, scored: List[Tuple[str, dict]]) -> None:
+    """Overwrite the stored scores of ``(result id, CompiledSpec.score result)`` pairs"""
+    if not scored:
+        return
+    await conn.execute(_UPDATE_SCORES, [
+        {"result_id": result_id, **{f"new_{column}": value for column, value in _score_columns(result).items()}}
+        for result_id, result in scored
+    ])
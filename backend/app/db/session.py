@@ -0,0 +1,216 @@
+"""
+Database engine and connection pool
+===================================
+One async engine per process, created in ``main.lifespan`` and shared by
+every request. asyncpg connections are pooled (LIFO, so idle extras age
+out via ``pool_recycle``) and each keeps a prepared-statement cache, so a
+repeated query is parsed and planned once per connection. The statements
+themselves are module-level Core constructs, which also hit SQLAlchemy's
+compiled-SQL cache.
+
+Connections are held only around the database work: handlers that score
+or run inference do that first and open ``transaction()`` just to store
+the result; the ``get_db`` dependency is for handlers that only query.
+A failed startup connect does not stop the app. Database routes answer
+503 until a reconnect succeeds, as they do when the pool stays exhausted
+past ``DB_POOL_TIMEOUT_SECONDS``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import exc as sa_exc, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+
+class DatabaseUnavailable(RuntimeError):
+    """No connection could be obtained: database down or pool exhausted"""
+
+
+class PoolMetrics:
+    """Checkout wait times and failures, for spotting pool saturation"""
+
+    def __init__(self, window: int = 1024):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.peak_checked_out = 0
+        self._waits = deque(maxlen=window)
+        self._interval_max_wait = 0.0
+        self._timeouts_seen = 0
+
+    def record(self, wait: float, checked_out: int) -> None:
+        self.checkouts += 1
+        self._waits.append(wait)
+        self._interval_max_wait = max(self._interval_max_wait, wait)
+        POOL_WAIT.observe(wait)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def take_interval(self) -> dict:
+        """Worst checkout wait and timeouts since the previous call (readiness probes)"""
+        interval = {"max_wait": self._interval_max_wait, "timeouts": self.timeouts - self._timeouts_seen}
+        self._interval_max_wait = 0.0
+        self._timeouts_seen = self.timeouts
+        return interval
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "peak_checked_out": self.peak_checked_out,
+            "wait_ms_p50": round(1000 * waits[len(waits) // 2], 3) if waits else 0.0,
+            "wait_ms_p99": round(1000 * waits[int(len(waits) * 0.99)], 3) if waits else 0.0,
+            "wait_ms_max": round(1000 * waits[-1], 3) if waits else 0.0,
+        }
+
+
+POOL_WAIT = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time to check out a pooled connection",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+metrics = PoolMetrics()
+registry.collect(
+    "db_pool_checkout_failures_total",
+    "Failed connection checkouts",
+    lambda: [(("timeout",), metrics.timeouts), (("error",), metrics.errors)],
+    kind="counter",
+    labels=("reason",),
+)
+registry.collect(
+    "db_pool_checked_out",
+    "Pooled connections in use",
+    lambda: [((), _engine.pool.checkedout())] if _engine is not None else [],
+)
+
+_engine: Optional[AsyncEngine] = None
+_last_error: Optional[str] = None
+_last_attempt = 0.0
+_connect_lock = asyncio.Lock()
+
+
+def database_url() -> URL:
+    """``DATABASE_URL`` for the asyncpg driver, as shared with Prisma"""
+    url = make_url(settings.DATABASE_URL)
+    if url.drivername in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+asyncpg")
+    # Prisma's ?schema= is not a libpq/asyncpg parameter
+    url = url.difference_update_query(["schema"])
+    return url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+
+
+def _create_engine() -> AsyncEngine:
+    return create_async_engine(
+        database_url(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        pool_use_lifo=True,
+        connect_args={
+            "command_timeout": settings.DB_COMMAND_TIMEOUT_SECONDS,
+            "server_settings": {"application_name": "aman-ai-backend"},
+        },
+    )
+
+
+async def _warm(engine: AsyncEngine, count: int) -> None:
+    """Open ``count`` connections up front so first requests skip the handshake"""
+    connections = [engine.connect() for _ in range(count)]
+    outcomes = await asyncio.gather(*(conn.start() for conn in connections), return_exceptions=True)
+    await asyncio.gather(*(
+        conn.close() for conn, outcome in zip(connections, outcomes) if not isinstance(outcome, BaseException)
+    ))
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+
+async def connect() -> bool:
+    """Create the engine and check the database answers; False if it does not"""
+    global _engine, _last_error, _last_attempt
+    async with _connect_lock:
+        if _engine is not None:
+            return True
+        _last_attempt = time.monotonic()
+        engine = _create_engine()
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            if settings.DB_POOL_PREWARM:
+                await _warm(engine, settings.DB_POOL_SIZE)
+        except Exception as exc:
+            await engine.dispose()
+            _last_error = str(exc) or type(exc).__name__
+            print(f"⚠️  Database unavailable: {_last_error}")
+            return False
+        _engine, _last_error = engine, None
+        return True
+
+
+async def disconnect() -> None:
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+async def _get_engine() -> AsyncEngine:
+    if _engine is None and time.monotonic() - _last_attempt >= settings.DB_CONNECT_RETRY_SECONDS:
+        await connect()
+    if _engine is None:
+        raise DatabaseUnavailable("Database is unavailable")
+    return _engine
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[AsyncConnection]:
+    """Pooled connection inside a transaction, committed on clean exit"""
+    engine = await _get_engine()
+    conn = engine.connect()
+    started = time.perf_counter()
+    try:
+        await conn.start()
+    except sa_exc.TimeoutError as exc:
+        metrics.timeouts += 1
+        raise DatabaseUnavailable("Database connection pool exhausted") from exc
+    except (OSError, sa_exc.DBAPIError) as exc:
+        metrics.errors += 1
+        raise DatabaseUnavailable("Database is unavailable") from exc
+    metrics.record(time.perf_counter() - started, engine.pool.checkedout())
+    try:
+        async with conn.begin():
+            yield conn
+    finally:
+        await conn.close()
+
+
+async def get_db() -> AsyncIterator[AsyncConnection]:
+    """Dependency: a pooled connection for the duration of the request"""
+    async with transaction() as conn:
+        yield conn
+
+
+def pool_status() -> dict:
+    """Pool occupancy and checkout metrics for health checks"""
+    status = {"connected": _engine is not None, "error": _last_error, **metrics.snapshot()}
+    if _engine is not None:
+        pool = _engine.pool
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "capacity": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        })
+    return status
@@ -0,0 +1,228 @@
+"""
+Database tables
+===============
+SQLAlchemy Core mirror of the tables created by ``prisma/schema.prisma``.
+Prisma owns the schema and the migrations; nothing here creates or alters
+tables, and the ``Index`` entries only mirror the schema's ``@@index``es.
+Columns keep their camelCase database names and are exposed under
+snake_case keys (``analyses.c.patient_id`` is ``"patientId"``).
+
+Prisma fills ``@default(cuid())`` and ``@updatedAt`` on the client side,
+so those columns carry Python-side defaults here instead.
+"""
+
+import os
+import secrets
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    func,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM, JSONB, TIMESTAMP
+
+metadata = MetaData()
+
+# Prisma creates the enum types; never emit CREATE TYPE from here
+role_enum = ENUM("PATIENT", "DOCTOR", "ADMIN", name="Role", create_type=False)
+gender_enum = ENUM("MALE", "FEMALE", "OTHER", name="Gender", create_type=False)
+service_type_enum = ENUM(
+    "CT_MRI", "IOT", "QUESTIONNAIRE", "GENETICS", "BLOOD", "REHABILITATION",
+    name="ServiceType", create_type=False,
+)
+analysis_status_enum = ENUM(
+    "PENDING", "PROCESSING", "COMPLETED", "FAILED", "REVIEWED",
+    name="AnalysisStatus", create_type=False,
+)
+risk_level_enum = ENUM("LOW", "MODERATE", "HIGH", "CRITICAL", name="RiskLevel", create_type=False)
+
+# Prisma's DateTime is timestamp(3) without time zone, stored as UTC
+Timestamp = TIMESTAMP(precision=3)
+
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+_counter = secrets.randbelow(36 ** 4)
+
+
+def _base36(number: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        digits.append(_BASE36[digit])
+    return "".join(reversed(digits))
+
+
+def new_id() -> str:
+    """Collision-resistant, roughly time-ordered id in Prisma's cuid format"""
+    global _counter
+    _counter = (_counter + 1) % 36 ** 4
+    return (
+        "c"
+        + _base36(int(time.time() * 1000), 8)
+        + _base36(_counter, 4)
+        + _base36(os.getpid(), 4)
+        + _base36(secrets.randbits(41), 8)
+    )
+
+
+def utcnow() -> datetime:
+    """Naive UTC now, matching Prisma's timestamp columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _snake(name: str) -> str:
+    return "".join(f"_{char.lower()}" if char.isupper() else char for char in name)
+
+
+def _created_at(name: str = "createdAt") -> Column:
+    return Column(name, Timestamp, key=_snake(name), nullable=False, default=utcnow, server_default=func.now())
+
+
+def _updated_at() -> Column:
+    return Column("updatedAt", Timestamp, key="updated_at", nullable=False, default=utcnow, onupdate=utcnow)
+
+
+def _column(name: str, *args, **kwargs) -> Column:
+    return Column(name, *args, key=_snake(name), **kwargs)
+
+
+users = Table(
+    "users", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    Column("email", Text, nullable=False, unique=True),
+    _column("emailVerified", Timestamp),
+    Column("password", Text),
+    Column("name", Text),
+    Column("image", Text),
+    Column("role", role_enum, nullable=False, server_default="PATIENT"),
+    _created_at(),
+    _updated_at(),
+)
+Index("users_createdAt_id_idx", users.c.created_at.desc(), users.c.id.desc())
+
+patients = Table(
+    "patients", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("userId", Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True),
+    _column("dateOfBirth", Timestamp),
+    Column("gender", gender_enum),
+    Column("phone", Text),
+    Column("address", Text),
+    _column("bloodType", Text),
+    Column("allergies", ARRAY(Text), nullable=False, default=list),
+    Column("conditions", ARRAY(Text), nullable=False, default=list),
+    Column("medications", ARRAY(Text), nullable=False, default=list),
+    _created_at(),
+    _updated_at(),
+)
+
+doctors = Table(
+    "doctors", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("userId", Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True),
+    Column("specialization", Text),
+    _column("licenseNumber", Text),
+    Column("hospital", Text),
+    Column("bio", Text),
+    _created_at(),
+    _updated_at(),
+)
+
+doctor_patients = Table(
+    "doctor_patients", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("doctorId", Text, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False),
+    _column("patientId", Text, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False),
+    _created_at("assignedAt"),
+)
+
+analyses = Table(
+    "analyses", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("patientId", Text, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False),
+    _column("serviceType", service_type_enum, nullable=False),
+    _column("inputData", JSONB),
+    _column("fileUrl", Text),
+    Column("status", analysis_status_enum, nullable=False, server_default="PENDING"),
+    Column("result", JSONB),
+    Column("confidence", Float),
+    _column("riskLevel", risk_level_enum),
+    Column("findings", ARRAY(Text), nullable=False, default=list),
+    _created_at(),
+    _updated_at(),
+    _column("completedAt", Timestamp),
+)
+Index(
+    "analyses_patientId_serviceType_createdAt_id_idx",
+    analyses.c.patient_id, analyses.c.service_type, analyses.c.created_at.desc(), analyses.c.id.desc(),
+)
+
+iot_sessions = Table(
+    "iot_sessions", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("patientId", Text, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False),
+    _created_at("startedAt"),
+    _column("endedAt", Timestamp),
+    Column("duration", Integer),
+    _column("avgHeartRate", Integer),
+    _column("avgStressLevel", Float),
+    Column("avgSpO2", Float, key="avg_spo2"),
+)
+
+iot_readings = Table(
+    "iot_readings", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("sessionId", Text, ForeignKey("iot_sessions.id", ondelete="CASCADE"), nullable=False),
+    Column("timestamp", Timestamp, nullable=False, server_default=func.now()),
+    _column("heartRate", Integer),
+    _column("hrvSdnn", Float),
+    _column("hrvRmssd", Float),
+    Column("spO2", Float, key="spo2"),
+    _column("stressLevel", Float),
+    Column("acceleration", JSONB),
+    Column("gyroscope", JSONB),
+    _column("muscleActivity", Float),
+)
+Index("iot_readings_sessionId_timestamp_idx", iot_readings.c.session_id, iot_readings.c.timestamp)
+
+questionnaire_results = Table(
+    "questionnaire_results", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("patientId", Text, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False),
+    _column("questionnaireId", Text, nullable=False),
+    Column("answers", JSONB, nullable=False),
+    _column("totalScore", Integer),
+    Column("category", Text),
+    Column("percentile", Float),
+    Column("insights", ARRAY(Text), nullable=False, default=list),
+    Column("recommendations", ARRAY(Text), nullable=False, default=list),
+    _created_at(),
+)
+Index(
+    "questionnaire_results_patientId_createdAt_id_idx",
+    questionnaire_results.c.patient_id, questionnaire_results.c.created_at.desc(), questionnaire_results.c.id.desc(),
+)
+
+health_reports = Table(
+    "health_reports", metadata,
+    Column("id", Text, primary_key=True, default=new_id),
+    _column("patientId", Text, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False),
+    _column("doctorId", Text, ForeignKey("doctors.id"), nullable=False),
+    Column("title", Text, nullable=False),
+    Column("summary", Text, nullable=False),
+    Column("diagnosis", Text),
+    Column("recommendations", ARRAY(Text), nullable=False, default=list),
+    Column("medications", ARRAY(Text), nullable=False, default=list),
+    Column("lifestyle", ARRAY(Text), nullable=False, default=list),
+    _column("followUpDate", Timestamp),
+    _column("followUpNotes", Text),
+    _created_at(),
+    _updated_at(),
+)
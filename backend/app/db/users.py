@@ -0,0 +1,83 @@
+"""
+User and patient queries
+"""
+
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.pagination import START, Cursor, before_cursor, cursor_params, split_page
+from app.db.tables import patients, users
+
+USER_COLUMNS = (users.c.id, users.c.email, users.c.name, users.c.role, users.c.created_at)
+
+# Login reads the hash and the patient profile in one round trip
+_BY_EMAIL = (
+    select(*USER_COLUMNS, users.c.password, patients.c.id.label("patient_id"))
+    .outerjoin(patients, patients.c.user_id == users.c.id)
+    .where(users.c.email == bindparam("email"))
+)
+_BY_ID = select(*USER_COLUMNS).where(users.c.id == bindparam("user_id"))
+# Served by users_createdAt_id_idx
+_EXPORT = select(*USER_COLUMNS).where(before_cursor(users)).order_by(users.c.created_at.desc(), users.c.id.desc())
+_LIST = _EXPORT.limit(bindparam("limit"))
+_INSERT_USER = insert(users).returning(*USER_COLUMNS)
+_INSERT_PATIENT = insert(patients).returning(patients.c.id)
+_SET_PASSWORD = update(users).where(users.c.id == bindparam("user_id")).values(password=bindparam("password_hash"))
+_DELETE = delete(users).where(users.c.id == bindparam("user_id")).returning(users.c.id)
+
+
+async def get_user_by_email(conn: AsyncConnection, email: str) -> Optional[RowMapping]:
+    """User with ``password`` hash and ``patient_id`` (None for staff)"""
+    result = await conn.execute(_BY_EMAIL, {"email": email})
+    return result.mappings().first()
+
+
+async def get_user(conn: AsyncConnection, user_id: str) -> Optional[RowMapping]:
+    result = await conn.execute(_BY_ID, {"user_id": user_id})
+    return result.mappings().first()
+
+
+async def list_users(
+    conn: AsyncConnection, limit: int, cursor: Cursor = START
+) -> Tuple[List[RowMapping], Optional[str]]:
+    """One page of users, newest first, and the next cursor"""
+    result = await conn.execute(_LIST, {"limit": limit + 1, **cursor_params(cursor)})
+    return split_page(result.mappings().all(), limit)
+
+
+async def stream_users(conn: AsyncConnection, cursor: Cursor = START) -> AsyncIterator[RowMapping]:
+    result = await conn.stream(_EXPORT, cursor_params(cursor))
+    async for row in result.mappings():
+        yield row
+
+
+async def create_patient_user(conn: AsyncConnection, name: str, email: str, password_hash: str) -> RowMapping:
+    """Insert a PATIENT user with an empty patient profile (IntegrityError on a taken email)"""
+    user = (await conn.execute(_INSERT_USER, {
+        "name": name,
+        "email": email,
+        "password": password_hash,
+        "role": "PATIENT",
+    })).mappings().one()
+    await conn.execute(_INSERT_PATIENT, {"user_id": user["id"]})
+    return user
+
+
+async def update_user(conn: AsyncConnection, user_id: str, values: dict) -> Optional[RowMapping]:
+    if not values:
+        return await get_user(conn, user_id)
+    statement = update(users).where(users.c.id == user_id).values(**values).returning(*USER_COLUMNS)
+    return (await conn.execute(statement)).mappings().first()
+
+
+async def set_password_hash(conn: AsyncConnection, user_id: str, password_hash: str) -> None:
+    await conn.execute(_SET_PASSWORD, {"user_id": user_id, "password_hash": password_hash})
+
+
+async def delete_user(conn: AsyncConnection, user_id: str) -> bool:
+    """Delete a user; the patient profile and its records cascade"""
+    result = await conn.execute(_DELETE, {"user_id": user_id})
+    return result.first() is not None
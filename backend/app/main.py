@@ -4,12 +4,18 @@ Aman AI Platform - FastAPI Backend
 Main application entry point
 """
 
+import hmac
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.core import cache, health, metrics, profiling
 from app.core.config import settings
-from app.api.router import api_router
+from app.core.security import PasswordHashingBusy
+from app.api import deps
+from app.api.router import api_router, enabled_services, import_report
+from app.db import session as db
 
 
 @asynccontextmanager
@@ -17,8 +23,41 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print(f"🚀 Starting Aman AI Backend v{settings.VERSION}")
+    if settings.IMPORT_REPORT:
+        print(import_report())
+    # Refuse to start with a service backend that cannot work
+    if "genetics" in enabled_services:
+        from app.services.genetics import structures
+        structures.get_scheduler()  # fails fast on a missing or unknown predictor backend
+    if "blood" in enabled_services:
+        from app.services.blood import ocr as blood_ocr
+        blood_ocr.check_backend(settings.BLOOD_OCR_BACKEND)
+    await db.connect()
+    deps.start_revocation_sync()
+    cache.start_invalidation_listener()
+    # Service background work, only for services this process serves
+    if "iot" in enabled_services:
+        from app.services.iot import tiering as iot_tiering
+        iot_tiering.start_compaction_sweep()
+    health.monitor.start()
+    if settings.SLOW_CALLBACK_DETECTOR:
+        profiling.detector.start()
     yield
     # Shutdown
+    profiling.detector.stop()
+    await health.monitor.stop()
+    if "iot" in enabled_services:
+        await iot_tiering.stop_compaction_sweep()
+    await cache.stop_invalidation_listener()
+    await deps.stop_revocation_sync()
+    await db.disconnect()
+    if "genetics" in enabled_services:
+        from app.services.genetics import analysis as genetics_analysis
+        genetics_analysis.shutdown_pool()
+    if "blood" in enabled_services:
+        from app.services.blood import ocr as blood_ocr, sketches as blood_sketches
+        blood_ocr.shutdown_pool()
+        blood_sketches.flush()
     print("👋 Shutting down Aman AI Backend")
 
 
@@ -39,8 +78,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def _metrics_scrape_allowed(request: Request) -> bool:
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+    return request.client is not None and request.client.host in LOOPBACK_HOSTS
+
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint(request: Request):
+        """Prometheus scrape endpoint (bearer METRICS_TOKEN, or loopback clients without one)"""
+        if not _metrics_scrape_allowed(request):
+            return PlainTextResponse("Not Found", status_code=404)
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+if settings.SLOW_CALLBACK_DETECTOR:
+    app.add_middleware(profiling.RequestTaskMiddleware)
+
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    """Shed logins/registrations instead of queueing unbounded bcrypt work"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is temporarily overloaded, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(db.DatabaseUnavailable)
+async def database_unavailable_handler(request: Request, exc: db.DatabaseUnavailable):
+    """Database down or pool saturated: fail fast rather than pile up requests"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "2"},
+    )
+
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
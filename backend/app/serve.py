@@ -0,0 +1,302 @@
+"""
+Pre-fork server
+===============
+``python -m app.serve`` runs one master and ``SERVE_WORKERS`` uvicorn
+workers on a shared listening socket. The master imports the app and
+preloads the models under ``MODEL_PATH`` before forking, then calls
+``gc.freeze()``, so code, catalogs and weights are shared copy-on-write
+and each added worker costs little more than its own heap.
+
+The master only supervises (Linux; signals are taken with
+``sigtimedwait``):
+
+- a worker that exits is replaced, with a growing delay if it keeps
+  dying right after start;
+- SIGHUP reloads the models and replaces every worker: the new ones are
+  forked first, then the old ones drain (uvicorn graceful shutdown) and
+  are killed after ``SERVE_GRACEFUL_TIMEOUT_SECONDS``;
+- SIGTERM / SIGINT drain and stop all workers; a second one kills them.
+
+Code changes still need a restart of the master, which is what imported
+the code. Workers run the full lifespan each (pools, probes, background
+sweeps), exactly as under ``uvicorn --workers``.
+
+Sizing. ``SERVE_WORKERS=0`` means one worker per available CPU, capped at
+``SERVE_MAX_AUTO_WORKERS``. Every worker has its own database pool, so the
+master divides ``DB_MAX_CONNECTIONS`` by the worker count and shrinks
+``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW`` (keeping their ratio) whenever the
+configured per-worker pool would not fit; the split is printed at start.
+A logout is only seen by the worker that handled it unless revocations
+go through Redis, so with more than one worker ``AUTH_REVOCATION_REDIS``
+defaults to on, and explicitly turning it off refuses to start.
+
+Per-worker ports. The kernel hands connections on the shared socket to
+whichever worker accepts first, so a load balancer sees one server: a
+single saturated worker answering 503 on ``/health/ready`` takes the whole
+instance out of its upstream. With ``SERVE_WORKER_BASE_PORT`` set, worker
+``i`` also listens on that port + ``i`` (the socket belongs to the slot
+and survives respawns), so nginx can list the workers as separate
+upstream servers and route around one of them, and Prometheus can scrape
+each worker's ``/metrics`` (every sample carries a ``pid`` label) from the
+same host, or from anywhere with ``METRICS_TOKEN``.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from app.core import model_store
+from app.core.config import settings
+
+MASTER_SIGNALS = {signal.SIGCHLD, signal.SIGHUP, signal.SIGINT, signal.SIGTERM}
+STARTUP_GRACE_SECONDS = 5.0  # a worker dying sooner counts as a crash loop
+MAX_RESPAWN_DELAY_SECONDS = 30.0
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sockets: List[socket.socket], cpu: Optional[int], log_level: str) -> None:
+    # uvicorn installs its own SIGINT/SIGTERM handlers for the graceful
+    # shutdown; until then (and after it) they are ignored, the master
+    # decides when a worker dies. SIGHUP is meant for the master only.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, MASTER_SIGNALS)
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    config = uvicorn.Config(
+        app,
+        log_level=log_level,
+        timeout_graceful_shutdown=int(settings.SERVE_GRACEFUL_TIMEOUT_SECONDS),
+    )
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Master:
+    def __init__(
+        self,
+        app,
+        sock: socket.socket,
+        workers: int,
+        cpus: Optional[List[int]],
+        log_level: str,
+        slot_sockets: Optional[Dict[int, socket.socket]] = None,
+    ):
+        self.app = app
+        self.sock = sock
+        self.slot_sockets = slot_sockets or {}  # slot -> its own listening socket
+        self.size = workers
+        self.cpus = cpus
+        self.log_level = log_level
+        self.workers: Dict[int, int] = {}  # pid -> slot
+        self.started: Dict[int, float] = {}  # pid -> monotonic start
+        self.retiring: Dict[int, float] = {}  # pid -> kill deadline
+        self.respawn: Dict[int, float] = {}  # slot -> not before (monotonic)
+        self.delays: Dict[int, float] = {}  # slot -> current crash-loop delay
+        self.stopping = False
+
+    def spawn(self, slot: int) -> None:
+        cpu = self.cpus[slot % len(self.cpus)] if self.cpus else None
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                sockets = [self.sock] + ([self.slot_sockets[slot]] if slot in self.slot_sockets else [])
+                _run_worker(self.app, sockets, cpu, self.log_level)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        self.workers[pid] = slot
+        self.started[pid] = time.monotonic()
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            started = self.started.pop(pid, 0.0)
+            if self.retiring.pop(pid, None) is not None or slot is None or self.stopping:
+                continue
+            uptime = time.monotonic() - started
+            if uptime < STARTUP_GRACE_SECONDS:
+                delay = min(max(self.delays.get(slot, 0.5) * 2, 1.0), MAX_RESPAWN_DELAY_SECONDS)
+            else:
+                delay = 0.0
+            self.delays[slot] = delay
+            print(
+                f"⚠️  Worker {slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}"
+                f" after {uptime:.1f}s, restarting in {delay:.1f}s",
+                flush=True,
+            )
+            self.respawn[slot] = time.monotonic() + delay
+
+    def retire(self, pids) -> None:
+        deadline = time.monotonic() + settings.SERVE_GRACEFUL_TIMEOUT_SECONDS
+        for pid in pids:
+            self.retiring[pid] = deadline
+            self._signal(pid, signal.SIGTERM)
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def tick(self) -> None:
+        now = time.monotonic()
+        for slot, due in list(self.respawn.items()):
+            if due <= now:
+                del self.respawn[slot]
+                self.spawn(slot)
+        for pid, deadline in list(self.retiring.items()):
+            if deadline <= now:
+                self._signal(pid, signal.SIGKILL)
+
+    def reload(self) -> None:
+        """Reload models, fork a fresh set of workers, then drain the old set"""
+        old = list(self.workers)
+        if settings.SERVE_PRELOAD_MODELS:
+            _preload_models()
+        self.respawn.clear()
+        for slot in range(self.size):
+            self.spawn(slot)
+        self.retire(old)
+        print(f"🔄 Replacing {len(old)} workers", flush=True)
+
+    def stop(self) -> None:
+        self.stopping = True
+        self.respawn.clear()
+        self.retire(list(self.workers))
+        while self.workers:
+            info = signal.sigtimedwait(MASTER_SIGNALS, 0.5)
+            if info is not None and info.si_signo in (signal.SIGINT, signal.SIGTERM):
+                for pid in self.workers:
+                    self._signal(pid, signal.SIGKILL)
+            self.reap()
+            self.tick()
+
+    def run(self) -> None:
+        signal.pthread_sigmask(signal.SIG_BLOCK, MASTER_SIGNALS)
+        for slot in range(self.size):
+            self.spawn(slot)
+        print(f"🧵 Master {os.getpid()} serving with {self.size} workers", flush=True)
+        while True:
+            info = signal.sigtimedwait(MASTER_SIGNALS, 1.0)
+            self.reap()
+            if info is not None:
+                if info.si_signo in (signal.SIGINT, signal.SIGTERM):
+                    self.stop()
+                    return
+                if info.si_signo == signal.SIGHUP:
+                    self.reload()
+            self.tick()
+
+
+def _preload_models() -> None:
+    started = time.perf_counter()
+    summary = model_store.preload()
+    gc.collect()
+    gc.freeze()
+    print(
+        f"📦 Preloaded {summary['models']} models ({summary['bytes'] / 2 ** 20:.1f} MiB)"
+        f" from {settings.MODEL_PATH} in {time.perf_counter() - started:.1f}s",
+        flush=True,
+    )
+
+
+def _share_db_pool(workers: int) -> None:
+    """Shrink each worker's pool so that all workers stay within DB_MAX_CONNECTIONS"""
+    configured = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    share = settings.DB_MAX_CONNECTIONS // workers
+    if share < 1:
+        print(
+            f"⚠️  {workers} workers exceed DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS};"
+            " each still opens one connection",
+            flush=True,
+        )
+        share = 1
+    if share < configured:
+        pool_size = max(round(share * settings.DB_POOL_SIZE / configured), 1)
+        settings.DB_POOL_SIZE = pool_size
+        settings.DB_MAX_OVERFLOW = share - pool_size
+    print(
+        f"🗄️  DB pool per worker: {settings.DB_POOL_SIZE} + {settings.DB_MAX_OVERFLOW} overflow"
+        f" ({workers} workers, DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS})",
+        flush=True,
+    )
+
+
+def _share_revocations(workers: int) -> None:
+    """Revoke tokens through Redis whenever more than one worker verifies them"""
+    if workers == 1:
+        return
+    if settings.AUTH_REVOCATION_REDIS is False:
+        raise SystemExit(
+            f"❌ {workers} workers need AUTH_REVOCATION_REDIS: a token revoked on one"
+            " worker would still be accepted by the others"
+        )
+    settings.AUTH_REVOCATION_REDIS = True
+    print(f"🔐 Token revocations shared through Redis ({workers} workers)", flush=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked uvicorn workers")
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVE_WORKERS,
+        help=f"0 = one per available CPU, at most {settings.SERVE_MAX_AUTO_WORKERS}",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    available = sorted(os.sched_getaffinity(0))
+    workers = args.workers or min(len(available), settings.SERVE_MAX_AUTO_WORKERS)
+    _share_db_pool(workers)
+    _share_revocations(workers)
+    cpus = available if settings.SERVE_CPU_AFFINITY else None
+
+    from app.main import app
+
+    if settings.SERVE_PRELOAD_MODELS:
+        _preload_models()
+    else:
+        gc.collect()
+        gc.freeze()
+    sock = _listen(args.host, args.port, settings.SERVE_BACKLOG)
+    slot_sockets = {}
+    if settings.SERVE_WORKER_BASE_PORT:
+        slot_sockets = {
+            slot: _listen(args.host, settings.SERVE_WORKER_BASE_PORT + slot, settings.SERVE_BACKLOG)
+            for slot in range(workers)
+        }
+    Master(app, sock, workers, cpus, args.log_level, slot_sockets).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Blood analysis services (S5)
+
+
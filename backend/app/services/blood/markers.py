@@ -0,0 +1,113 @@
+"""
+Tracked blood biomarkers
+========================
+Reference ranges, accepted names and unit conversion factors for the
+biomarkers scored by the blood analysis service.
+"""
+
+TRACKED_MARKERS = [
+    {
+        "name": "Neurofilament Light Chain (NfL)",
+        "description": "Маркер повреждения нейронов",
+        "unit": "pg/mL",
+        "reference_range": {"min": 0, "max": 20},
+        "relevance": "high",
+    },
+    {
+        "name": "Amyloid-beta 42",
+        "description": "Связан с болезнью Альцгеймера",
+        "unit": "pg/mL",
+        "reference_range": {"min": 500, "max": 1000},
+        "relevance": "high",
+    },
+    {
+        "name": "Tau protein",
+        "description": "Маркер нейродегенерации",
+        "unit": "pg/mL",
+        "reference_range": {"min": 0, "max": 400},
+        "relevance": "high",
+    },
+    # Plasma p-tau is about a thousand times lower than total tau; cut-offs
+    # depend on the assay (these are common Simoa / ALZpath upper limits)
+    {
+        "name": "Phosphorylated tau 181 (p-tau181)",
+        "description": "Маркер амилоидной патологии при болезни Альцгеймера",
+        "unit": "pg/mL",
+        "reference_range": {"min": 0, "max": 2.5},
+        "relevance": "high",
+    },
+    {
+        "name": "Phosphorylated tau 217 (p-tau217)",
+        "description": "Наиболее специфичный плазменный маркер болезни Альцгеймера",
+        "unit": "pg/mL",
+        "reference_range": {"min": 0, "max": 0.4},
+        "relevance": "high",
+    },
+    {
+        "name": "C-Reactive Protein (CRP)",
+        "description": "Маркер воспаления",
+        "unit": "mg/L",
+        "reference_range": {"min": 0, "max": 3},
+        "relevance": "medium",
+    },
+    {
+        "name": "Homocysteine",
+        "description": "Связан с когнитивными нарушениями",
+        "unit": "μmol/L",
+        "reference_range": {"min": 5, "max": 15},
+        "relevance": "medium",
+    },
+]
+
+# Short keys used throughout the service, in TRACKED_MARKERS order
+MARKER_KEYS = ["nfl", "abeta42", "tau", "ptau181", "ptau217", "crp", "homocysteine"]
+
+# Which side of the reference range is a concern: 1 = high, -1 = low
+RISK_DIRECTION = {"nfl": 1, "abeta42": -1, "tau": 1, "ptau181": 1, "ptau217": 1, "crp": 1, "homocysteine": 1}
+
+RELEVANCE_WEIGHTS = {"high": 1.0, "medium": 0.5, "low": 0.25}
+
+MARKER_ALIASES = {
+    "nfl": [
+        "Neurofilament Light Chain (NfL)", "Neurofilament light chain", "Neurofilament light",
+        "NfL", "sNfL", "NF-L",
+    ],
+    "abeta42": ["Amyloid-beta 42", "Amyloid beta 42", "Abeta42", "Aβ42", "Aβ1-42", "Abeta 1-42"],
+    "tau": ["Tau protein", "Tau", "Total tau", "t-tau"],
+    "ptau181": ["Phosphorylated tau 181 (p-tau181)", "p-tau181", "ptau181", "p-tau 181", "pTau181"],
+    "ptau217": ["Phosphorylated tau 217 (p-tau217)", "p-tau217", "ptau217", "p-tau 217", "pTau217"],
+    "crp": ["C-Reactive Protein (CRP)", "C-reactive protein", "CRP", "hs-CRP", "hsCRP"],
+    "homocysteine": ["Homocysteine", "Hcy", "tHcy", "Гомоцистеин"],
+}
+
+# Factor from a reported unit to the marker's canonical unit (TRACKED_MARKERS)
+UNIT_FACTORS = {
+    "nfl": {"pg/ml": 1.0, "ng/l": 1.0, "ng/ml": 1000.0, "fg/ml": 0.001},
+    "abeta42": {"pg/ml": 1.0, "ng/l": 1.0, "ng/ml": 1000.0, "fg/ml": 0.001},
+    "tau": {"pg/ml": 1.0, "ng/l": 1.0, "ng/ml": 1000.0, "fg/ml": 0.001},
+    "ptau181": {"pg/ml": 1.0, "ng/l": 1.0, "ng/ml": 1000.0, "fg/ml": 0.001},
+    "ptau217": {"pg/ml": 1.0, "ng/l": 1.0, "ng/ml": 1000.0, "fg/ml": 0.001},
+    "crp": {"mg/l": 1.0, "ug/ml": 1.0, "mg/dl": 10.0},
+    # Homocysteine molar mass is 135.18 g/mol
+    "homocysteine": {"umol/l": 1.0, "nmol/ml": 1.0, "mmol/l": 1000.0, "mg/l": 7.397, "mg/dl": 73.97},
+}
+
+# Short labels used in risk factors and interpretations
+MARKER_LABELS = {
+    "nfl": ("NfL", "нейрофиламента лёгких цепей"),
+    "abeta42": ("Aβ42", "амилоида бета-42"),
+    "tau": ("Tau", "тау-белка"),
+    "ptau181": ("p-tau181", "фосфорилированного тау-181"),
+    "ptau217": ("p-tau217", "фосфорилированного тау-217"),
+    "crp": ("CRP", "С-реактивного белка"),
+    "homocysteine": ("Homocysteine", "гомоцистеина"),
+}
+
+
+def normalize_name(name: str) -> str:
+    return "".join(name.lower().split())
+
+
+def normalize_unit(unit: str) -> str:
+    unit = "".join(unit.lower().split())
+    return unit.replace("μ", "u").replace("µ", "u").replace("mcg", "ug").replace("mcmol", "umol")
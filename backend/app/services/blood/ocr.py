@@ -0,0 +1,370 @@
+"""
+Lab report OCR
+==============
+Extracts blood markers from uploaded lab reports (PDF, PNG, JPEG).
+Every page is an independent job in a process pool: the worker renders
+its own page, preprocesses it with OpenCV (deskew, Otsu binarisation)
+and runs the configured OCR backend. Digital PDFs with a text layer skip
+OCR entirely. Results are cached by the SHA-256 of the file contents.
+OpenCV is imported by the pool workers only, never by the web process.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.blood.scoring import marker_key
+
+UPLOAD_ID_PATTERN = re.compile(r"^upl_[0-9a-f]{12}$")
+UPLOAD_CHUNK_SIZE = 1 << 20
+RENDER_DPI = 300
+MIN_DESKEW_ANGLE = 0.1  # degrees
+MIN_TEXT_LAYER_CHARS = 20
+
+CONTENT_TYPES = {
+    "application/pdf": ".pdf",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+}
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+# Names may contain digits (Aβ42, p-tau181), so the value is the last number
+# before the unit/range and the line end; only digit-free text may trail it
+MARKER_LINE = re.compile(
+    r"^\s*(?P<name>\S.*?)\s*:?\s+"
+    rf"(?P<value>{_NUMBER})\s*"
+    r"(?P<unit>[A-Za-zμµ%]+(?:/[A-Za-zμµ]+)?)?"
+    rf"(?:\s+\(?(?P<min>{_NUMBER})\s*[-–—]\s*(?P<max>{_NUMBER})\)?)?"
+    r"(?:\s+[^\d\s][^\d]*)?\s*$"
+)
+_PARENTHESES = re.compile(r"\(([^)]*)\)")
+
+
+class OcrBackend:
+    """Turns a preprocessed (binarised, deskewed) page image into text"""
+
+    name = ""
+
+    @classmethod
+    def check(cls) -> None:
+        """Raise RuntimeError when the backend cannot run in this environment"""
+
+    def recognize(self, image: np.ndarray) -> str:
+        raise NotImplementedError
+
+
+class TesseractBackend(OcrBackend):
+    """Tesseract through pytesseract (needs the tesseract binary and language data)"""
+
+    name = "tesseract"
+
+    @classmethod
+    def check(cls) -> None:
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError(
+                "BLOOD_OCR_BACKEND=tesseract requires pytesseract (pip install -r requirements.txt)"
+            ) from None
+        try:
+            pytesseract.get_tesseract_version()
+        except pytesseract.TesseractNotFoundError:
+            raise RuntimeError(
+                "BLOOD_OCR_BACKEND=tesseract requires the tesseract binary on PATH (apt-get install tesseract-ocr)"
+            ) from None
+        missing = set(settings.BLOOD_OCR_LANGUAGES.split("+")) - set(pytesseract.get_languages(config=""))
+        if missing:
+            raise RuntimeError(
+                f"Tesseract language data missing for BLOOD_OCR_LANGUAGES: {', '.join(sorted(missing))}"
+                f" (apt-get install {' '.join(f'tesseract-ocr-{lang}' for lang in sorted(missing))})"
+            )
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("The tesseract OCR backend requires pytesseract") from None
+        self._pytesseract = pytesseract
+
+    def recognize(self, image: np.ndarray) -> str:
+        return self._pytesseract.image_to_string(image, lang=settings.BLOOD_OCR_LANGUAGES)
+
+
+class StaticBackend(OcrBackend):
+    """Local stand-in that returns fixed text (BLOOD_OCR_STATIC_TEXT) for every page"""
+
+    name = "static"
+
+    def recognize(self, image: np.ndarray) -> str:
+        return settings.BLOOD_OCR_STATIC_TEXT
+
+
+OCR_BACKENDS: Dict[str, type] = {
+    TesseractBackend.name: TesseractBackend,
+    StaticBackend.name: StaticBackend,
+}
+
+_backends: Dict[str, OcrBackend] = {}
+
+
+def register_backend(backend: type) -> None:
+    OCR_BACKENDS[backend.name] = backend
+
+
+def check_backend(name: str) -> None:
+    """Fail fast (at startup) when the configured backend is unknown or unusable"""
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name} (expected one of {list(OCR_BACKENDS)})")
+    OCR_BACKENDS[name].check()
+
+
+def get_backend(name: str) -> OcrBackend:
+    if name not in _backends:
+        if name not in OCR_BACKENDS:
+            raise ValueError(f"Unknown OCR backend: {name}")
+        _backends[name] = OCR_BACKENDS[name]()
+    return _backends[name]
+
+
+def _open_pdf(path: str):
+    try:
+        import pypdfium2
+    except ImportError:
+        raise RuntimeError("PDF reports require pypdfium2") from None
+    return pypdfium2.PdfDocument(path)
+
+
+def count_pages(path: Path) -> int:
+    if path.suffix != ".pdf":
+        return 1
+    pdf = _open_pdf(str(path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def deskew(gray: np.ndarray) -> np.ndarray:
+    """Rotate a grayscale page so that text lines are horizontal"""
+    import cv2
+
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return gray
+    angle = cv2.minAreaRect(points)[-1]
+    # minAreaRect reports angles in (0, 90]; map to the smallest rotation
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < MIN_DESKEW_ANGLE:
+        return gray
+    height, width = gray.shape
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, rotation, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess(gray: np.ndarray) -> np.ndarray:
+    """Deskew and binarise a grayscale page image"""
+    import cv2
+
+    gray = deskew(cv2.medianBlur(gray, 3))
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return binary
+
+
+def ocr_page(path: str, page_index: int, backend_name: str) -> str:
+    """Text of one page; executed in a pool worker"""
+    if not path.endswith(".pdf"):
+        import cv2
+
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("Could not decode image")
+        return get_backend(backend_name).recognize(preprocess(gray))
+
+    pdf = _open_pdf(path)
+    try:
+        page = pdf[page_index]
+        if settings.BLOOD_OCR_USE_TEXT_LAYER:
+            text = page.get_textpage().get_text_range()
+            if len(text.strip()) >= MIN_TEXT_LAYER_CHARS:
+                return text
+        bitmap = page.render(scale=RENDER_DPI / 72, grayscale=True)
+        gray = np.ascontiguousarray(np.squeeze(bitmap.to_numpy()))
+    finally:
+        pdf.close()
+    return get_backend(backend_name).recognize(preprocess(gray))
+
+
+def _number(text: Optional[str]) -> Optional[float]:
+    return None if text is None else float(text.replace(",", "."))
+
+
+def _tracked_name(name: str) -> str:
+    """Marker key for a report label, also trying its parenthesised parts"""
+    candidates = [name, _PARENTHESES.sub("", name).strip()] + _PARENTHESES.findall(name)
+    for candidate in candidates:
+        key = marker_key(candidate)
+        if key:
+            return key
+    return ""
+
+
+def extract_markers(text: str) -> List[dict]:
+    """
+    Map report lines of the form ``<name> <value> <unit> <min>-<max>`` to
+    ``BloodMarker`` fields. Tracked markers are kept even without a range;
+    other analytes only when the report states their reference range.
+    """
+    markers = []
+    for line in text.splitlines():
+        match = MARKER_LINE.match(line)
+        if not match:
+            continue
+        name = match["name"].strip(" .-–")
+        if not _tracked_name(name) and match["min"] is None:
+            continue
+        markers.append({
+            "name": name,
+            "value": _number(match["value"]),
+            "unit": match["unit"] or "",
+            "reference_min": _number(match["min"]),
+            "reference_max": _number(match["max"]),
+        })
+    return markers
+
+
+def upload_root() -> Path:
+    return Path(settings.UPLOAD_PATH) / "blood" / "uploads"
+
+
+def cache_root() -> Path:
+    return Path(settings.UPLOAD_PATH) / "blood" / "ocr-cache"
+
+
+def _upload_dir(upload_id: str) -> Path:
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise KeyError(upload_id)
+    return upload_root() / upload_id
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def read_upload(upload_id: str) -> dict:
+    try:
+        with open(_upload_dir(upload_id) / "meta.json", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(upload_id) from None
+
+
+def update_upload(upload_id: str, **fields) -> dict:
+    metadata = read_upload(upload_id)
+    metadata.update(fields)
+    _write_json(_upload_dir(upload_id) / "meta.json", metadata)
+    return metadata
+
+
+def _cache_path(digest: str, backend_name: str) -> Path:
+    return cache_root() / f"{digest}.{backend_name}.json"
+
+
+def save_upload(filename: str, content_type: str, source: BinaryIO, owner: str) -> dict:
+    """Store an upload for ``owner`` (a user id), hashing it on the way; served from cache when seen before"""
+    upload_id = f"upl_{uuid.uuid4().hex[:12]}"
+    directory = _upload_dir(upload_id)
+    directory.mkdir(parents=True)
+    stored_as = "report" + CONTENT_TYPES[content_type]
+    digest = hashlib.sha256()
+    with open(directory / stored_as, "wb") as target:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            target.write(chunk)
+
+    metadata = {
+        "upload_id": upload_id,
+        "owner": owner,
+        "filename": filename,
+        "stored_as": stored_as,
+        "sha256": digest.hexdigest(),
+        "backend": settings.BLOOD_OCR_BACKEND,
+        "status": "processing",
+        "pages": None,
+        "pages_done": 0,
+        "markers": [],
+    }
+    try:
+        with open(_cache_path(metadata["sha256"], metadata["backend"]), encoding="utf-8") as f:
+            cached = json.load(f)
+        metadata.update(status="completed", pages=cached["pages"], pages_done=cached["pages"],
+                        markers=cached["markers"], cached=True)
+    except FileNotFoundError:
+        pass
+    _write_json(directory / "meta.json", metadata)
+    return metadata
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.BLOOD_OCR_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def process_upload(upload_id: str) -> dict:
+    """OCR every page of an upload in parallel and extract its markers"""
+    metadata = read_upload(upload_id)
+    if metadata["status"] != "processing":
+        return metadata
+    path = _upload_dir(upload_id) / metadata["stored_as"]
+
+    try:
+        pages = count_pages(path)
+        if pages > settings.BLOOD_OCR_MAX_PAGES:
+            raise ValueError(f"Reports are limited to {settings.BLOOD_OCR_MAX_PAGES} pages")
+        update_upload(upload_id, pages=pages)
+
+        pool = get_pool()
+        futures = {
+            pool.submit(ocr_page, str(path), index, metadata["backend"]): index
+            for index in range(pages)
+        }
+        texts: List[Tuple[int, str]] = []
+        for future in as_completed(futures):
+            texts.append((futures[future], future.result()))
+            update_upload(upload_id, pages_done=len(texts))
+    except Exception as exc:
+        return update_upload(upload_id, status="failed", error=str(exc) or type(exc).__name__)
+
+    text = "\n".join(page_text for _, page_text in sorted(texts))
+    markers = extract_markers(text)
+    cache_root().mkdir(parents=True, exist_ok=True)
+    _write_json(_cache_path(metadata["sha256"], metadata["backend"]), {"pages": pages, "markers": markers})
+    return update_upload(upload_id, status="completed", markers=markers)
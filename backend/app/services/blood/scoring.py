@@ -0,0 +1,288 @@
+"""
+Biomarker scoring engine
+========================
+Scores whole batches of blood panels at once. All markers of all panels
+are flattened into columns, converted to canonical units through a
+precompiled (marker x unit) factor table, classified against the tracked
+reference ranges with NumPy, and aggregated back per panel with
+``np.bincount`` / ``np.maximum.at``.
+"""
+
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.blood.markers import (
+    MARKER_ALIASES,
+    MARKER_KEYS,
+    MARKER_LABELS,
+    RELEVANCE_WEIGHTS,
+    RISK_DIRECTION,
+    TRACKED_MARKERS,
+    UNIT_FACTORS,
+    normalize_name,
+    normalize_unit,
+)
+
+# Deviations are measured in reference-range widths beyond the range edge
+CRITICAL_DEVIATION = 1.0
+RISK_THRESHOLDS = (0.5, CRITICAL_DEVIATION)  # moderate up to 0.5, high up to 1.0
+OVERALL_THRESHOLDS = (0.25, 1.0, 2.5)  # weighted deviation sum per panel
+UNKNOWN_MARKER_WEIGHT = 0.25
+MAX_DEVIATION = 3.0
+
+STATUSES = ["normal", "low", "high", "critical", "unknown"]
+RISK_LEVELS = ["normal", "moderate", "high", "critical", "unknown"]
+OVERALL_RISKS = ["low", "moderate", "high", "critical"]
+OXIDATIVE_STRESS_LEVELS = ["low", "moderate", "high"]
+HOMOCYSTEINE_THRESHOLDS = (15.0, 30.0)  # μmol/L
+
+STATUS_PHRASES = {
+    "normal": "в норме",
+    "low": "понижен",
+    "high": "повышен",
+    "critical": "критически отклонён от нормы",
+    "unknown": "не удалось оценить: неизвестная единица измерения",
+}
+
+RECOMMENDATIONS = {
+    "low": [
+        "Показатели в пределах нормы",
+        "Рекомендуется повторный анализ через 6 месяцев",
+        "Поддерживайте физическую активность",
+    ],
+    "moderate": [
+        "Некоторые показатели вне референсного диапазона",
+        "Рекомендуется повторный анализ через 3 месяца",
+        "Обсудите результаты с лечащим врачом",
+    ],
+    "high": [
+        "Рекомендуется консультация невролога",
+        "Рекомендуется повторный анализ через 1 месяц",
+    ],
+    "critical": [
+        "Рекомендуется срочная консультация невролога",
+        "Рекомендуется расширенное обследование",
+    ],
+}
+
+_MARKER = {key: i for i, key in enumerate(MARKER_KEYS)}
+_NFL, _CRP, _HCY = _MARKER["nfl"], _MARKER["crp"], _MARKER["homocysteine"]
+
+_NAME_INDEX = {
+    normalize_name(alias): _MARKER[key]
+    for key, aliases in MARKER_ALIASES.items()
+    for alias in aliases
+}
+_UNITS = sorted({unit for factors in UNIT_FACTORS.values() for unit in factors})
+_UNIT_INDEX = {unit: i for i, unit in enumerate(_UNITS)}
+
+_FACTORS = np.full((len(MARKER_KEYS), len(_UNITS)), np.nan)
+for _key, _factors in UNIT_FACTORS.items():
+    for _unit, _factor in _factors.items():
+        _FACTORS[_MARKER[_key], _UNIT_INDEX[_unit]] = _factor
+
+_REF_MIN = np.array([float(marker["reference_range"]["min"]) for marker in TRACKED_MARKERS])
+_REF_MAX = np.array([float(marker["reference_range"]["max"]) for marker in TRACKED_MARKERS])
+_DIRECTION = np.array([RISK_DIRECTION[key] for key in MARKER_KEYS], dtype=np.int8)
+_WEIGHT = np.array([RELEVANCE_WEIGHTS[marker["relevance"]] for marker in TRACKED_MARKERS])
+_CANONICAL_NAMES = [marker["name"] for marker in TRACKED_MARKERS]
+_CANONICAL_UNITS = [marker["unit"] for marker in TRACKED_MARKERS]
+
+
+def marker_key(name: str) -> str:
+    """Short key of a tracked marker ("" when the name is not recognised)"""
+    index = _NAME_INDEX.get(normalize_name(name))
+    return "" if index is None else MARKER_KEYS[index]
+
+
+def _columns(panels: Sequence[Sequence[Any]]) -> dict:
+    """Flatten panels of marker objects into NumPy columns"""
+    flat = [(p, marker) for p, markers in enumerate(panels) for marker in markers]
+    count = len(flat)
+
+    def column(values, dtype) -> np.ndarray:
+        return np.fromiter(values, dtype=dtype, count=count)
+
+    def reference(value) -> float:
+        return np.nan if value is None else value
+
+    return {
+        "panel": column((p for p, _ in flat), np.int64),
+        "marker": column((_NAME_INDEX.get(normalize_name(m.name), -1) for _, m in flat), np.int64),
+        "unit": column((_UNIT_INDEX.get(normalize_unit(m.unit), -1) for _, m in flat), np.int64),
+        "value": column((m.value for _, m in flat), np.float64),
+        "ref_min": column((reference(m.reference_min) for _, m in flat), np.float64),
+        "ref_max": column((reference(m.reference_max) for _, m in flat), np.float64),
+        "markers": [m for _, m in flat],
+    }
+
+
+def classify(cols: dict) -> dict:
+    """Canonical values, statuses and risk levels for flattened markers"""
+    marker, unit, value = cols["marker"], cols["unit"], cols["value"]
+    known = marker >= 0
+    safe_marker = np.where(known, marker, 0)
+
+    factor = np.where(known & (unit >= 0), _FACTORS[safe_marker, np.where(unit >= 0, unit, 0)], np.nan)
+    # Untracked markers are kept in their reported unit against the lab's range
+    factor = np.where(known, factor, 1.0)
+    canonical = value * factor
+    lo = np.where(known, _REF_MIN[safe_marker], cols["ref_min"])
+    hi = np.where(known, _REF_MAX[safe_marker], cols["ref_max"])
+    lo = np.where(np.isnan(lo), -np.inf, lo)
+    hi = np.where(np.isnan(hi), np.inf, hi)
+    valid = ~np.isnan(canonical)
+
+    # One-sided or degenerate ranges fall back to the size of the bound itself
+    width = hi - lo
+    bound = np.abs(np.where(np.isfinite(hi), hi, lo))
+    width = np.where(np.isfinite(width) & (width > 0), width, np.maximum(np.nan_to_num(bound, posinf=1.0), 1.0))
+    with np.errstate(invalid="ignore"):
+        below = np.clip((lo - canonical) / width, 0.0, None)
+        above = np.clip((canonical - hi) / width, 0.0, None)
+    direction = np.where(known, _DIRECTION[safe_marker], 0)
+    deviation = np.select([direction > 0, direction < 0], [above, below], np.maximum(above, below))
+    deviation = np.where(valid, np.nan_to_num(deviation), 0.0)
+
+    status = np.select(
+        [~valid, deviation > CRITICAL_DEVIATION, canonical < lo, canonical > hi],
+        [STATUSES.index("unknown"), STATUSES.index("critical"), STATUSES.index("low"), STATUSES.index("high")],
+        STATUSES.index("normal"),
+    )
+    risk = np.select(
+        [~valid, deviation == 0, deviation <= RISK_THRESHOLDS[0], deviation <= RISK_THRESHOLDS[1]],
+        [RISK_LEVELS.index(level) for level in ("unknown", "normal", "moderate", "high")],
+        RISK_LEVELS.index("critical"),
+    )
+    return {
+        "known": known,
+        "valid": valid,
+        "canonical": canonical,
+        "lo": lo,
+        "hi": hi,
+        "deviation": deviation,
+        "status": status,
+        "risk": risk,
+    }
+
+
+def _per_panel(n_panels: int, panel: np.ndarray, mask: np.ndarray, values: np.ndarray, fill) -> np.ndarray:
+    """Value of a marker per panel (the last one reported wins)"""
+    out = np.full(n_panels, fill, dtype=values.dtype)
+    out[panel[mask]] = values[mask]
+    return out
+
+
+def aggregate(n_panels: int, cols: dict, scored: dict) -> dict:
+    """Per-panel overall risk and neuro marker summary"""
+    panel, marker = cols["panel"], cols["marker"]
+    known, valid = scored["known"], scored["valid"]
+
+    weight = np.where(known, _WEIGHT[np.where(known, marker, 0)], UNKNOWN_MARKER_WEIGHT) * valid
+    score = np.bincount(panel, weights=weight * np.minimum(scored["deviation"], MAX_DEVIATION), minlength=n_panels)
+    worst = np.zeros(n_panels, dtype=np.int64)
+    graded = valid & (scored["risk"] < RISK_LEVELS.index("unknown"))
+    np.maximum.at(worst, panel[graded], scored["risk"][graded])
+    overall = np.maximum(np.digitize(score, OVERALL_THRESHOLDS), worst)
+
+    nfl = _per_panel(n_panels, panel, valid & (marker == _NFL), scored["status"], -1)
+    crp = _per_panel(n_panels, panel, valid & (marker == _CRP), scored["canonical"], np.nan)
+    hcy = _per_panel(n_panels, panel, valid & (marker == _HCY), scored["canonical"], np.nan)
+    with np.errstate(invalid="ignore"):
+        inflammation = np.round(10.0 * crp / (crp + 3.0), 1)  # 3 mg/L (upper normal) -> 5.0
+    oxidative = np.digitize(hcy, HOMOCYSTEINE_THRESHOLDS)
+
+    return {
+        "score": score,
+        "overall": overall,
+        "nfl": nfl,
+        "inflammation": inflammation,
+        "oxidative": np.where(np.isnan(hcy), -1, oxidative),
+    }
+
+
+def _finite(value: Optional[float]) -> Optional[float]:
+    return value if value is not None and np.isfinite(value) else None
+
+
+def score_panels(panels: Sequence[Sequence[Any]]) -> List[dict]:
+    """
+    Score blood panels.
+
+    Each panel is a sequence of marker objects with ``name``, ``value``,
+    ``unit``, ``reference_min`` and ``reference_max`` attributes. Tracked
+    markers are converted to canonical units and judged against the
+    tracked reference ranges; other markers use the lab's own range.
+    """
+    n_panels = len(panels)
+    cols = _columns(panels)
+    scored = classify(cols)
+    panel_scores = aggregate(n_panels, cols, scored)
+
+    results = [
+        {"markers": [], "risk_factors": []}
+        for _ in range(n_panels)
+    ]
+    rows = zip(
+        cols["panel"].tolist(),
+        cols["marker"].tolist(),
+        cols["markers"],
+        scored["valid"].tolist(),
+        scored["canonical"].tolist(),
+        scored["lo"].tolist(),
+        scored["hi"].tolist(),
+        scored["status"].tolist(),
+        scored["risk"].tolist(),
+    )
+    for p, m, source, valid, canonical, lo, hi, status, risk in rows:
+        status = STATUSES[status]
+        if m >= 0:
+            key = MARKER_KEYS[m]
+            label, genitive = MARKER_LABELS[key]
+            name = _CANONICAL_NAMES[m] if valid else source.name
+            unit = _CANONICAL_UNITS[m] if valid else source.unit
+            if not valid:
+                lo, hi = source.reference_min, source.reference_max
+        else:
+            key, label, genitive = "", source.name, source.name
+            name, unit = source.name, source.unit
+        value = canonical if valid else source.value
+        results[p]["markers"].append({
+            "name": name,
+            "value": value,
+            "unit": unit,
+            "reference_min": _finite(lo),
+            "reference_max": _finite(hi),
+            "status": status,
+        })
+        results[p]["risk_factors"].append({
+            "marker": label,
+            "key": key,
+            "current_value": value,
+            "risk_level": RISK_LEVELS[risk],
+            "trend": "stable",
+            "interpretation": f"Уровень {genitive} {STATUS_PHRASES[status]}",
+        })
+
+    columns = zip(
+        panel_scores["overall"].tolist(),
+        panel_scores["score"].tolist(),
+        panel_scores["nfl"].tolist(),
+        panel_scores["inflammation"].tolist(),
+        panel_scores["oxidative"].tolist(),
+    )
+    for result, (overall, score, nfl, inflammation, oxidative) in zip(results, columns):
+        overall = OVERALL_RISKS[overall]
+        result.update(
+            markers_analyzed=len(result["markers"]),
+            overall_risk=overall,
+            risk_score=round(score, 3),
+            neuro_markers={
+                "nfl_level": STATUSES[nfl] if nfl >= 0 else "not_measured",
+                "inflammation_score": None if np.isnan(inflammation) else inflammation,
+                "oxidative_stress": OXIDATIVE_STRESS_LEVELS[oxidative] if oxidative >= 0 else "not_measured",
+            },
+            recommendations=RECOMMENDATIONS[overall],
+        )
+    return results
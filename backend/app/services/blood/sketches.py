@@ -0,0 +1,285 @@
+"""
+Cohort percentile sketches
+==========================
+Mergeable t-digests of canonical marker values across the whole patient
+population, kept per marker and per stratum (sex, age band and both).
+
+Each worker adds new values to its in-memory digests and periodically
+merges its local delta into a shared ``cohort.npz`` under a file lock,
+then adopts the merged result, so every worker converges on the same
+population view. Percentile lookups are a single ``np.interp`` over the
+centroid table.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+SKETCH_FILE = "cohort.npz"
+LOCK_FILE = ".cohort.lock"
+BUFFER_FACTOR = 5  # buffered values per unit of compression before compressing
+MIN_STRATUM_COUNT = 30
+SEXES = ("MALE", "FEMALE", "OTHER")
+AGE_BAND_EDGES = (18, 30, 40, 50, 60, 70, 80)
+AGE_BANDS = ["<18", "18-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80+"]
+REPORTED_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class TDigest:
+    """
+    Merging t-digest. Compression groups sorted centroids by the integer
+    part of the k1 scale function ``δ/2π · asin(2q - 1)``, which keeps
+    centroids small in the tails and is fully vectorised.
+    """
+
+    def __init__(
+        self,
+        compression: int = 200,
+        means: Optional[np.ndarray] = None,
+        weights: Optional[np.ndarray] = None,
+        minimum: float = np.inf,
+        maximum: float = -np.inf,
+    ):
+        self.compression = compression
+        self.means = np.zeros(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.zeros(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.min = minimum
+        self.max = maximum
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending_count = 0
+        self._table: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum()) + sum(float(w.sum()) for _, w in self._pending)
+
+    def update(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values_weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._pending.append((values, values_weights))
+        self._pending_count += len(values)
+        self._table = None
+        if self._pending_count > BUFFER_FACTOR * self.compression:
+            self.compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other.compress()
+        if len(other.means):
+            self.update(other.means, other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def compress(self) -> None:
+        if not self._pending:
+            return
+        means = np.concatenate([self.means] + [m for m, _ in self._pending])
+        weights = np.concatenate([self.weights] + [w for _, w in self._pending])
+        self._pending, self._pending_count = [], 0
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k.min()).astype(np.int64)
+        _, groups = np.unique(groups, return_inverse=True)
+        merged_weights = np.bincount(groups, weights=weights)
+        self.means = np.bincount(groups, weights=means * weights) / merged_weights
+        self.weights = merged_weights
+
+    def _interpolation_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._table is None:
+            self.compress()
+            centers = np.cumsum(self.weights) - self.weights / 2
+            self._table = (
+                np.concatenate(([self.min], self.means, [self.max])),
+                np.concatenate(([0.0], centers, [self.weights.sum()])),
+            )
+        return self._table
+
+    def cdf(self, value: float) -> float:
+        """Share of the population at or below ``value`` (0..1)"""
+        if not len(self.means) and not self._pending:
+            return float("nan")
+        xs, cumulative = self._interpolation_table()
+        return float(np.interp(value, xs, cumulative) / cumulative[-1])
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means) and not self._pending:
+            return float("nan")
+        xs, cumulative = self._interpolation_table()
+        return float(np.interp(q * cumulative[-1], cumulative, xs))
+
+
+def strata(sex: Optional[str], age: Optional[int]) -> List[str]:
+    """Strata a value belongs to, most specific first"""
+    band = None if age is None else AGE_BANDS[int(np.searchsorted(AGE_BAND_EDGES, age, side="right"))]
+    keys = []
+    if sex and band:
+        keys.append(f"sex={sex}|age={band}")
+    if sex:
+        keys.append(f"sex={sex}")
+    if band:
+        keys.append(f"age={band}")
+    keys.append("all")
+    return keys
+
+
+def age_at(date_of_birth: Optional[date], when: Optional[datetime] = None) -> Optional[int]:
+    if date_of_birth is None:
+        return None
+    when = (when or datetime.now()).date()
+    return when.year - date_of_birth.year - ((when.month, when.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def _save(path: Path, digests: Dict[Tuple[str, str], TDigest]) -> None:
+    names, offsets, bounds = [], [0], []
+    means, weights = [], []
+    for (marker, stratum), digest in digests.items():
+        digest.compress()
+        names.append([marker, stratum])
+        means.append(digest.means)
+        weights.append(digest.weights)
+        offsets.append(offsets[-1] + len(digest.means))
+        bounds.append((digest.min, digest.max))
+    tmp = path.with_name(f".{path.stem}.tmp.npz")
+    np.savez(
+        tmp,
+        names=np.array(json.dumps(names)),
+        offsets=np.array(offsets, dtype=np.int64),
+        bounds=np.array(bounds, dtype=np.float64).reshape(-1, 2),
+        means=np.concatenate(means) if means else np.zeros(0),
+        weights=np.concatenate(weights) if weights else np.zeros(0),
+    )
+    os.replace(tmp, path)
+
+
+def _load(path: Path, compression: int) -> Dict[Tuple[str, str], TDigest]:
+    try:
+        data = np.load(path)
+    except FileNotFoundError:
+        return {}
+    with data:
+        names = json.loads(str(data["names"]))
+        offsets, bounds = data["offsets"], data["bounds"]
+        means, weights = data["means"], data["weights"]
+        return {
+            (marker, stratum): TDigest(
+                compression,
+                means[offsets[i]: offsets[i + 1]],
+                weights[offsets[i]: offsets[i + 1]],
+                float(bounds[i, 0]),
+                float(bounds[i, 1]),
+            )
+            for i, (marker, stratum) in enumerate(names)
+        }
+
+
+class CohortSketches:
+    """Per-(marker, stratum) digests shared between workers through one file"""
+
+    def __init__(self, root: Optional[Path], compression: int, flush_interval: float):
+        self.root = root
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._local: Dict[Tuple[str, str], TDigest] = {}  # values not yet flushed
+        self._merged = _load(root / SKETCH_FILE, compression) if root else {}
+        self._last_flush = time.monotonic()
+
+    def _digest(self, digests: Dict[Tuple[str, str], TDigest], key: Tuple[str, str]) -> TDigest:
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = TDigest(self.compression)
+        return digest
+
+    def add(self, marker: str, values: List[float], sex: Optional[str] = None, age: Optional[int] = None) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            for stratum in strata(sex, age):
+                self._digest(self._merged, (marker, stratum)).update(values)
+                if self.root:
+                    self._digest(self._local, (marker, stratum)).update(values)
+        if self.root and time.monotonic() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Merge local values into the shared file and adopt the merged view"""
+        if self.root is None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.root / LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            shared = _load(self.root / SKETCH_FILE, self.compression)
+            for key, digest in self._local.items():
+                self._digest(shared, key).merge(digest)
+            if self._local:
+                _save(self.root / SKETCH_FILE, shared)
+            self._local = {}
+            self._merged = shared
+            self._last_flush = time.monotonic()
+
+    def lookup(self, marker: str, sex: Optional[str] = None, age: Optional[int] = None) -> Tuple[str, Optional[TDigest]]:
+        """Most specific stratum with enough values (falls back to "all")"""
+        with self._lock:
+            for stratum in strata(sex, age):
+                digest = self._merged.get((marker, stratum))
+                if digest is not None and (digest.count >= MIN_STRATUM_COUNT or stratum == "all"):
+                    return stratum, digest
+        return "all", None
+
+    def percentile(self, marker: str, value: float, sex: Optional[str] = None, age: Optional[int] = None) -> Optional[float]:
+        _, digest = self.lookup(marker, sex, age)
+        if digest is None:
+            return None
+        with self._lock:
+            return round(100.0 * digest.cdf(value), 1)
+
+    def describe(self, marker: str, sex: Optional[str] = None, age: Optional[int] = None) -> dict:
+        stratum, digest = self.lookup(marker, sex, age)
+        if digest is None:
+            return {"stratum": stratum, "count": 0, "quantiles": {}}
+        with self._lock:
+            return {
+                "stratum": stratum,
+                "count": int(digest.count),
+                "quantiles": {f"p{round(q * 100)}": digest.quantile(q) for q in REPORTED_QUANTILES},
+            }
+
+
+def record_results(scored: dict, sex: Optional[str], age: Optional[int]) -> None:
+    """Add a scored panel's tracked markers to the cohort and fill in percentiles"""
+    sketches = get_sketches()
+    for factor in scored["risk_factors"]:
+        if factor["key"] and factor["risk_level"] != "unknown":
+            sketches.add(factor["key"], [factor["current_value"]], sex, age)
+            factor["percentile"] = sketches.percentile(factor["key"], factor["current_value"], sex, age)
+
+
+_sketches: Optional[CohortSketches] = None
+
+
+def get_sketches() -> CohortSketches:
+    global _sketches
+    if _sketches is None:
+        root = Path(settings.UPLOAD_PATH) / "blood" / "sketches" if settings.BLOOD_SKETCH_PERSIST else None
+        _sketches = CohortSketches(root, settings.BLOOD_SKETCH_COMPRESSION, settings.BLOOD_SKETCH_FLUSH_SECONDS)
+    return _sketches
+
+
+def flush() -> None:
+    if _sketches is not None:
+        _sketches.flush()
@@ -0,0 +1,236 @@
+"""
+Biomarker trends
+================
+Per-(patient, marker) time series of canonical marker values. Each
+series keeps its points sorted by time in growable NumPy buffers plus
+running regression sums (n, Σt, Σv, Σt², Σtv, Σv²), so slope and
+variance are O(1) reads and history queries are ``searchsorted`` range
+scans. Points are also appended to a small binary log per series so
+that they survive restarts and are picked up by other workers; with
+logs, only the BLOOD_TRENDS_MAX_SERIES most recently used series stay
+in memory and the others are reloaded from their log on demand.
+"""
+
+import fcntl
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.blood.markers import MARKER_KEYS, RISK_DIRECTION, TRACKED_MARKERS
+
+PATIENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SECONDS_PER_DAY = 86400.0
+INITIAL_CAPACITY = 16
+# Slopes smaller than this share of the reference range per year are "stable"
+STABLE_FRACTION_PER_YEAR = 0.1
+
+_RECORD = np.dtype([("t", "<f8"), ("v", "<f8")])
+_RANGE_WIDTH = {
+    key: float(marker["reference_range"]["max"] - marker["reference_range"]["min"]) or 1.0
+    for key, marker in zip(MARKER_KEYS, TRACKED_MARKERS)
+}
+
+
+def trends_root() -> Path:
+    return Path(settings.UPLOAD_PATH) / "blood" / "trends"
+
+
+def validate_patient_id(patient_id: str) -> str:
+    if not PATIENT_ID_PATTERN.match(patient_id):
+        raise ValueError("Invalid patient id")
+    return patient_id
+
+
+class MarkerSeries:
+    """Time-sorted values of one marker for one patient"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.times = np.empty(INITIAL_CAPACITY)
+        self.values = np.empty(INITIAL_CAPACITY)
+        self.size = 0
+        self.persisted = 0  # records of the log already loaded
+        self.t0: Optional[float] = None  # sums are kept in days since t0
+        self.sums = np.zeros(6)  # n, Σt, Σv, Σt², Σtv, Σv²
+
+    def __len__(self) -> int:
+        return self.size
+
+    def extend(self, times: np.ndarray, values: np.ndarray) -> None:
+        if not len(times):
+            return
+        if self.t0 is None:
+            self.t0 = float(times.min())
+        if self.size + len(times) > len(self.times):
+            capacity = max(len(self.times) * 2, self.size + len(times))
+            self.times = np.resize(self.times, capacity)
+            self.values = np.resize(self.values, capacity)
+
+        end = self.size + len(times)
+        self.times[self.size: end] = times
+        self.values[self.size: end] = values
+        if (self.size and times.min() < self.times[self.size - 1]) or np.any(np.diff(times) < 0):
+            # Back-dated results are rare; re-sort in place when they happen
+            order = np.argsort(self.times[:end], kind="stable")
+            self.times[:end] = self.times[:end][order]
+            self.values[:end] = self.values[:end][order]
+        self.size = end
+
+        t = (times - self.t0) / SECONDS_PER_DAY
+        self.sums += (len(t), t.sum(), values.sum(), (t * t).sum(), (t * values).sum(), (values * values).sum())
+
+    def stats(self) -> dict:
+        n, st, sv, stt, stv, svv = self.sums.tolist()
+        denominator = n * stt - st * st
+        slope = (n * stv - st * sv) / denominator if n >= 2 and denominator > 0 else 0.0
+        variance = max(svv / n - (sv / n) ** 2, 0.0) if n else 0.0
+        rate = 0.0
+        if self.size >= 2:
+            dt = float(self.times[self.size - 1] - self.times[self.size - 2]) / SECONDS_PER_DAY
+            if dt > 0:
+                rate = float(self.values[self.size - 1] - self.values[self.size - 2]) / dt
+        return {
+            "count": int(n),
+            "slope_per_day": slope,
+            "variance": variance,
+            "rate_of_change_per_day": rate,
+        }
+
+    def window(self, start: Optional[float], end: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        times = self.times[: self.size]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = self.size if end is None else int(np.searchsorted(times, end, side="right"))
+        return times[lo:hi], self.values[lo:hi]
+
+
+def classify_trend(key: str, slope_per_day: float, count: int) -> str:
+    """Direction-aware trend label for a tracked marker"""
+    if count < 2:
+        return "stable"
+    change = slope_per_day * 365.0 / _RANGE_WIDTH[key]
+    if abs(change) < STABLE_FRACTION_PER_YEAR:
+        return "stable"
+    return "worsening" if change * RISK_DIRECTION[key] > 0 else "improving"
+
+
+class TrendStore:
+    """In-memory index of marker series backed by per-series append logs"""
+
+    def __init__(self, root: Optional[Path] = None, max_series: int = 10000):
+        self.root = root
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str], MarkerSeries]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, patient_id: str, key: str) -> MarkerSeries:
+        # The id becomes a directory name
+        validate_patient_id(patient_id)
+        with self._lock:
+            series = self._series.get((patient_id, key))
+            if series is None:
+                path = self.root / patient_id / f"{key}.bin" if self.root else None
+                series = self._series[(patient_id, key)] = MarkerSeries(path)
+            self._series.move_to_end((patient_id, key))
+            # Only logged series can be dropped: their points are reloaded on the next read
+            while self.root and len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        return series
+
+    def _sync(self, series: MarkerSeries) -> None:
+        """Load log records appended since the last read (by any worker)"""
+        if series.path is None:
+            return
+        try:
+            size = series.path.stat().st_size // _RECORD.itemsize
+        except FileNotFoundError:
+            return
+        if size > series.persisted:
+            records = np.fromfile(
+                series.path, dtype=_RECORD, count=size - series.persisted,
+                offset=series.persisted * _RECORD.itemsize,
+            )
+            series.extend(records["t"], records["v"])
+            series.persisted += len(records)
+
+    def append(self, patient_id: str, key: str, points: List[Tuple[float, float]]) -> MarkerSeries:
+        """Add (timestamp, value) points to a series"""
+        series = self._get(patient_id, key)
+        records = np.array(points, dtype=_RECORD)
+        with self._lock:
+            if series.path is None:
+                series.extend(records["t"], records["v"])
+                return series
+            series.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(series.path, "ab") as log:
+                fcntl.flock(log, fcntl.LOCK_EX)
+                self._sync(series)
+                log.write(records.tobytes())
+            series.extend(records["t"], records["v"])
+            series.persisted += len(records)
+        return series
+
+    def summary(self, patient_id: str, key: str) -> dict:
+        series = self._get(patient_id, key)
+        with self._lock:
+            self._sync(series)
+            stats = series.stats()
+        stats["trend"] = classify_trend(key, stats["slope_per_day"], stats["count"])
+        return stats
+
+    def history(
+        self,
+        patient_id: str,
+        key: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Data points between start and end (inclusive), oldest first"""
+        series = self._get(patient_id, key)
+        with self._lock:
+            self._sync(series)
+            times, values = series.window(
+                start.timestamp() if start else None,
+                end.timestamp() if end else None,
+            )
+            if limit is not None:
+                times, values = times[-limit:], values[-limit:]
+            times, values = times.tolist(), values.tolist()
+        return [
+            {"date": datetime.fromtimestamp(t).isoformat(), "value": v}
+            for t, v in zip(times, values)
+        ]
+
+
+def record_results(patient_id: str, test_date: Optional[datetime], scored: dict) -> None:
+    """Append a scored panel to the patient's series and fill in trends"""
+    store = get_store()
+    timestamp = (test_date or datetime.now()).timestamp()
+    points: Dict[str, List[Tuple[float, float]]] = {}
+    for factor in scored["risk_factors"]:
+        if factor["key"] and factor["risk_level"] != "unknown":
+            points.setdefault(factor["key"], []).append((timestamp, factor["current_value"]))
+    for key, key_points in points.items():
+        store.append(patient_id, key, key_points)
+    for factor in scored["risk_factors"]:
+        if factor["key"] in points:
+            factor["trend"] = store.summary(patient_id, factor["key"])["trend"]
+
+
+_store: Optional[TrendStore] = None
+
+
+def get_store() -> TrendStore:
+    global _store
+    if _store is None:
+        _store = TrendStore(
+            trends_root() if settings.BLOOD_TRENDS_PERSIST else None,
+            settings.BLOOD_TRENDS_MAX_SERIES,
+        )
+    return _store
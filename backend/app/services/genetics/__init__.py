@@ -0,0 +1,3 @@
+# Genetics services (S4)
+
+
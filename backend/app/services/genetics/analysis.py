@@ -0,0 +1,190 @@
+"""
+Genetic risk analysis
+=====================
+Per-sample analysis (parsing, variant annotation, HTT repeat sizing and
+risk scoring) and a batch runner that spreads samples across a process
+pool and yields results as they finish. Each sample's latest result (or
+failure) is kept in its upload metadata under ``analysis``.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import settings
+from app.services.genetics import ingest, repeats, risk, storage
+
+ANALYSIS_ID_PREFIX = "analysis_"
+HTT_MIN_REPORTED_REPEATS = 27
+RISK_ORDER = ["reduced", "normal", "intermediate", "elevated", "high"]
+
+HTT_RISK_LEVELS = {
+    "intermediate": "intermediate",
+    "reduced_penetrance": "elevated",
+    "full_penetrance": "high",
+}
+
+RECOMMENDATIONS = {
+    "high": [
+        "Рекомендуется срочная консультация с генетиком",
+        "Рекомендуется регулярный мониторинг неврологического статуса",
+    ],
+    "elevated": [
+        "Рекомендуется регулярный мониторинг когнитивных функций",
+        "Консультация с генетиком для детального обсуждения",
+        "Поддержание здорового образа жизни снижает риски",
+    ],
+    "normal": [
+        "Значимых генетических факторов риска не выявлено",
+        "Поддержание здорового образа жизни снижает риски",
+    ],
+}
+
+
+def analysis_id(sequence_id: str) -> str:
+    return f"{ANALYSIS_ID_PREFIX}{sequence_id}"
+
+
+def sequence_id_of(analysis_id: str) -> str:
+    """Sample an analysis id belongs to (KeyError for a malformed id)"""
+    if not analysis_id.startswith(ANALYSIS_ID_PREFIX):
+        raise KeyError(analysis_id)
+    return analysis_id[len(ANALYSIS_ID_PREFIX):]
+
+
+def analyze_sequence_upload(sequence_id: str, owner: str) -> dict:
+    """Analyse one of ``owner``'s uploaded samples (runs inside a pool worker)"""
+    metadata = storage.read_owned_metadata(sequence_id, owner)
+    if metadata.get("status") != "parsed":
+        metadata = ingest.ingest_upload(sequence_id)
+    if metadata.get("status") != "parsed":
+        raise ValueError(metadata.get("error") or "Sequence could not be parsed")
+
+    if metadata["format"] == "vcf":
+        risk_factors = risk.annotate(storage.open_variant_index(sequence_id))
+    elif metadata["sequence_type"] in ("dna", "rna"):
+        risk_factors = _htt_repeat_factors(sequence_id)
+    else:
+        risk_factors = []
+
+    overall = max((factor["risk_level"] for factor in risk_factors), key=RISK_ORDER.index, default="normal")
+    if overall not in RECOMMENDATIONS:
+        overall = "normal"
+    elevated = [factor for factor in risk_factors if RISK_ORDER.index(factor["risk_level"]) > 1]
+
+    result = {
+        "id": analysis_id(sequence_id),
+        "sequence_id": sequence_id,
+        "submitted_at": datetime.now().isoformat(),
+        "status": "completed",
+        "overall_risk": overall,
+        "risk_factors": risk_factors,
+        "protein_structures": [],
+        "summary": f"Анализ выявил вариантов с повышенным риском: {len(elevated)}",
+        "recommendations": RECOMMENDATIONS[overall],
+    }
+    storage.update_metadata(sequence_id, analysis=result)
+    return result
+
+
+def _htt_repeat_factors(sequence_id: str) -> List[dict]:
+    longest = 0
+    for entry in storage.read_packed_index(sequence_id):
+        _, packed = storage.open_packed(sequence_id, entry["name"])
+        runs = repeats.scan_packed(packed, "CAG", HTT_MIN_REPORTED_REPEATS)
+        longest = max([longest] + [run.repeats for run in runs])
+    if not longest:
+        return []
+
+    size_class = repeats.classify_htt_cag(longest)
+    return [{
+        "gene": "HTT",
+        "variant": f"CAG repeat expansion ({longest} repeats)",
+        "risk_level": HTT_RISK_LEVELS.get(size_class, "normal"),
+        "associated_conditions": ["Huntington's disease"],
+        "population_frequency": 0.0,
+    }]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.GENETICS_BATCH_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def mark_processing(sequence_id: str) -> dict:
+    """Record that an analysis of the sample was started; returns the stored state"""
+    state = {"id": analysis_id(sequence_id), "sequence_id": sequence_id, "status": "processing"}
+    storage.update_metadata(sequence_id, analysis=state)
+    return state
+
+
+def _failure(sequence_id: str, exc: BaseException) -> str:
+    """Error message for a failed analysis, also stored as the sample's analysis"""
+    if isinstance(exc, KeyError):
+        # Missing or someone else's sample: nothing of ours to update
+        return "Sequence not found"
+    if isinstance(exc, BrokenProcessPool):
+        shutdown_pool()
+        error = "Analysis worker crashed"
+    else:
+        error = str(exc) or type(exc).__name__
+    try:
+        storage.update_metadata(
+            sequence_id,
+            analysis={"id": analysis_id(sequence_id), "sequence_id": sequence_id, "status": "failed", "error": error},
+        )
+    except (KeyError, OSError):
+        pass
+    return error
+
+
+async def run_analysis(sequence_id: str, owner: str) -> None:
+    """Analyse one sample in the process pool; the result or failure is stored with it"""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(get_pool(), analyze_sequence_upload, sequence_id, owner)
+    except Exception as exc:
+        _failure(sequence_id, exc)
+
+
+async def analyze_batch(sequence_ids: List[str], owner: str) -> AsyncIterator[dict]:
+    """Analyse ``owner``'s samples in the process pool, yielding one event per sample"""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    pending = {}
+    for sequence_id in dict.fromkeys(sequence_ids):
+        future = loop.run_in_executor(pool, analyze_sequence_upload, sequence_id, owner)
+        pending[future] = sequence_id
+
+    total = len(pending)
+    completed = 0
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            sequence_id = pending.pop(future)
+            completed += 1
+            event = {"sequence_id": sequence_id, "completed": completed, "total": total}
+            try:
+                event.update(status="completed", result=future.result())
+            except Exception as exc:
+                event.update(status="failed", error=_failure(sequence_id, exc))
+            yield event
@@ -0,0 +1,109 @@
+"""
+Genetic upload ingestion
+========================
+Parses a stored upload in a worker thread, records progress in the
+upload metadata and stores a summary of what was found.
+"""
+
+import fcntl
+import zlib
+from typing import Iterable
+
+from app.services.genetics import parsers, risk, storage
+from app.services.genetics.packed import PackedSequence
+from app.services.genetics.variants import VariantIndex
+
+MAX_LISTED_RECORDS = 100
+INGEST_LOCK_FILE = ".ingest.lock"
+
+
+def ingest_upload(sequence_id: str) -> dict:
+    """Parse an uploaded file once, even if several processes ask for it"""
+    with open(storage.sequence_dir(sequence_id) / INGEST_LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        metadata = storage.read_metadata(sequence_id)
+        if metadata.get("status") in ("parsed", "failed"):
+            return metadata
+        return _ingest(sequence_id, metadata)
+
+
+def _ingest(sequence_id: str, metadata: dict) -> dict:
+    """Parse an uploaded file and store its summary in the metadata"""
+    fmt = metadata["format"]
+
+    def report(progress: parsers.ParseProgress) -> None:
+        storage.update_metadata(
+            sequence_id,
+            progress={
+                "bytes_read": progress.bytes_read,
+                "total_bytes": progress.total_bytes,
+                "records": progress.records,
+                "fraction": progress.fraction,
+            },
+        )
+
+    storage.update_metadata(sequence_id, status="parsing")
+    try:
+        with open(storage.upload_path(sequence_id), "rb") as raw:
+            records = parsers.parse_stream(raw, fmt, report)
+            if fmt == "vcf":
+                summary = _index_variants(sequence_id, records)
+            elif metadata["sequence_type"] in ("dna", "rna"):
+                summary = _pack_sequences(sequence_id, records, metadata["sequence_type"] == "rna")
+            else:
+                summary = _summarise_sequences(records)
+    except (ValueError, EOFError, OSError, zlib.error) as exc:
+        # Malformed or truncated input; gzip.BadGzipFile is an OSError
+        return storage.update_metadata(sequence_id, status="failed", error=str(exc) or type(exc).__name__)
+    except BaseException:
+        # Never leave the upload in "parsing": nothing would retry it
+        storage.update_metadata(sequence_id, status="failed", error="Internal error while parsing")
+        raise
+
+    return storage.update_metadata(sequence_id, status="parsed", summary=summary)
+
+
+def _summarise_sequences(records: Iterable) -> dict:
+    count = total_length = 0
+    listed = []
+    for record in records:
+        count += 1
+        total_length += len(record.sequence)
+        if len(listed) < MAX_LISTED_RECORDS:
+            name = getattr(record, "id", None) or getattr(record, "locus", "")
+            listed.append({"name": name, "length": len(record.sequence)})
+    return {"records": count, "total_length": total_length, "sequences": listed}
+
+
+def _pack_sequences(sequence_id: str, records: Iterable, rna: bool) -> dict:
+    """Write every record to a 2-bit packed file as it is parsed"""
+    directory = storage.packed_dir(sequence_id)
+    directory.mkdir(exist_ok=True)
+    entries = []
+    for index, record in enumerate(records):
+        name = getattr(record, "id", None) or getattr(record, "locus", "") or f"record_{index}"
+        packed = PackedSequence.from_string(record.sequence, rna=rna)
+        file_name = f"{index}.nt2"
+        packed.save(directory / file_name)
+        entries.append({"name": name, "length": len(packed), "file": file_name})
+    storage.write_packed_index(sequence_id, entries)
+
+    return {
+        "records": len(entries),
+        "total_length": sum(entry["length"] for entry in entries),
+        "sequences": [
+            {"name": entry["name"], "length": entry["length"]}
+            for entry in entries[:MAX_LISTED_RECORDS]
+        ],
+    }
+
+
+def _index_variants(sequence_id: str, records: Iterable[parsers.VcfRecord]) -> dict:
+    """Build and persist the variant interval index next to the upload"""
+    index = VariantIndex.build(records)
+    index.save(storage.variants_dir(sequence_id))
+    return {
+        "records": len(index),
+        "chromosomes": {chrom: len(chrom_index) for chrom, chrom_index in index.chromosomes.items()},
+        "risk_genes": risk.gene_variant_counts(index),
+    }
@@ -0,0 +1,241 @@
+"""
+2-bit packed nucleotide store
+=============================
+DNA/RNA sequences packed four bases per byte (A=0, C=1, G=2, T/U=3) with
+a side table of runs for N and other IUPAC ambiguity codes. Packed
+sequences are saved to flat files that are opened with ``numpy.memmap``,
+so slicing a region only touches the bytes that cover it.
+
+File layout (little endian)::
+
+    magic "AMN2BIT\\0" | version u32 | flags u32 | length u64 | runs u64
+    packed bases (ceil(length / 4) bytes, zero padded to 8 bytes)
+    run starts int64[runs] | run ends int64[runs] | run codes uint8[runs]
+"""
+
+import struct
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"AMN2BIT\0"
+VERSION = 1
+FLAG_RNA = 1
+HEADER = struct.Struct("<8sIIQQ")
+
+AMBIGUOUS = 255
+KMER_BLOCK = 1 << 22  # bases per vectorised k-mer block
+MAX_KMER = 12
+
+_ENCODE = np.full(256, AMBIGUOUS, dtype=np.uint8)
+for _code, _bases in enumerate(("Aa", "Cc", "Gg", "TtUu")):
+    for _base in _bases:
+        _ENCODE[ord(_base)] = _code
+
+# _UNPACK[byte] -> the four 2-bit codes stored in that byte
+_UNPACK = np.stack(
+    [(np.arange(256, dtype=np.uint16) >> shift) & 3 for shift in (6, 4, 2, 0)],
+    axis=1,
+).astype(np.uint8)
+
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord("a"): ord("z") + 1] -= 32
+
+_DNA_LETTERS = np.frombuffer(b"ACGT", dtype=np.uint8)
+_RNA_LETTERS = np.frombuffer(b"ACGU", dtype=np.uint8)
+
+_COMPLEMENT = np.arange(256, dtype=np.uint8)
+for _a, _b in ("AT", "CG", "RY", "KM", "BV", "DH"):
+    _COMPLEMENT[ord(_a)], _COMPLEMENT[ord(_b)] = ord(_b), ord(_a)
+    _COMPLEMENT[ord(_a.lower())], _COMPLEMENT[ord(_b.lower())] = ord(_b.lower()), ord(_a.lower())
+_COMPLEMENT[ord("U")], _COMPLEMENT[ord("u")] = ord("A"), ord("a")
+
+
+class PackedSequence:
+    """Nucleotide sequence stored at 2 bits per base"""
+
+    def __init__(
+        self,
+        packed: np.ndarray,
+        length: int,
+        run_starts: np.ndarray,
+        run_ends: np.ndarray,
+        run_codes: np.ndarray,
+        rna: bool = False,
+    ):
+        self.packed = packed
+        self.length = length
+        self.run_starts = run_starts
+        self.run_ends = run_ends
+        self.run_codes = run_codes
+        self.rna = rna
+
+    @classmethod
+    def from_string(cls, sequence: str, rna: Optional[bool] = None) -> "PackedSequence":
+        """Pack a nucleotide string (ambiguity codes go to the run table)"""
+        raw = np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)
+        codes = _ENCODE[raw]
+        ambiguous = codes == AMBIGUOUS
+        run_starts, run_ends, run_codes = _ambiguous_runs(_UPPER[raw], ambiguous)
+
+        codes = np.where(ambiguous, 0, codes)
+        padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+        padded[: len(codes)] = codes
+        quads = padded.reshape(-1, 4)
+        packed = (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+
+        if rna is None:
+            rna = "U" in sequence or "u" in sequence
+        return cls(packed.astype(np.uint8), len(codes), run_starts, run_ends, run_codes, rna)
+
+    @classmethod
+    def open(cls, path: str | Path) -> "PackedSequence":
+        """Memory-map a packed sequence file"""
+        with open(path, "rb") as f:
+            magic, version, flags, length, runs = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a packed sequence file: {path}")
+
+        offset = HEADER.size
+        packed_size = -(-length // 4)
+        packed = _memmap(path, np.uint8, offset, packed_size)
+        offset += _align8(packed_size)
+        run_starts = _memmap(path, np.int64, offset, runs)
+        offset += runs * 8
+        run_ends = _memmap(path, np.int64, offset, runs)
+        offset += runs * 8
+        run_codes = _memmap(path, np.uint8, offset, runs)
+        return cls(packed, length, run_starts, run_ends, run_codes, bool(flags & FLAG_RNA))
+
+    def save(self, path: str | Path) -> None:
+        runs = len(self.run_starts)
+        flags = FLAG_RNA if self.rna else 0
+        packed = np.asarray(self.packed, dtype=np.uint8)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, flags, self.length, runs))
+            f.write(packed.tobytes())
+            f.write(b"\0" * (_align8(len(packed)) - len(packed)))
+            f.write(np.asarray(self.run_starts, dtype="<i8").tobytes())
+            f.write(np.asarray(self.run_ends, dtype="<i8").tobytes())
+            f.write(np.asarray(self.run_codes, dtype=np.uint8).tobytes())
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        return self.packed.nbytes + self.run_starts.nbytes + self.run_ends.nbytes + self.run_codes.nbytes
+
+    def __getitem__(self, key) -> str:
+        if isinstance(key, int):
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError("sequence index out of range")
+            return self.fetch(key, key + 1)
+        start, stop, step = key.indices(self.length)
+        if step != 1:
+            return self.fetch(0, self.length)[key]
+        return self.fetch(start, stop)
+
+    def codes(self, start: int = 0, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """2-bit codes for [start, end) and a boolean mask of ambiguous bases"""
+        start, end = self._bounds(start, end)
+        first, last = start // 4, -(-end // 4)
+        codes = _UNPACK[self.packed[first:last]].ravel()
+        codes = codes[start - first * 4: end - first * 4]
+
+        ambiguous = np.zeros(end - start, dtype=bool)
+        positions, _ = self._run_positions(start, end)
+        ambiguous[positions] = True
+        return codes, ambiguous
+
+    def ascii(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Decoded bases for [start, end) as an array of ASCII bytes"""
+        start, end = self._bounds(start, end)
+        codes, _ = self.codes(start, end)
+        letters = (_RNA_LETTERS if self.rna else _DNA_LETTERS)[codes]
+        positions, values = self._run_positions(start, end)
+        letters[positions] = values
+        return letters
+
+    def fetch(self, start: int = 0, end: Optional[int] = None) -> str:
+        return self.ascii(start, end).tobytes().decode("ascii")
+
+    def reverse_complement(self, start: int = 0, end: Optional[int] = None) -> str:
+        letters = _COMPLEMENT[self.ascii(start, end)][::-1]
+        if self.rna:
+            letters[letters == ord("T")] = ord("U")
+        return letters.tobytes().decode("ascii")
+
+    def kmer_counts(self, k: int, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        Count k-mers in [start, end).
+
+        Returns an array of length 4**k indexed by the 2-bit encoding of the
+        k-mer (see ``decode_kmer``); windows containing ambiguous bases are
+        skipped.
+        """
+        if not 1 <= k <= MAX_KMER:
+            raise ValueError(f"k must be between 1 and {MAX_KMER}")
+        start, end = self._bounds(start, end)
+        counts = np.zeros(4 ** k, dtype=np.int64)
+        weights = (4 ** np.arange(k - 1, -1, -1)).astype(np.int64)
+
+        for block_start in range(start, max(end - k + 1, start), KMER_BLOCK):
+            block_end = min(block_start + KMER_BLOCK + k - 1, end)
+            codes, ambiguous = self.codes(block_start, block_end)
+            if len(codes) < k:
+                break
+            windows = np.lib.stride_tricks.sliding_window_view(codes.astype(np.int64), k)
+            index = windows @ weights
+            bad = np.concatenate(([0], np.cumsum(ambiguous, dtype=np.int64)))
+            valid = (bad[k:] - bad[:-k]) == 0
+            counts += np.bincount(index[valid], minlength=4 ** k)
+        return counts
+
+    def _bounds(self, start: int, end: Optional[int]) -> Tuple[int, int]:
+        end = self.length if end is None else min(end, self.length)
+        start = max(start, 0)
+        if start > end:
+            raise IndexError("invalid sequence region")
+        return start, end
+
+    def _run_positions(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Offsets (relative to start) and ASCII codes of ambiguous bases"""
+        lo = int(np.searchsorted(self.run_ends, start, side="right"))
+        hi = int(np.searchsorted(self.run_starts, end, side="left"))
+        run_starts = np.maximum(self.run_starts[lo:hi], start) - start
+        lengths = np.minimum(self.run_ends[lo:hi], end) - start - run_starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(run_starts - offsets, lengths) + np.arange(lengths.sum())
+        return positions, np.repeat(np.asarray(self.run_codes[lo:hi]), lengths)
+
+
+def decode_kmer(index: int, k: int, rna: bool = False) -> str:
+    letters = "ACGU" if rna else "ACGT"
+    return "".join(letters[(index >> (2 * (k - 1 - i))) & 3] for i in range(k))
+
+
+def _ambiguous_runs(raw: np.ndarray, ambiguous: np.ndarray):
+    """Collapse ambiguous positions into (start, end, code) runs"""
+    positions = np.flatnonzero(ambiguous)
+    if len(positions) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.copy(), np.zeros(0, dtype=np.uint8)
+    values = raw[positions]
+    breaks = np.flatnonzero((np.diff(positions) != 1) | (np.diff(values) != 0)) + 1
+    starts = positions[np.concatenate(([0], breaks))]
+    ends = positions[np.concatenate((breaks - 1, [len(positions) - 1]))] + 1
+    return starts.astype(np.int64), ends.astype(np.int64), values[np.concatenate(([0], breaks))]
+
+
+def _memmap(path, dtype, offset: int, count: int) -> np.ndarray:
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r", offset=offset, shape=(count,))
+
+
+def _align8(size: int) -> int:
+    return -(-size // 8) * 8
@@ -0,0 +1,264 @@
+"""
+Streaming sequence parsers
+==========================
+Generator-based FASTA, GenBank and VCF parsers that read an upload
+stream chunk by chunk (plain, gzip or bgzip) and never hold the whole
+file in memory.
+"""
+
+import gzip
+import io
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+PROGRESS_INTERVAL_BYTES = 8 << 20  # report every 8 MiB of input
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+FORMAT_EXTENSIONS = {
+    ".fasta": "fasta",
+    ".fa": "fasta",
+    ".gb": "genbank",
+    ".vcf": "vcf",
+}
+COMPRESSED_SUFFIXES = (".gz", ".bgz")
+
+
+@dataclass
+class ParseProgress:
+    """Parse progress measured on the raw (possibly compressed) input"""
+    bytes_read: int
+    total_bytes: Optional[int]
+    records: int
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(self.bytes_read / self.total_bytes, 1.0)
+
+
+ProgressCallback = Callable[[ParseProgress], None]
+
+
+class FastaRecord(NamedTuple):
+    id: str
+    description: str
+    sequence: str
+
+
+class GenBankRecord(NamedTuple):
+    locus: str
+    definition: str
+    sequence: str
+
+
+class VcfRecord(NamedTuple):
+    chrom: str
+    pos: int  # 1-based
+    id: str
+    ref: str
+    alts: Tuple[str, ...]
+    qual: Optional[float]
+    filter: str
+    info: str
+    genotype: Optional[str] = None  # GT of the first sample, e.g. "0/1"; None when absent
+
+
+def detect_format(filename: str | None) -> Optional[str]:
+    """Detect sequence format from file name, ignoring .gz/.bgz suffixes"""
+    if not filename:
+        return None
+    name = filename.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return FORMAT_EXTENSIONS.get(os.path.splitext(name)[1])
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw stream wrapper that counts bytes consumed from the source"""
+
+    def __init__(self, raw: BinaryIO):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.bytes_read += n
+        return n
+
+
+class _LineStream:
+    """Text line iterator over a raw upload with progress reporting"""
+
+    def __init__(self, raw: BinaryIO, on_progress: Optional[ProgressCallback] = None):
+        self.total_bytes = _stream_size(raw)
+        self.records = 0
+        self._counter = _CountingReader(raw)
+        self._on_progress = on_progress
+        self._next_report = PROGRESS_INTERVAL_BYTES
+
+        buffered = io.BufferedReader(self._counter, buffer_size=CHUNK_SIZE)
+        if buffered.peek(2)[:2] == GZIP_MAGIC:
+            # GzipFile reads concatenated members, which covers bgzip blocks
+            buffered = io.BufferedReader(
+                gzip.GzipFile(fileobj=buffered, mode="rb"),
+                buffer_size=CHUNK_SIZE,
+            )
+        self._text = io.TextIOWrapper(buffered, encoding="utf-8", errors="replace")
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self._text:
+            yield line.rstrip("\r\n")
+
+    def record_done(self) -> None:
+        self.records += 1
+        if self._on_progress and self._counter.bytes_read >= self._next_report:
+            self._next_report = self._counter.bytes_read + PROGRESS_INTERVAL_BYTES
+            self._on_progress(self.progress())
+
+    def finish(self) -> None:
+        if self._on_progress:
+            self._on_progress(self.progress())
+
+    def progress(self) -> ParseProgress:
+        return ParseProgress(
+            bytes_read=self._counter.bytes_read,
+            total_bytes=self.total_bytes,
+            records=self.records,
+        )
+
+
+def _stream_size(raw: BinaryIO) -> Optional[int]:
+    try:
+        position = raw.tell()
+        size = raw.seek(0, os.SEEK_END)
+        raw.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def parse_fasta(
+    raw: BinaryIO,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Iterator[FastaRecord]:
+    """Yield FASTA records from a binary stream"""
+    lines = _LineStream(raw, on_progress)
+    header: Optional[str] = None
+    chunks: List[str] = []
+
+    for line in lines:
+        if line.startswith(">"):
+            if header is not None:
+                yield _fasta_record(header, chunks)
+                lines.record_done()
+            header, chunks = line[1:].strip(), []
+        elif header is not None and line and not line.startswith(";"):
+            chunks.append(line.strip().upper())
+
+    if header is not None:
+        yield _fasta_record(header, chunks)
+        lines.record_done()
+    lines.finish()
+
+
+def _fasta_record(header: str, chunks: List[str]) -> FastaRecord:
+    record_id, _, description = header.partition(" ")
+    return FastaRecord(record_id, description.strip(), "".join(chunks))
+
+
+def parse_genbank(
+    raw: BinaryIO,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Iterator[GenBankRecord]:
+    """Yield GenBank records (locus, definition, ORIGIN sequence)"""
+    lines = _LineStream(raw, on_progress)
+    locus = definition = ""
+    chunks: List[str] = []
+    in_origin = in_definition = False
+
+    for line in lines:
+        if line.startswith("//"):
+            yield GenBankRecord(locus, definition, "".join(chunks))
+            lines.record_done()
+            locus = definition = ""
+            chunks = []
+            in_origin = in_definition = False
+        elif in_origin:
+            chunks.append("".join(line.split()[1:]).upper())
+        elif line.startswith("LOCUS"):
+            fields = line.split()
+            locus = fields[1] if len(fields) > 1 else ""
+        elif line.startswith("DEFINITION"):
+            definition = line[len("DEFINITION"):].strip()
+            in_definition = True
+        elif line.startswith("ORIGIN"):
+            in_origin = True
+        elif in_definition and line.startswith(" "):
+            definition = f"{definition} {line.strip()}"
+        else:
+            in_definition = False
+
+    lines.finish()
+
+
+def parse_vcf(
+    raw: BinaryIO,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Iterator[VcfRecord]:
+    """Yield VCF variant records with the first sample's GT; other sample data is skipped"""
+    lines = _LineStream(raw, on_progress)
+
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t", 8)
+        if len(fields) < 8:
+            raise ValueError(f"Malformed VCF line: {line[:80]!r}")
+        chrom, pos, record_id, ref, alt, qual, filter_, info = fields[:8]
+        genotype = None
+        if len(fields) == 9:
+            keys, _, samples = fields[8].partition("\t")
+            # GT, when present, is always the first FORMAT key
+            if samples and keys.split(":", 1)[0] == "GT":
+                genotype = samples.split("\t", 1)[0].split(":", 1)[0]
+        yield VcfRecord(
+            chrom=chrom,
+            pos=int(pos),
+            id=record_id,
+            ref=ref.upper(),
+            alts=tuple(alt.upper().split(",")) if alt != "." else (),
+            qual=float(qual) if qual != "." else None,
+            filter=filter_,
+            info=info,
+            genotype=genotype,
+        )
+        lines.record_done()
+
+    lines.finish()
+
+
+PARSERS = {
+    "fasta": parse_fasta,
+    "genbank": parse_genbank,
+    "vcf": parse_vcf,
+}
+
+
+def parse_stream(
+    raw: BinaryIO,
+    fmt: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Iterator:
+    """Dispatch to the parser for a detected format"""
+    return PARSERS[fmt](raw, on_progress)
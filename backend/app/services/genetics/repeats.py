@@ -0,0 +1,165 @@
+"""
+Tandem repeat detection
+=======================
+Finds and sizes runs of a short motif (CAG for HTT by default) with NumPy
+over whole batches: reads are concatenated into one byte buffer with
+separators, motif hits are computed with shifted comparisons, and runs
+are found per reading frame with ``np.diff``.
+"""
+
+import re
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from app.services.genetics.packed import PackedSequence
+
+MOTIF_PATTERN = re.compile(r"^[ACGT]{1,6}$")
+PACKED_CHUNK = 1 << 24
+
+# HTT CAG repeat size classes (repeats, upper bound inclusive)
+HTT_CAG_CLASSES = (
+    (26, "normal"),
+    (35, "intermediate"),
+    (39, "reduced_penetrance"),
+)
+HTT_FULL_PENETRANCE = "full_penetrance"
+
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord("a"): ord("z") + 1] -= 32
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+class RepeatRun(NamedTuple):
+    read: int
+    start: int  # offset within the read, 0-based
+    end: int  # exclusive
+    motif: str
+    repeats: int
+
+
+def validate_motif(motif: str) -> str:
+    motif = motif.upper()
+    if not MOTIF_PATTERN.match(motif):
+        raise ValueError("Motif must be 1-6 bases of A, C, G, T")
+    return motif
+
+
+def reverse_complement(motif: str) -> str:
+    return motif.translate(_COMPLEMENT)[::-1]
+
+
+def scan_buffer(buffer: np.ndarray, motif: str, min_repeats: int = 3) -> np.ndarray:
+    """
+    Find motif runs in an ASCII buffer.
+
+    Returns an (n, 2) int64 array of (start, repeats) rows sorted by start.
+    """
+    period = len(motif)
+    n = len(buffer) - period + 1
+    if n <= 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    hits = np.ones(n, dtype=bool)
+    for offset, base in enumerate(motif.encode("ascii")):
+        hits &= buffer[offset: offset + n] == base
+
+    found = []
+    for frame in range(period):
+        framed = hits[frame::period].view(np.int8)
+        edges = np.diff(np.concatenate(([0], framed, [0])))
+        starts = np.flatnonzero(edges == 1)
+        repeats = np.flatnonzero(edges == -1) - starts
+        keep = repeats >= min_repeats
+        found.append(np.stack((frame + starts[keep] * period, repeats[keep]), axis=1))
+
+    runs = np.concatenate(found).astype(np.int64)
+    return runs[np.argsort(runs[:, 0], kind="stable")]
+
+
+def scan_reads(
+    reads: Sequence[str],
+    motif: str = "CAG",
+    min_repeats: int = 3,
+    both_strands: bool = False,
+) -> List[RepeatRun]:
+    """Scan a batch of reads in one vectorised pass per motif"""
+    motif = validate_motif(motif)
+    if not reads:
+        return []
+
+    lengths = np.fromiter((len(read) for read in reads), dtype=np.int64, count=len(reads))
+    read_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+    joined = "\n".join(reads).encode("ascii", errors="replace")
+    buffer = _UPPER[np.frombuffer(joined, dtype=np.uint8)]
+
+    motifs = [motif]
+    if both_strands and reverse_complement(motif) != motif:
+        motifs.append(reverse_complement(motif))
+
+    results: List[RepeatRun] = []
+    for current in motifs:
+        runs = scan_buffer(buffer, current, min_repeats)
+        read_index = np.searchsorted(read_starts, runs[:, 0], side="right") - 1
+        offsets = runs[:, 0] - read_starts[read_index]
+        for read, start, repeats in zip(read_index.tolist(), offsets.tolist(), runs[:, 1].tolist()):
+            results.append(RepeatRun(read, start, start + repeats * len(current), current, repeats))
+    results.sort(key=lambda run: (run.read, run.start))
+    return results
+
+
+def longest_per_read(runs: Sequence[RepeatRun], n_reads: int) -> np.ndarray:
+    """Longest run (in repeats) for each read, 0 when none was found"""
+    longest = np.zeros(n_reads, dtype=np.int64)
+    if runs:
+        reads = np.fromiter((run.read for run in runs), dtype=np.int64, count=len(runs))
+        repeats = np.fromiter((run.repeats for run in runs), dtype=np.int64, count=len(runs))
+        np.maximum.at(longest, reads, repeats)
+    return longest
+
+
+def scan_packed(packed: PackedSequence, motif: str = "CAG", min_repeats: int = 3) -> List[RepeatRun]:
+    """Scan a packed sequence chunk by chunk, merging runs across chunk edges"""
+    motif = validate_motif(motif)
+    period = len(motif)
+    runs: List[List[int]] = []  # [start, repeats]
+    open_ends = {}  # end position -> index into runs, for merging across chunks
+
+    for chunk_start in range(0, len(packed), PACKED_CHUNK):
+        chunk_end = min(chunk_start + PACKED_CHUNK, len(packed))
+        # Overlap by period - 1 bases so copies that straddle the edge are seen
+        buffer = packed.ascii(chunk_start, min(chunk_end + period - 1, len(packed)))
+        chunk_runs = scan_buffer(buffer, motif, min_repeats=1)
+        span = chunk_end - chunk_start
+        starts, ends = chunk_runs[:, 0], chunk_runs[:, 0] + chunk_runs[:, 1] * period
+        # Only long runs and runs touching a chunk edge can matter
+        chunk_runs = chunk_runs[
+            (starts < span)
+            & ((chunk_runs[:, 1] >= min_repeats) | (starts < period) | (ends >= span))
+        ]
+        edge_ends = {}
+        for start, repeats in chunk_runs.tolist():
+            start += chunk_start
+            if start in open_ends:
+                index = open_ends[start]
+                runs[index][1] += repeats
+            else:
+                index = len(runs)
+                runs.append([start, repeats])
+            end = runs[index][0] + runs[index][1] * period
+            if end >= chunk_end:
+                edge_ends[end] = index
+        open_ends = edge_ends
+
+    return [
+        RepeatRun(0, start, start + repeats * period, motif, repeats)
+        for start, repeats in runs
+        if repeats >= min_repeats
+    ]
+
+
+def classify_htt_cag(repeats: int) -> str:
+    for upper, label in HTT_CAG_CLASSES:
+        if repeats <= upper:
+            return label
+    return HTT_FULL_PENETRANCE
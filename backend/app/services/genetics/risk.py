@@ -0,0 +1,156 @@
+"""
+Local risk-variant table
+========================
+Neurodegeneration risk genes and known risk alleles (GRCh38), used to
+annotate an uploaded VCF through its ``VariantIndex``. Only APOE is
+called at the allele level: ε2/ε3/ε4 comes from the sample's GT at
+rs429358 and rs7412 together and needs both sites genotyped. SNCA and
+HTT are reported as variant counts over their gene regions only; SNCA
+point mutations are not in the table, and the HTT CAG expansion is not
+visible in a VCF (see ``repeats``).
+"""
+
+import re
+from typing import List, Optional
+
+from app.services.genetics.variants import VariantIndex
+
+RISK_GENES = [
+    {
+        "gene": "APOE",
+        "chrom": "19",
+        "start": 44905796,
+        "end": 44909393,
+        "associated_conditions": ["Alzheimer's disease", "Cardiovascular disease"],
+    },
+    {
+        "gene": "SNCA",
+        "chrom": "4",
+        "start": 89700345,
+        "end": 89838304,
+        "associated_conditions": ["Parkinson's disease"],
+    },
+    {
+        "gene": "HTT",
+        "chrom": "4",
+        "start": 3074510,
+        "end": 3243960,
+        "associated_conditions": ["Huntington's disease"],
+    },
+]
+
+# The APOE haplotype sites; ``annotate`` calls the genotype from both together
+RISK_VARIANTS = [
+    {
+        "gene": "APOE",
+        "rsid": "rs429358",
+        "chrom": "19",
+        "pos": 44908684,
+        "ref": "T",
+        "alt": "C",
+        "variant": "ε4",
+        "risk_level": "elevated",
+        "associated_conditions": ["Alzheimer's disease", "Cardiovascular disease"],
+        "population_frequency": 0.14,
+    },
+    {
+        "gene": "APOE",
+        "rsid": "rs7412",
+        "chrom": "19",
+        "pos": 44908822,
+        "ref": "C",
+        "alt": "T",
+        "variant": "ε2",
+        "risk_level": "reduced",
+        "associated_conditions": ["Alzheimer's disease"],
+        "population_frequency": 0.08,
+    },
+]
+
+
+# APOE genotype from the two defining sites (rs429358 C = ε4, rs7412 T = ε2),
+# assuming no ε1 haplotype; ε3/ε3 is the reference and reported as nothing
+APOE_GENOTYPES = {
+    "ε2/ε2": {"risk_level": "reduced", "population_frequency": 0.007},
+    "ε2/ε3": {"risk_level": "reduced", "population_frequency": 0.12},
+    "ε2/ε4": {"risk_level": "elevated", "population_frequency": 0.026},
+    "ε3/ε4": {"risk_level": "elevated", "population_frequency": 0.21},
+    "ε4/ε4": {"risk_level": "high", "population_frequency": 0.02},
+}
+
+
+def genotype_alleles(genotype: Optional[str]) -> Optional[List[int]]:
+    """Allele indices of a GT ("0/1", "1|1", "1"); None when not called"""
+    if not genotype:
+        return None
+    alleles = re.split(r"[/|]", genotype)
+    if any(allele == "." for allele in alleles):
+        return None
+    try:
+        return [int(allele) for allele in alleles]
+    except ValueError:
+        return None
+
+
+def alt_copies(index: VariantIndex, known: dict) -> Optional[int]:
+    """Copies of a known ALT allele in the sample, or None when the site is not genotyped
+
+    A record at the position with a called GT genotypes the site; 0/0 calls
+    and gVCF reference blocks (``<NON_REF>``, ``<*>``) give 0 copies.
+    """
+    genotyped = False
+    for variant in index.region(known["chrom"], known["pos"], known["pos"]):
+        if variant["pos"] != known["pos"]:
+            continue
+        alleles = genotype_alleles(variant["genotype"])
+        if alleles is None:
+            continue
+        genotyped = True
+        if known["alt"] in variant["alts"]:
+            return alleles.count(variant["alts"].index(known["alt"]) + 1)
+    return 0 if genotyped else None
+
+
+def apoe_genotype(index: VariantIndex) -> Optional[str]:
+    """"ε3/ε4" style APOE genotype; None unless both sites are genotyped consistently"""
+    e4 = alt_copies(index, _site("rs429358"))
+    e2 = alt_copies(index, _site("rs7412"))
+    if e4 is None or e2 is None or e2 + e4 > 2:
+        return None
+    return "/".join(["ε2"] * e2 + ["ε3"] * (2 - e2 - e4) + ["ε4"] * e4)
+
+
+def _site(rsid: str) -> dict:
+    return next(known for known in RISK_VARIANTS if known["rsid"] == rsid)
+
+
+def annotate(index: VariantIndex) -> List[dict]:
+    """Risk factors carried by the sample: its APOE genotype, when not ε3/ε3"""
+    factors = []
+    genotype = apoe_genotype(index)
+    if genotype in APOE_GENOTYPES:
+        factors.append({
+            "gene": "APOE",
+            "variant": genotype,
+            "associated_conditions": sorted({
+                condition
+                for known in RISK_VARIANTS
+                if known["gene"] == "APOE" and known["variant"] in genotype
+                for condition in known["associated_conditions"]
+            }),
+            "rsid": "rs429358,rs7412",
+            **APOE_GENOTYPES[genotype],
+        })
+    return factors
+
+
+def gene_variant_counts(index: VariantIndex) -> List[dict]:
+    """Number of uploaded variants falling inside each risk gene"""
+    return [
+        {
+            "gene": gene["gene"],
+            "region": f"{gene['chrom']}:{gene['start']}-{gene['end']}",
+            "variants": index.count(gene["chrom"], gene["start"], gene["end"]),
+        }
+        for gene in RISK_GENES
+    ]
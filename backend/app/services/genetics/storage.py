@@ -0,0 +1,149 @@
+"""
+Genetic upload storage
+======================
+On-disk layout for uploaded sequence files: one directory per
+sequence id holding the original upload, derived artefacts and a small
+JSON metadata file.
+"""
+
+import json
+import os
+import re
+import shutil
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+
+from app.core.config import settings
+from app.services.genetics.packed import PackedSequence
+from app.services.genetics.variants import INDEX_FILE, VariantIndex
+
+SEQUENCE_ID_PATTERN = re.compile(r"^seq_[0-9a-f]{12}$")
+METADATA_FILE = "meta.json"
+PACKED_DIR = "packed"
+PACKED_INDEX_FILE = "index.json"
+VARIANTS_DIR = "variants"
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def upload_root() -> Path:
+    return Path(settings.UPLOAD_PATH) / "genetics"
+
+
+def new_sequence_id() -> str:
+    return f"seq_{uuid.uuid4().hex[:12]}"
+
+
+def sequence_dir(sequence_id: str) -> Path:
+    """Directory for a sequence id (ids are validated against traversal)"""
+    if not SEQUENCE_ID_PATTERN.match(sequence_id):
+        raise KeyError(sequence_id)
+    return upload_root() / sequence_id
+
+
+def upload_path(sequence_id: str) -> Path:
+    metadata = read_metadata(sequence_id)
+    return sequence_dir(sequence_id) / metadata["stored_as"]
+
+
+def save_upload(sequence_id: str, filename: str, source: BinaryIO) -> Path:
+    """Copy an upload stream to disk in fixed-size chunks"""
+    directory = sequence_dir(sequence_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffixes = [suffix.lower() for suffix in Path(filename).suffixes]
+    keep = 2 if suffixes and suffixes[-1] in (".gz", ".bgz") else 1
+    stored_as = "upload" + "".join(suffixes[-keep:])
+    path = directory / stored_as
+    with open(path, "wb") as target:
+        shutil.copyfileobj(source, target, UPLOAD_CHUNK_SIZE)
+    return path
+
+
+def read_metadata(sequence_id: str) -> dict:
+    path = sequence_dir(sequence_id) / METADATA_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(sequence_id) from None
+
+
+def write_metadata(sequence_id: str, metadata: dict) -> None:
+    """Atomically replace the metadata file"""
+    directory = sequence_dir(sequence_id)
+    tmp = directory / f".{METADATA_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, default=str)
+    os.replace(tmp, directory / METADATA_FILE)
+
+
+def update_metadata(sequence_id: str, **fields) -> dict:
+    metadata = read_metadata(sequence_id)
+    metadata.update(fields)
+    write_metadata(sequence_id, metadata)
+    return metadata
+
+
+def read_owned_metadata(sequence_id: str, owner: str) -> dict:
+    """Metadata of one of ``owner``'s uploads (KeyError for a missing or foreign id)"""
+    metadata = read_metadata(sequence_id)
+    # Someone else's upload is indistinguishable from a missing one
+    if metadata.get("owner") != owner:
+        raise KeyError(sequence_id)
+    return metadata
+
+
+def find_metadata(sequence_id: str, owner: str) -> Optional[dict]:
+    try:
+        return read_owned_metadata(sequence_id, owner)
+    except KeyError:
+        return None
+
+
+def packed_dir(sequence_id: str) -> Path:
+    return sequence_dir(sequence_id) / PACKED_DIR
+
+
+def write_packed_index(sequence_id: str, entries: List[dict]) -> None:
+    with open(packed_dir(sequence_id) / PACKED_INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+
+
+def read_packed_index(sequence_id: str) -> List[dict]:
+    try:
+        with open(packed_dir(sequence_id) / PACKED_INDEX_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(sequence_id) from None
+
+
+def open_packed(sequence_id: str, record: Optional[str] = None) -> tuple[dict, PackedSequence]:
+    """Open a packed record (the first one when no name is given)"""
+    entries = read_packed_index(sequence_id)
+    for entry in entries:
+        if record is None or entry["name"] == record:
+            return entry, _open_packed_file(str(packed_dir(sequence_id) / entry["file"]))
+    raise KeyError(record)
+
+
+@lru_cache(maxsize=64)
+def _open_packed_file(path: str) -> PackedSequence:
+    # Packed files are written once and never modified, so mappings can be reused
+    return PackedSequence.open(path)
+
+
+def variants_dir(sequence_id: str) -> Path:
+    return sequence_dir(sequence_id) / VARIANTS_DIR
+
+
+def open_variant_index(sequence_id: str) -> VariantIndex:
+    directory = variants_dir(sequence_id)
+    if not (directory / INDEX_FILE).exists():
+        raise KeyError(sequence_id)
+    return _open_variant_index(str(directory))
+
+
+@lru_cache(maxsize=32)
+def _open_variant_index(directory: str) -> VariantIndex:
+    return VariantIndex.load(Path(directory))
@@ -0,0 +1,401 @@
+"""
+Protein structure prediction scheduler
+======================================
+Predictions are keyed by (normalised sequence hash, method, model
+version). Concurrent requests for the same key attach to the running
+job, and finished structures are kept in a disk-backed cache with
+size-based LRU eviction.
+
+The cache directory is shared by all workers and is the source of truth:
+a structure finished by any worker is "completed" everywhere. Running
+jobs and recent failures are per worker, so a prediction started in one
+worker is reported as unknown (404) by the others until its structure
+lands on disk.
+
+Every method needs an explicitly configured backend
+(``PROTEIN_PREDICTOR_BACKENDS``); the synthetic ``stub`` is only used
+when named there.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Optional, Protocol
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core import health
+from app.core.config import settings
+
+AMINO_ACIDS = re.compile(r"^[ACDEFGHIKLMNPQRSTVWYBXZUO]+$")
+MAX_SEQUENCE_LENGTH = 2700
+MAX_FAILURES_KEPT = 1000
+
+
+@dataclass
+class PredictedStructure:
+    pdb_data: str
+    confidence: float
+
+
+@dataclass
+class StructureRecord:
+    """Metadata stored next to a cached structure"""
+    prediction_id: str
+    sequence_hash: str
+    sequence_id: Optional[str]
+    length: int
+    method: str
+    model_version: str
+    confidence: float
+    created_at: float
+    formats: Dict[str, dict] = field(default_factory=dict)  # name -> sizes
+
+
+class StructurePredictor(Protocol):
+    model_version: str
+
+    async def predict(self, sequence: str) -> PredictedStructure:
+        ...
+
+
+def normalize_sequence(sequence: str) -> str:
+    """Uppercase, drop whitespace and a trailing stop codon, validate"""
+    sequence = "".join(sequence.split()).upper().rstrip("*")
+    if not sequence or not AMINO_ACIDS.match(sequence):
+        raise ValueError("Sequence must contain amino acid letters only")
+    if len(sequence) > MAX_SEQUENCE_LENGTH:
+        raise ValueError(f"Sequence too long. Maximum: {MAX_SEQUENCE_LENGTH} residues")
+    return sequence
+
+
+def sequence_hash(sequence: str) -> str:
+    return hashlib.sha256(sequence.encode("ascii")).hexdigest()
+
+
+def prediction_key(seq_hash: str, method: str, model_version: str) -> str:
+    return hashlib.sha256(f"{seq_hash}:{method}:{model_version}".encode()).hexdigest()[:32]
+
+
+class StubPredictor:
+    """Local stand-in that emits an ideal alpha-helix CA trace"""
+
+    def __init__(self, model_version: str = "stub", delay_seconds: float = 0.0):
+        self.model_version = model_version
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+
+    async def predict(self, sequence: str) -> PredictedStructure:
+        self.calls += 1
+        if self.delay_seconds:
+            await asyncio.sleep(self.delay_seconds)
+        confidence = 0.5 + int(sequence_hash(sequence)[:4], 16) / 0xFFFF * 0.45
+        return PredictedStructure(_helix_pdb(sequence, confidence), round(confidence, 3))
+
+
+class EsmFoldApiPredictor:
+    """ESMFold through the ESM Metagenomic Atlas folding API"""
+
+    def __init__(self, url: str, model_version: str = "esmfold_v1", timeout: float = 600.0):
+        self.url = url
+        self.model_version = model_version
+        self.timeout = timeout
+
+    async def predict(self, sequence: str) -> PredictedStructure:
+        import httpx  # only deployments using the remote API pay for it
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(self.url, content=sequence)
+            response.raise_for_status()
+        pdb_data = response.text
+        # pLDDT is reported in the B-factor column of each CA atom
+        plddt = [
+            float(line[60:66])
+            for line in pdb_data.splitlines()
+            if line.startswith("ATOM") and line[12:16].strip() == "CA"
+        ]
+        confidence = sum(plddt) / len(plddt) if plddt else 0.0
+        return PredictedStructure(pdb_data, round(confidence / 100 if confidence > 1 else confidence, 3))
+
+
+def _helix_pdb(sequence: str, confidence: float) -> str:
+    lines = []
+    b_factor = confidence * 100
+    for i, residue in enumerate(sequence):
+        angle = math.radians(100.0 * i)
+        x, y, z = 2.3 * math.cos(angle), 2.3 * math.sin(angle), 1.5 * i
+        lines.append(
+            f"ATOM  {i + 1:5d}  CA  {_THREE_LETTER.get(residue, 'UNK')} A{i + 1:4d}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00{b_factor:6.2f}           C"
+        )
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+
+_THREE_LETTER = {
+    "A": "ALA", "R": "ARG", "N": "ASN", "D": "ASP", "C": "CYS", "Q": "GLN", "E": "GLU",
+    "G": "GLY", "H": "HIS", "I": "ILE", "L": "LEU", "K": "LYS", "M": "MET", "F": "PHE",
+    "P": "PRO", "S": "SER", "T": "THR", "W": "TRP", "Y": "TYR", "V": "VAL",
+    "U": "SEC", "O": "PYL",
+}
+
+
+@dataclass(frozen=True)
+class StructureFormat:
+    """A stored structure representation (always kept gzip-compressed)"""
+    name: str
+    media_type: str
+    encode: Callable[[str], bytes]
+
+    @property
+    def suffix(self) -> str:
+        return f".{self.name}.gz"
+
+
+# Further formats (e.g. BinaryCIF) can be added with register_format
+STRUCTURE_FORMATS: Dict[str, StructureFormat] = {}
+
+
+def register_format(fmt: StructureFormat) -> None:
+    STRUCTURE_FORMATS[fmt.name] = fmt
+
+
+register_format(StructureFormat("pdb", "chemical/x-pdb", lambda pdb: pdb.encode("ascii")))
+
+
+class StructureCache:
+    """Disk cache of compressed structures with size-based LRU eviction
+
+    Nothing is remembered between calls; every lookup and size count reads
+    the directory, which other workers write to as well.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+
+    def meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def structure_path(self, key: str, fmt: str = "pdb") -> Path:
+        return self.directory / f"{key}{STRUCTURE_FORMATS[fmt].suffix}"
+
+    def _paths(self, key: str) -> list[Path]:
+        return [self.meta_path(key)] + [self.structure_path(key, fmt) for fmt in STRUCTURE_FORMATS]
+
+    def _disk_sizes(self) -> Dict[str, int]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return {
+            meta.stem: sum(_size(path) for path in self._paths(meta.stem))
+            for meta in self.directory.glob("*.json")
+        }
+
+    def contains(self, key: str) -> bool:
+        # Metadata is written last, so its presence means a complete entry
+        return self.meta_path(key).exists()
+
+    def get_record(self, key: str) -> Optional[StructureRecord]:
+        meta_path = self.meta_path(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                record = StructureRecord(**json.load(f))
+        except FileNotFoundError:
+            return None
+        # mtime doubles as the LRU clock
+        os.utime(meta_path)
+        return record
+
+    def read_structure(self, key: str, fmt: str = "pdb") -> bytes:
+        """Decompressed structure bytes (for in-process consumers)"""
+        with gzip.open(self.structure_path(key, fmt), "rb") as f:
+            return f.read()
+
+    def put(self, record: StructureRecord, pdb_data: str) -> None:
+        key = record.prediction_id
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for fmt in STRUCTURE_FORMATS.values():
+                encoded = fmt.encode(pdb_data)
+                record.formats[fmt.name] = {
+                    "size_bytes": len(encoded),
+                    "compressed_size_bytes": _atomic_write(
+                        self.structure_path(key, fmt.name),
+                        gzip.compress(encoded, compresslevel=6, mtime=0),
+                    ),
+                }
+            # Metadata is written last: it marks the entry as complete
+            _atomic_write(self.meta_path(key), json.dumps(asdict(record)).encode("utf-8"))
+            self._evict(self._disk_sizes(), keep=key)
+
+    def _evict(self, sizes: Dict[str, int], keep: str) -> None:
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(
+            (key for key in sizes if key != keep),
+            key=lambda key: _mtime(self.meta_path(key)),
+        )
+        for key in by_age:
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                path.unlink(missing_ok=True)
+            total -= sizes.pop(key)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(self._disk_sizes().values())
+
+
+def _atomic_write(path: Path, data: bytes) -> int:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+class PredictionScheduler:
+    """Single-flight prediction jobs in front of the structure cache"""
+
+    def __init__(
+        self,
+        cache: StructureCache,
+        predictors: Dict[str, StructurePredictor],
+        max_concurrent: int = 2,
+    ):
+        self.cache = cache
+        self.predictors = predictors
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._failures: Dict[str, str] = {}
+
+    def key_for(self, sequence: str, method: str) -> tuple[str, str]:
+        """Normalised sequence and prediction key for a request"""
+        if method not in self.predictors:
+            raise ValueError("Invalid method")
+        sequence = normalize_sequence(sequence)
+        model_version = self.predictors[method].model_version
+        return sequence, prediction_key(sequence_hash(sequence), method, model_version)
+
+    async def submit(self, sequence: str, method: str, sequence_id: Optional[str] = None) -> tuple[str, str]:
+        """Start (or attach to) a prediction; returns (prediction_id, status)"""
+        sequence, key = self.key_for(sequence, method)
+        if key in self._inflight:
+            return key, "processing"
+        if await run_in_threadpool(self.cache.contains, key):
+            return key, "completed"
+        if key in self._inflight:
+            return key, "processing"
+
+        self._failures.pop(key, None)
+        self._inflight[key] = asyncio.create_task(self._run(key, sequence, method, sequence_id))
+        return key, "processing"
+
+    async def predict(
+        self,
+        sequence: str,
+        method: str,
+        sequence_id: Optional[str] = None,
+    ) -> Optional[StructureRecord]:
+        """Submit and wait for the structure"""
+        key, _ = await self.submit(sequence, method, sequence_id)
+        task = self._inflight.get(key)
+        if task is not None:
+            await asyncio.shield(task)
+        return await run_in_threadpool(self.cache.get_record, key)
+
+    def status(self, key: str) -> Optional[str]:
+        """Status of a prediction; "processing" and "failed" only know this worker's jobs"""
+        if key in self._inflight:
+            return "processing"
+        if self.cache.contains(key):
+            return "completed"
+        if key in self._failures:
+            return "failed"
+        return None
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def _run(self, key: str, sequence: str, method: str, sequence_id: Optional[str]) -> None:
+        predictor = self.predictors[method]
+        try:
+            async with self._semaphore:
+                structure = await predictor.predict(sequence)
+            record = StructureRecord(
+                prediction_id=key,
+                sequence_hash=sequence_hash(sequence),
+                sequence_id=sequence_id,
+                length=len(sequence),
+                method=method,
+                model_version=predictor.model_version,
+                confidence=structure.confidence,
+                created_at=time.time(),
+            )
+            await run_in_threadpool(self.cache.put, record, structure.pdb_data)
+        except Exception as exc:
+            if len(self._failures) >= MAX_FAILURES_KEPT:
+                self._failures.pop(next(iter(self._failures)))
+            self._failures[key] = str(exc) or type(exc).__name__
+            print(f"⚠️  {method} prediction {key} failed: {self._failures[key]}")
+        finally:
+            self._inflight.pop(key, None)
+
+
+PREDICTOR_BACKENDS = ("esmfold_api", "stub")
+
+
+def build_predictor(method: str, backend: str) -> StructurePredictor:
+    version = settings.PROTEIN_MODEL_VERSIONS.get(method, "unversioned")
+    if backend == "esmfold_api":
+        return EsmFoldApiPredictor(settings.ESMFOLD_API_URL, model_version=version)
+    if backend == "stub":
+        print(f"⚠️  Protein method {method!r} uses the stub predictor: structures are synthetic helices")
+        return StubPredictor(model_version=f"{version}-stub")
+    raise ValueError(f"Unknown predictor backend {backend!r} for {method!r} (expected one of {PREDICTOR_BACKENDS})")
+
+
+_scheduler: Optional[PredictionScheduler] = None
+health.register_queue("protein_predictions", lambda: _scheduler.inflight if _scheduler else 0)
+
+
+def get_scheduler() -> PredictionScheduler:
+    """The process-wide scheduler; raises ValueError when no usable backend is configured"""
+    global _scheduler
+    if _scheduler is None:
+        if not settings.PROTEIN_PREDICTOR_BACKENDS:
+            raise ValueError("PROTEIN_PREDICTOR_BACKENDS is empty: configure a backend per method")
+        predictors = {
+            method: build_predictor(method, backend)
+            for method, backend in settings.PROTEIN_PREDICTOR_BACKENDS.items()
+        }
+        _scheduler = PredictionScheduler(
+            StructureCache(settings.PROTEIN_CACHE_PATH, settings.PROTEIN_CACHE_MAX_BYTES),
+            predictors,
+            max_concurrent=settings.PROTEIN_MAX_CONCURRENT_PREDICTIONS,
+        )
+    return _scheduler
@@ -0,0 +1,170 @@
+"""
+Variant interval index
+======================
+Per-chromosome sorted position arrays over VCF variants, queried with
+binary search. Variable-length fields (ids, REF, ALT, the first
+sample's GT) are stored as a byte blob plus an offsets array, and every
+column is saved as a ``.npy`` file that is memory-mapped on load.
+Indexes saved before genotypes were kept load without them.
+"""
+
+import json
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.services.genetics.parsers import VcfRecord
+
+INDEX_FILE = "index.json"
+STRING_COLUMNS = ("ids", "refs", "alts", "genotypes")
+
+
+def normalize_chrom(chrom: str) -> str:
+    chrom = chrom.removeprefix("chr")
+    return "MT" if chrom == "M" else chrom
+
+
+class _StringColumn:
+    """Variable-length strings as one byte blob plus offsets"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, values: List[str], order: np.ndarray) -> "_StringColumn":
+        encoded = [values[i].encode("utf-8") for i in order]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]: self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class ChromosomeIndex:
+    """Sorted variants of a single chromosome"""
+
+    def __init__(self, positions: np.ndarray, ends: np.ndarray, columns: Dict[str, _StringColumn]):
+        self.positions = positions
+        self.ends = ends
+        self.columns = columns
+        self.max_span = int((ends - positions).max()) + 1 if len(positions) else 1
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def overlapping(self, start: int, end: int) -> np.ndarray:
+        """Row numbers of variants overlapping [start, end] (1-based, inclusive)"""
+        lo = int(np.searchsorted(self.positions, start - self.max_span + 1, side="left"))
+        hi = int(np.searchsorted(self.positions, end, side="right"))
+        rows = np.arange(lo, hi)
+        return rows[self.ends[lo:hi] >= start]
+
+    def record(self, chrom: str, row: int) -> dict:
+        alts = self.columns["alts"][row]
+        genotypes = self.columns.get("genotypes")
+        return {
+            "chrom": chrom,
+            "pos": int(self.positions[row]),
+            "id": self.columns["ids"][row],
+            "ref": self.columns["refs"][row],
+            "alts": alts.split(",") if alts else [],
+            "genotype": (genotypes[row] or None) if genotypes is not None else None,
+        }
+
+
+class VariantIndex:
+    """Chromosome -> sorted variant arrays"""
+
+    def __init__(self, chromosomes: Dict[str, ChromosomeIndex]):
+        self.chromosomes = chromosomes
+
+    @classmethod
+    def build(cls, records: Iterable[VcfRecord]) -> "VariantIndex":
+        staged: Dict[str, dict] = {}
+        for record in records:
+            chrom = normalize_chrom(record.chrom)
+            columns = staged.get(chrom)
+            if columns is None:
+                columns = staged[chrom] = {
+                    "positions": array("q"),
+                    "ends": array("q"),
+                    "ids": [],
+                    "refs": [],
+                    "alts": [],
+                    "genotypes": [],
+                }
+            columns["positions"].append(record.pos)
+            columns["ends"].append(record.pos + max(len(record.ref), 1) - 1)
+            columns["ids"].append(record.id if record.id != "." else "")
+            columns["refs"].append(record.ref)
+            columns["alts"].append(",".join(record.alts))
+            columns["genotypes"].append(record.genotype or "")
+
+        chromosomes = {}
+        for chrom, columns in staged.items():
+            positions = np.frombuffer(columns["positions"], dtype=np.int64)
+            order = np.argsort(positions, kind="stable")
+            chromosomes[chrom] = ChromosomeIndex(
+                positions[order],
+                np.frombuffer(columns["ends"], dtype=np.int64)[order],
+                {name: _StringColumn.build(columns[name], order) for name in STRING_COLUMNS},
+            )
+        return cls(chromosomes)
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self.chromosomes.values())
+
+    def region(self, chrom: str, start: int, end: int, limit: Optional[int] = None) -> List[dict]:
+        """Variants overlapping chrom:start-end (1-based, inclusive)"""
+        chrom = normalize_chrom(chrom)
+        index = self.chromosomes.get(chrom)
+        if index is None:
+            return []
+        rows = index.overlapping(start, end)
+        if limit is not None:
+            rows = rows[:limit]
+        return [index.record(chrom, int(row)) for row in rows]
+
+    def count(self, chrom: str, start: int, end: int) -> int:
+        index = self.chromosomes.get(normalize_chrom(chrom))
+        return 0 if index is None else len(index.overlapping(start, end))
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {}
+        for n, (chrom, index) in enumerate(self.chromosomes.items()):
+            prefix = f"c{n}"
+            np.save(directory / f"{prefix}.positions.npy", index.positions)
+            np.save(directory / f"{prefix}.ends.npy", index.ends)
+            for name, column in index.columns.items():
+                np.save(directory / f"{prefix}.{name}.data.npy", column.data)
+                np.save(directory / f"{prefix}.{name}.offsets.npy", column.offsets)
+            manifest[chrom] = {"prefix": prefix, "count": len(index)}
+        with open(directory / INDEX_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load(cls, directory: Path) -> "VariantIndex":
+        with open(directory / INDEX_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        def column(prefix: str, name: str) -> np.ndarray:
+            return np.load(directory / f"{prefix}.{name}.npy", mmap_mode="r")
+
+        chromosomes = {}
+        for chrom, entry in manifest.items():
+            prefix = entry["prefix"]
+            chromosomes[chrom] = ChromosomeIndex(
+                column(prefix, "positions"),
+                column(prefix, "ends"),
+                {
+                    name: _StringColumn(column(prefix, f"{name}.data"), column(prefix, f"{name}.offsets"))
+                    for name in STRING_COLUMNS
+                    if (directory / f"{prefix}.{name}.data.npy").exists()
+                },
+            )
+        return cls(chromosomes)
@@ -0,0 +1,3 @@
+# IoT monitoring services (S2)
+
+
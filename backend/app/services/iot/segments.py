@@ -0,0 +1,201 @@
+"""
+IoT segment files
+=================
+Cold storage for the readings of a closed monitoring session: one file
+per session, column-oriented and compressed.
+
+Layout: ``MAGIC``, a little-endian u32 header length, a JSON header, then
+one zlib blob per column. The header is the segment's index: row count,
+time range and, per column, the blob's offset and length plus count /
+sum / min / max of its non-missing values, so summaries are answered from
+the header alone and a range scan decompresses only the columns it needs.
+
+- ``timestamp``: epoch milliseconds, stored as the first value plus
+  int32 deltas (10 ms apart at 100 Hz, which compresses to almost nothing)
+- every other column: float32 with NaN for missing values, byte-shuffled
+  (all first bytes, then all second bytes, ...) before compression, which
+  groups the slowly varying exponent bytes of sensor signals together
+"""
+
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b"AMSEG\x01"
+HEADER_LENGTH = struct.Struct("<I")
+SEGMENT_SUFFIX = ".seg"
+
+# Reading fields, in file order; acceleration/gyroscope are split per axis
+COLUMNS = (
+    "heart_rate",
+    "hrv_sdnn",
+    "hrv_rmssd",
+    "spo2",
+    "stress_level",
+    "muscle_activity",
+    "accel_x",
+    "accel_y",
+    "accel_z",
+    "gyro_x",
+    "gyro_y",
+    "gyro_z",
+)
+
+
+def empty_stats() -> Dict[str, dict]:
+    return {name: {"count": 0, "sum": 0.0, "min": None, "max": None} for name in COLUMNS}
+
+
+def column_stats(values: np.ndarray) -> dict:
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return {"count": 0, "sum": 0.0, "min": None, "max": None}
+    return {
+        "count": int(len(present)),
+        "sum": float(present.sum(dtype=np.float64)),
+        "min": float(present.min()),
+        "max": float(present.max()),
+    }
+
+
+def merge_stats(a: Dict[str, dict], b: Dict[str, dict]) -> Dict[str, dict]:
+    """Combine stats of two tiers (columns present in both)"""
+    merged = {}
+    for name in a.keys() & b.keys():
+        x, y = a[name], b[name]
+        bounds = [v for v in (x["min"], y["min"]) if v is not None]
+        tops = [v for v in (x["max"], y["max"]) if v is not None]
+        merged[name] = {
+            "count": x["count"] + y["count"],
+            "sum": x["sum"] + y["sum"],
+            "min": min(bounds) if bounds else None,
+            "max": max(tops) if tops else None,
+        }
+    return merged
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    return values.astype("<f4").view(np.uint8).reshape(-1, 4).T.tobytes()
+
+
+def _unshuffle(raw: bytes, rows: int) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint8).reshape(4, rows).T.copy().view("<f4").ravel()
+
+
+def encode(session_id: str, columns: Dict[str, np.ndarray], level: int = 6) -> bytes:
+    """Segment bytes for ``columns`` (``timestamp`` int64 ms, sorted, plus COLUMNS)"""
+    timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+    rows = len(timestamps)
+    deltas = np.diff(timestamps)
+    delta_dtype = "<i4" if not len(deltas) or deltas.max() < 2 ** 31 else "<i8"
+
+    blobs: List[bytes] = [zlib.compress(deltas.astype(delta_dtype).tobytes(), level)]
+    entries = {"timestamp": {"dtype": delta_dtype, "codec": "delta+zlib"}}
+    for name in COLUMNS:
+        values = np.asarray(columns[name], dtype=np.float32)
+        blobs.append(zlib.compress(_shuffle(values), level))
+        entries[name] = {"dtype": "<f4", "codec": "shuffle+zlib", **column_stats(values)}
+
+    offset = 0
+    for entry, blob in zip(entries.values(), blobs):
+        entry.update(offset=offset, length=len(blob))
+        offset += len(blob)
+
+    header = json.dumps({
+        "version": 1,
+        "session_id": session_id,
+        "rows": rows,
+        "start_ms": int(timestamps[0]) if rows else None,
+        "end_ms": int(timestamps[-1]) if rows else None,
+        "columns": entries,
+    }, separators=(",", ":")).encode()
+    return b"".join([MAGIC, HEADER_LENGTH.pack(len(header)), header, *blobs])
+
+
+def write_segment(path: Path, session_id: str, columns: Dict[str, np.ndarray], level: int = 6) -> int:
+    """Write atomically and durably (the hot rows are deleted afterwards)"""
+    data = encode(session_id, columns, level)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def read_header(path: Path) -> Optional[dict]:
+    """The segment's index, or None if there is no segment"""
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(len(MAGIC) + HEADER_LENGTH.size)
+            if prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a segment file")
+            (length,) = HEADER_LENGTH.unpack(prefix[len(MAGIC):])
+            header = json.loads(f.read(length))
+    except FileNotFoundError:
+        return None
+    header["data_offset"] = len(MAGIC) + HEADER_LENGTH.size + length
+    return header
+
+
+def stats(header: Optional[dict]) -> Dict[str, dict]:
+    if header is None:
+        return empty_stats()
+    return {
+        name: {key: header["columns"][name][key] for key in ("count", "sum", "min", "max")}
+        for name in COLUMNS
+    }
+
+
+def read_columns(
+    path: Path,
+    names: Optional[Iterable[str]] = None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Decode ``timestamp`` and the requested columns, cut to [start_ms, end_ms]"""
+    header = read_header(path)
+    names = list(COLUMNS if names is None else names)
+    if header is None or not header["rows"]:
+        return {"timestamp": np.zeros(0, dtype=np.int64), **{name: np.zeros(0, dtype=np.float32) for name in names}}
+
+    rows = header["rows"]
+    with open(path, "rb") as f:
+        def blob(name: str) -> bytes:
+            entry = header["columns"][name]
+            f.seek(header["data_offset"] + entry["offset"])
+            return zlib.decompress(f.read(entry["length"]))
+
+        deltas = np.frombuffer(blob("timestamp"), dtype=header["columns"]["timestamp"]["dtype"])
+        timestamps = np.empty(rows, dtype=np.int64)
+        timestamps[0] = header["start_ms"]
+        np.cumsum(deltas, out=timestamps[1:])
+        timestamps[1:] += header["start_ms"]
+
+        lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+        hi = rows if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="right"))
+        result = {"timestamp": timestamps[lo:hi]}
+        for name in names:
+            result[name] = _unshuffle(blob(name), rows)[lo:hi]
+    return result
+
+
+def merge_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate column sets and stable-sort them by timestamp"""
+    parts = [part for part in parts if len(part["timestamp"])]
+    if not parts:
+        return {"timestamp": np.zeros(0, dtype=np.int64), **{name: np.zeros(0, dtype=np.float32) for name in COLUMNS}}
+    timestamps = np.concatenate([part["timestamp"] for part in parts])
+    order = np.argsort(timestamps, kind="stable")
+    merged = {"timestamp": timestamps[order]}
+    for name in parts[0]:
+        if name != "timestamp":
+            merged[name] = np.concatenate([part[name] for part in parts])[order]
+    return merged
@@ -0,0 +1,231 @@
+"""
+Hot/cold reading tiers
+======================
+Readings are ingested into ``iot_readings`` (hot). When a session is
+stopped its readings are compacted into one segment file per session
+(cold, see ``segments``) and deleted from the database; the segment's
+last timestamp marks what has been compacted, so a compaction that dies
+between writing the file and deleting the rows is simply redone.
+
+Summaries and range reads combine both tiers: cold statistics come from
+the segment header, hot ones from one aggregate query, and range reads
+merge decoded segment columns with hot rows after the compacted mark.
+"""
+
+import asyncio
+import fcntl
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db import iot as iot_db
+from app.db.session import transaction
+from app.db.tables import utcnow
+from app.services.iot import segments
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MS = timedelta(milliseconds=1)
+AXES = ("x", "y", "z")
+LOCK_FILE = ".compact.lock"
+
+COMPACTED_READINGS = registry.counter(
+    "iot_compacted_readings_total", "IoT readings moved from the database into segment files"
+)
+
+
+def segments_root() -> Path:
+    return Path(settings.UPLOAD_PATH) / "iot" / "segments"
+
+
+def segment_path(patient_id: str, session_id: str) -> Path:
+    return segments_root() / patient_id / f"{session_id}{segments.SEGMENT_SUFFIX}"
+
+
+def to_ms(timestamp: datetime) -> int:
+    return (timestamp - EPOCH) // ONE_MS
+
+
+def from_ms(ms: int) -> datetime:
+    return EPOCH + ms * ONE_MS
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """Timestamps are stored as naive UTC"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def compacted_through(header: Optional[dict]) -> datetime:
+    """Hot readings at or before this instant are in the segment"""
+    if header is None or not header["rows"]:
+        return datetime.min
+    return from_ms(header["end_ms"])
+
+
+def reading_values(data: dict) -> dict:
+    """``iot_readings`` values for a sensor message (PPG, IMU and/or EMG fields)"""
+    values = {name: data[name] for name in iot_db.STAT_COLUMNS if data.get(name) is not None}
+    if "heart_rate" in values:
+        values["heart_rate"] = int(round(values["heart_rate"]))
+    for name in ("acceleration", "gyroscope"):
+        if isinstance(data.get(name), dict):
+            values[name] = {axis: data[name][axis] for axis in AXES if axis in data[name]}
+    timestamp = data.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        timestamp = from_ms(int(timestamp))
+    elif isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    values["timestamp"] = naive_utc(timestamp) if timestamp else utcnow()
+    return values
+
+
+def columns_from_rows(rows) -> Dict[str, np.ndarray]:
+    """Reading rows as segment columns (float32, NaN for missing values)"""
+    columns = {"timestamp": np.fromiter((to_ms(row["timestamp"]) for row in rows), dtype=np.int64, count=len(rows))}
+    for name in iot_db.STAT_COLUMNS:
+        columns[name] = np.array([row[name] for row in rows], dtype=np.float64).astype(np.float32)
+    for prefix, field in (("accel", "acceleration"), ("gyro", "gyroscope")):
+        vectors = [row[field] or {} for row in rows]
+        for axis in AXES:
+            columns[f"{prefix}_{axis}"] = np.array([v.get(axis) for v in vectors], dtype=np.float64).astype(np.float32)
+    return columns
+
+
+def columns_json(columns: Dict[str, np.ndarray]) -> dict:
+    """Columns as JSON lists: epoch-ms timestamps, floats rounded, None for missing"""
+    result = {"timestamp": columns["timestamp"].tolist()}
+    for name, values in columns.items():
+        if name != "timestamp":
+            rounded = np.round(values.astype(np.float64), 4).tolist()
+            result[name] = [None if value != value else value for value in rounded]
+    return result
+
+
+def averages(stats: Dict[str, dict]) -> dict:
+    """``iot_sessions`` average columns from merged tier statistics"""
+
+    def mean(name: str) -> Optional[float]:
+        count = stats[name]["count"]
+        return stats[name]["sum"] / count if count else None
+
+    heart_rate = mean("heart_rate")
+    return {
+        "avg_heart_rate": round(heart_rate) if heart_rate is not None else None,
+        "avg_stress_level": mean("stress_level"),
+        "avg_spo2": mean("spo2"),
+    }
+
+
+@asynccontextmanager
+async def _compaction_lock(path: Path):
+    """Serialises compactions of a patient's sessions across workers"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.parent / LOCK_FILE, "w") as lock:
+        await run_in_threadpool(fcntl.flock, lock, fcntl.LOCK_EX)
+        yield
+
+
+async def compact_session(session_id: str, patient_id: str) -> Optional[dict]:
+    """Move a closed session's hot readings into its segment; returns the header"""
+    path = segment_path(patient_id, session_id)
+    async with _compaction_lock(path):
+        header = await run_in_threadpool(segments.read_header, path)
+        through = compacted_through(header)
+
+        parts: List[Dict[str, np.ndarray]] = []
+        async with transaction() as conn:
+            async for rows in iot_db.stream_readings(conn, session_id, through):
+                parts.append(await run_in_threadpool(columns_from_rows, rows))
+
+        def write() -> dict:
+            cold = [segments.read_columns(path)] if header is not None else []
+            merged = segments.merge_columns(cold + parts)
+            segments.write_segment(path, session_id, merged, settings.IOT_SEGMENT_COMPRESSION_LEVEL)
+            return segments.read_header(path)
+
+        if parts:
+            header = await run_in_threadpool(write)
+            COMPACTED_READINGS.inc(amount=sum(len(part["timestamp"]) for part in parts))
+        if header is None:
+            return None
+        # Also clears rows left behind by a compaction interrupted after its write
+        async with transaction() as conn:
+            await iot_db.delete_compacted(conn, session_id, compacted_through(header))
+            await iot_db.set_averages(conn, session_id, averages(segments.stats(header)))
+    return header
+
+
+async def compact_pending() -> int:
+    """Compact closed sessions left with hot readings (e.g. by a restart)"""
+    compacted = 0
+    async with transaction() as conn:
+        pending = await iot_db.pending_compaction(conn)
+    for session in pending:
+        try:
+            if await compact_session(session["id"], session["patient_id"]) is not None:
+                compacted += 1
+        except Exception as exc:
+            print(f"⚠️  Could not compact IoT session {session['id']}: {exc}")
+    return compacted
+
+
+async def _sweep() -> None:
+    try:
+        await compact_pending()
+    except Exception as exc:
+        print(f"⚠️  IoT compaction sweep failed: {exc}")
+
+
+_sweep_task: Optional[asyncio.Task] = None
+
+
+def start_compaction_sweep() -> None:
+    """Compact leftovers of sessions closed before the last shutdown, in the background"""
+    global _sweep_task
+    if settings.IOT_COMPACT_ON_STARTUP and _sweep_task is None:
+        _sweep_task = asyncio.create_task(_sweep())
+
+
+async def stop_compaction_sweep() -> None:
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        try:
+            await _sweep_task
+        except asyncio.CancelledError:
+            pass
+        _sweep_task = None
+
+
+async def session_stats(conn, session_id: str, patient_id: str) -> Dict[str, dict]:
+    """Per-column count / sum / min / max across both tiers"""
+    header = await run_in_threadpool(segments.read_header, segment_path(patient_id, session_id))
+    hot = await iot_db.reading_stats(conn, session_id, compacted_through(header))
+    return segments.merge_stats(segments.stats(header), hot)
+
+
+async def read_range(
+    conn, session_id: str, patient_id: str, start: datetime, end: datetime, limit: int
+) -> Dict[str, np.ndarray]:
+    """Readings in [start, end] from both tiers as time-ordered columns, at most ``limit``"""
+    path = segment_path(patient_id, session_id)
+    header = await run_in_threadpool(segments.read_header, path)
+    through = compacted_through(header)
+
+    parts = []
+    if header is not None and start <= through:
+        cold = await run_in_threadpool(segments.read_columns, path, None, to_ms(start), to_ms(end))
+        parts.append({name: values[:limit] for name, values in cold.items()})
+    remaining = limit - (len(parts[0]["timestamp"]) if parts else 0)
+    if remaining > 0 and end > through:
+        after = max(through, start - ONE_MS)
+        rows = await iot_db.readings_in_range(conn, session_id, after, end, remaining)
+        parts.append(await run_in_threadpool(columns_from_rows, rows))
+    return segments.merge_columns(parts)
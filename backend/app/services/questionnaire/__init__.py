@@ -0,0 +1,3 @@
+# Questionnaire services (S3)
+
+
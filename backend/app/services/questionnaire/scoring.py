@@ -0,0 +1,221 @@
+"""
+Questionnaire scoring
+=====================
+Compiles the declarative specs once into matrices: a reverse-scoring
+affine map over the item vector, one weight row per derived term (sums,
+subscales, PSQI components) and a norm table. A batch of submissions is
+an (n x items) matrix scored with dot products, ``np.digitize`` and
+``np.searchsorted``; nothing loops over individual answers.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.questionnaire.specs import SPECS
+
+
+class Term(NamedTuple):
+    name: str
+    weights: np.ndarray  # over item and earlier term columns
+    denominator: Optional[np.ndarray]  # set for ratio terms
+    scale: float
+    bins: Optional[np.ndarray]
+    right: Union[bool, np.ndarray]  # one flag, or one per bin edge
+
+
+class NormTable(NamedTuple):
+    version: str
+    scores: np.ndarray  # ascending
+    percentiles: np.ndarray  # share of the norm population at or below each score
+
+
+class CompiledSpec:
+    """One instrument in index-mapped vector form"""
+
+    def __init__(self, questionnaire_id: str, spec: dict, norm: Optional[NormTable] = None):
+        self.questionnaire_id = questionnaire_id
+        self.spec = spec
+        self.item_ids = list(spec["items"])
+        self.index = {item: i for i, item in enumerate(self.item_ids)}
+        self.lo = np.array([spec["items"][item][0] for item in self.item_ids], dtype=np.float64)
+        self.hi = np.array([spec["items"][item][1] for item in self.item_ids], dtype=np.float64)
+
+        # Reverse-scored items: x' = (lo + hi) - x
+        reverse = np.isin(self.item_ids, spec.get("reverse", []))
+        self.sign = np.where(reverse, -1.0, 1.0)
+        self.offset = np.where(reverse, self.lo + self.hi, 0.0)
+
+        columns = dict(self.index)
+        width = len(self.item_ids) + len(spec["terms"])
+        self.terms: List[Term] = []
+        for term in spec["terms"]:
+            if "ratio" in term:
+                numerator, denominator = term["ratio"]
+                weights = self._row({numerator: 1}, columns, width)
+                denominator_row = self._row({denominator: 1}, columns, width)
+            else:
+                weights, denominator_row = self._row(term["sum"], columns, width), None
+            bins = np.asarray(term["bins"], dtype=np.float64) if "bins" in term else None
+            right = term.get("right", False)
+            if not isinstance(right, bool):
+                right = np.asarray(right, dtype=bool)
+            self.terms.append(Term(term["name"], weights, denominator_row, float(term.get("scale", 1)), bins, right))
+            columns[term["name"]] = len(self.item_ids) + len(self.terms) - 1
+
+        self.total_column = columns[spec["total"]]
+        hidden = set(spec.get("hidden", []))
+        self.reported = [(term.name, columns[term.name]) for term in self.terms if term.name not in hidden]
+        uppers, self.category_labels, self.risk_levels = zip(*spec["categories"])
+        self.category_uppers = np.asarray(uppers, dtype=np.float64)
+        self.norm = norm or normal_norm_table(spec["norm"], self.category_uppers[-1])
+
+    @staticmethod
+    def _row(weights: dict, columns: Dict[str, int], width: int) -> np.ndarray:
+        row = np.zeros(width)
+        for ref, weight in weights.items():
+            row[columns[ref]] = weight
+        return row
+
+    def matrix(self, submissions: Sequence[Iterable[Tuple[str, object]]]) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Answer matrix (NaN where missing) and a per-row validation error"""
+        x = np.full((len(submissions), len(self.item_ids)), np.nan)
+        errors: List[Optional[str]] = [None] * len(submissions)
+        rows, cols, values = [], [], []
+        for row, answers in enumerate(submissions):
+            for question_id, value in answers:
+                col = self.index.get(question_id)
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    errors[row] = f"Answer to {question_id} is not a number"
+                    continue
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(number)
+        x[rows, cols] = values
+
+        out_of_range = (x < self.lo) | (x > self.hi)
+        missing = np.isnan(x)
+        for row in np.flatnonzero((out_of_range | missing).any(axis=1)).tolist():
+            if errors[row] is None:
+                bad = [self.item_ids[i] for i in np.flatnonzero(missing[row] | out_of_range[row])]
+                errors[row] = "Missing or out-of-range answers: " + ", ".join(bad)
+        return x, errors
+
+    def score_matrix(self, x: np.ndarray) -> Dict[str, np.ndarray]:
+        n_items = len(self.item_ids)
+        values = np.zeros((len(x), n_items + len(self.terms)))
+        values[:, :n_items] = self.offset + self.sign * x
+        for k, term in enumerate(self.terms):
+            column = values @ term.weights
+            if term.denominator is not None:
+                denominator = values @ term.denominator
+                column = np.divide(column, denominator, out=np.zeros_like(column), where=denominator > 0)
+            column = column * term.scale
+            if term.bins is not None:
+                column = _digitize(column, term.bins, term.right)
+            values[:, n_items + k] = column
+
+        total = values[:, self.total_column]
+        category = np.minimum(
+            np.searchsorted(self.category_uppers, total, side="left"),
+            len(self.category_uppers) - 1,
+        )
+        norm_index = np.searchsorted(self.norm.scores, total, side="right") - 1
+        percentile = np.where(norm_index >= 0, self.norm.percentiles[np.maximum(norm_index, 0)], 0.0)
+        return {"values": values, "total": total, "category": category, "percentile": percentile}
+
+    def score(self, submissions: Sequence[Iterable[Tuple[str, object]]]) -> List[dict]:
+        """Score a batch of submissions, each an iterable of (question id, value)"""
+        x, errors = self.matrix(submissions)
+        scored = self.score_matrix(np.where(np.isnan(x), self.lo, x))
+        values = scored["values"].tolist()
+        categories = scored["category"].tolist()
+        percentiles = np.round(100.0 * scored["percentile"], 1).tolist()
+
+        results = []
+        for row, error in enumerate(errors):
+            if error is not None:
+                results.append({"error": error})
+                continue
+            category = self.category_labels[categories[row]]
+            scores = {name: _number(values[row][column]) for name, column in self.reported}
+            scores.update({
+                self.spec["category_name"]: category,
+                "percentile": percentiles[row],
+                "norm_version": self.norm.version,
+            })
+            results.append({
+                "scores": scores,
+                "risk_level": self.risk_levels[categories[row]],
+                "insights": self.spec["insights"][category],
+                "recommendations": self.spec["recommendations"][category],
+            })
+        return results
+
+
+def _digitize(column: np.ndarray, bins: np.ndarray, right: Union[bool, np.ndarray]) -> np.ndarray:
+    """``np.digitize``, with the closed side chosen per edge when ``right`` is an array"""
+    if isinstance(right, bool):
+        return np.digitize(column, bins, right=right).astype(np.float64)
+    # An edge counts once passed; a value on a right-closed edge stays in the bin below it
+    above = column[:, None] > bins
+    on_left_closed = (column[:, None] == bins) & ~right
+    return (above | on_left_closed).sum(axis=1).astype(np.float64)
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else round(value, 2)
+
+
+def normal_norm_table(norm: dict, max_score: float) -> NormTable:
+    """Norm table over integer scores from a normal approximation"""
+    scores = np.arange(0, max_score + 1, dtype=np.float64)
+    z = (scores + 0.5 - norm["mean"]) / (norm["sd"] * math.sqrt(2))
+    percentiles = np.array([0.5 * (1 + math.erf(value)) for value in z])
+    return NormTable(norm["version"], scores, percentiles)
+
+
+def load_norm_tables(path: str) -> Dict[str, NormTable]:
+    """
+    Norm tables from a JSON file:
+    ``{questionnaire_id: {"version", "scores", "percentiles"}}``
+    """
+    if not path or not Path(path).exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        tables = json.load(f)
+    return {
+        questionnaire_id: NormTable(
+            table["version"],
+            np.asarray(table["scores"], dtype=np.float64),
+            np.asarray(table["percentiles"], dtype=np.float64),
+        )
+        for questionnaire_id, table in tables.items()
+    }
+
+
+_compiled: Dict[str, CompiledSpec] = {}
+
+
+def compile_specs() -> Dict[str, CompiledSpec]:
+    """(Re)compile every spec, picking up changed norm tables"""
+    global _compiled
+    norms = load_norm_tables(settings.QUESTIONNAIRE_NORMS_PATH)
+    _compiled = {
+        questionnaire_id: CompiledSpec(questionnaire_id, spec, norms.get(questionnaire_id))
+        for questionnaire_id, spec in SPECS.items()
+    }
+    return _compiled
+
+
+def get_spec(questionnaire_id: str) -> CompiledSpec:
+    if not _compiled:
+        compile_specs()
+    return _compiled[questionnaire_id]
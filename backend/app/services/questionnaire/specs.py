@@ -0,0 +1,167 @@
+"""
+Questionnaire scoring specs
+===========================
+Declarative description of how each instrument is scored. ``items`` maps
+question ids to their allowed range; ``terms`` are evaluated in order and
+may reference items or earlier terms:
+
+- ``sum``: weighted sum ``{ref: weight}``
+- ``ratio``: ``(numerator ref, denominator ref)`` times ``scale``
+- ``bins`` / ``right``: optional ``np.digitize`` of the result; ``right``
+  is one flag for all edges or a list with one per edge
+
+``categories`` are ``(upper bound, label, risk level)`` on the total and
+``norm`` is the reference distribution the percentile is taken from.
+"""
+
+PSS10_ITEMS = [f"q{i}" for i in range(1, 11)]
+PSQI_DISTURBANCES = [f"q{i}" for i in range(5, 14)]
+
+SPECS = {
+    "stress_pss10": {
+        "items": {item: (0, 4) for item in PSS10_ITEMS},
+        "reverse": ["q4", "q5", "q7", "q8"],
+        "terms": [
+            {"name": "total_score", "sum": {item: 1 for item in PSS10_ITEMS}},
+        ],
+        "total": "total_score",
+        "category_name": "stress_category",
+        "categories": [
+            (13, "low", "low"),
+            (26, "moderate", "moderate"),
+            (40, "high", "high"),
+        ],
+        # Cohen & Williamson (1988), US probability sample
+        "norm": {"version": "pss10-cohen-1988", "mean": 13.02, "sd": 6.35},
+        "insights": {
+            "low": ["Ваш уровень стресса находится в низком диапазоне"],
+            "moderate": ["Ваш уровень стресса находится в умеренном диапазоне"],
+            "high": ["Ваш уровень стресса высокий"],
+        },
+        "recommendations": {
+            "low": ["Поддерживайте текущий режим отдыха и физической активности"],
+            "moderate": [
+                "Практикуйте техники релаксации (дыхательные упражнения, медитация)",
+                "Соблюдайте режим сна не менее 7-8 часов",
+            ],
+            "high": [
+                "Практикуйте техники релаксации (дыхательные упражнения, медитация)",
+                "Соблюдайте режим сна не менее 7-8 часов",
+                "Рекомендуется консультация с психологом",
+            ],
+        },
+    },
+    "sleep_psqi": {
+        # q1 hours in bed, q2 minutes to fall asleep, q3 hours of sleep,
+        # q4-q13 items 5a-5j, q14 medication, q15-q16 daytime dysfunction,
+        # q17 subjective quality
+        "items": {
+            "q1": (0, 24),
+            "q2": (0, 600),
+            "q3": (0, 24),
+            **{f"q{i}": (0, 3) for i in range(4, 18)},
+        },
+        "reverse": [],
+        "terms": [
+            {"name": "latency_minutes", "sum": {"q2": 1}, "bins": [15, 30, 60], "right": True},
+            {"name": "subjective_quality", "sum": {"q17": 1}},
+            {"name": "sleep_latency", "sum": {"latency_minutes": 1, "q4": 1}, "bins": [0, 2, 4], "right": True},
+            # >7 h = 0, 6-7 h = 1, 5-6 h = 2, <5 h = 3: 7 h and 6 h score 1, 5 h scores 2
+            {"name": "sleep_duration", "sum": {"q3": -1}, "bins": [-7, -6, -5], "right": [False, True, True]},
+            {"name": "sleep_efficiency", "ratio": ("q3", "q1"), "scale": -100, "bins": [-85, -75, -65], "right": True},
+            {"name": "sleep_disturbances", "sum": {item: 1 for item in PSQI_DISTURBANCES}, "bins": [0, 9, 18], "right": True},
+            {"name": "sleep_medication", "sum": {"q14": 1}},
+            {"name": "daytime_dysfunction", "sum": {"q15": 1, "q16": 1}, "bins": [0, 2, 4], "right": True},
+            {
+                "name": "total_score",
+                "sum": {
+                    "subjective_quality": 1,
+                    "sleep_latency": 1,
+                    "sleep_duration": 1,
+                    "sleep_efficiency": 1,
+                    "sleep_disturbances": 1,
+                    "sleep_medication": 1,
+                    "daytime_dysfunction": 1,
+                },
+            },
+        ],
+        "hidden": ["latency_minutes"],
+        "total": "total_score",
+        "category_name": "sleep_quality",
+        "categories": [
+            (5, "good", "low"),
+            (10, "poor", "moderate"),
+            (21, "very_poor", "high"),
+        ],
+        # Buysse et al. (1989) and later community samples
+        "norm": {"version": "psqi-community", "mean": 4.9, "sd": 3.1},
+        "insights": {
+            "good": ["Качество сна в пределах нормы"],
+            "poor": ["Выявлены признаки нарушения качества сна"],
+            "very_poor": ["Выраженное нарушение качества сна"],
+        },
+        "recommendations": {
+            "good": ["Сохраняйте регулярный режим сна"],
+            "poor": [
+                "Соблюдайте постоянное время отхода ко сну и пробуждения",
+                "Ограничьте использование экранов за час до сна",
+            ],
+            "very_poor": [
+                "Соблюдайте постоянное время отхода ко сну и пробуждения",
+                "Рекомендуется консультация сомнолога",
+            ],
+        },
+    },
+    "cognitive_mmse": {
+        "items": {
+            "orientation_time": (0, 5),
+            "orientation_place": (0, 5),
+            "registration": (0, 3),
+            "attention": (0, 5),
+            "recall": (0, 3),
+            "naming": (0, 2),
+            "repetition": (0, 1),
+            "command": (0, 3),
+            "reading": (0, 1),
+            "writing": (0, 1),
+            "copying": (0, 1),
+        },
+        "reverse": [],
+        "terms": [
+            {"name": "orientation", "sum": {"orientation_time": 1, "orientation_place": 1}},
+            {"name": "registration", "sum": {"registration": 1}},
+            {"name": "attention", "sum": {"attention": 1}},
+            {"name": "recall", "sum": {"recall": 1}},
+            {
+                "name": "language",
+                "sum": {"naming": 1, "repetition": 1, "command": 1, "reading": 1, "writing": 1, "copying": 1},
+            },
+            {
+                "name": "total_score",
+                "sum": {"orientation": 1, "registration": 1, "attention": 1, "recall": 1, "language": 1},
+            },
+        ],
+        "total": "total_score",
+        "category_name": "cognitive_status",
+        "categories": [
+            (9, "severe", "high"),
+            (17, "moderate", "high"),
+            (23, "mild", "moderate"),
+            (30, "normal", "low"),
+        ],
+        # Crum et al. (1993), community-dwelling adults
+        "norm": {"version": "mmse-crum-1993", "mean": 27.0, "sd": 2.4},
+        "insights": {
+            "severe": ["Выраженное снижение когнитивных функций"],
+            "moderate": ["Умеренное снижение когнитивных функций"],
+            "mild": ["Лёгкое снижение когнитивных функций"],
+            "normal": ["Когнитивные функции в пределах нормы"],
+        },
+        "recommendations": {
+            "severe": ["Рекомендуется срочная консультация невролога"],
+            "moderate": ["Рекомендуется консультация невролога", "Рекомендуется нейропсихологическое обследование"],
+            "mild": ["Рекомендуется повторное тестирование через 6 месяцев", "Рекомендуется консультация невролога"],
+            "normal": ["Поддерживайте интеллектуальную и физическую активность"],
+        },
+    },
+}
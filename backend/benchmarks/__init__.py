@@ -0,0 +1,3 @@
+# Performance benchmarks (python -m benchmarks.run)
+
+
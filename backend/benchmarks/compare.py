@@ -0,0 +1,68 @@
+"""
+Compare two benchmark runs
+==========================
+::
+
+    python -m benchmarks.compare baseline.json current.json --threshold 10
+
+Prints throughput and p50/p99 latency per scenario with relative change
+and exits with status 1 if any scenario lost more than ``--threshold``
+percent throughput or gained more than that in p99 latency.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if not before or after is None:
+        return None
+    return 100.0 * (after - before) / before
+
+
+def _format(value: Optional[float], change: Optional[float]) -> str:
+    if value is None:
+        return f"{'-':>18}"
+    text = f"{value:.1f}" if change is None else f"{value:.1f} ({change:+.1f}%)"
+    return f"{text:>18}"
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    before = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    print(f"baseline {baseline['git']['commit']}  current {current['git']['commit']}")
+    if baseline["parameters"] != current["parameters"]:
+        print(f"⚠️  Runs used different parameters: {baseline['parameters']} vs {current['parameters']}")
+    print(f"{'scenario':32}{'throughput/s':>18}{'p50 ms':>18}{'p99 ms':>18}")
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if old is None or "failed" in result or "failed" in old:
+            print(f"{result['name']:32}  {'(no comparison)' if old is None else '(failed)'}")
+            continue
+        throughput = _change(old["throughput_per_s"], result["throughput_per_s"])
+        p50 = _change(old["latency_ms"]["p50"], result["latency_ms"]["p50"])
+        p99 = _change(old["latency_ms"]["p99"], result["latency_ms"]["p99"])
+        print(
+            f"{result['name']:32}"
+            f"{_format(result['throughput_per_s'], throughput)}"
+            f"{_format(result['latency_ms']['p50'], p50)}"
+            f"{_format(result['latency_ms']['p99'], p99)}"
+        )
+        if (throughput is not None and throughput < -threshold) or (p99 is not None and p99 > threshold):
+            regressions.append(result["name"])
+    if regressions:
+        print(f"\nRegressed beyond {threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+    sys.exit(compare(json.loads(args.baseline.read_text()), json.loads(args.current.read_text()), args.threshold))
@@ -0,0 +1,245 @@
+"""
+Benchmark harness
+=================
+Targets the app either in-process (httpx over ``ASGITransport``, with the
+lifespan run by hand) or through a local uvicorn subprocess, and drives
+it with a closed loop: ``concurrency`` workers each send a request as
+soon as the previous one returns, for a fixed duration after a warm-up.
+
+WebSocket scenarios open N clients that each send a message and wait for
+the reply in a loop; in-process sockets are driven through a minimal ASGI
+WebSocket client, uvicorn sockets through ``websockets``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ms = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(ms.max()), 3),
+        "mean": round(float(ms.mean()), 3),
+    }
+
+
+async def closed_loop(
+    call: Callable[[], Awaitable[bool]], concurrency: int, duration: float, warmup: float
+) -> dict:
+    """Run ``call`` from ``concurrency`` workers; it returns whether the operation succeeded"""
+    latencies: List[float] = []
+    counts = {"ok": 0, "errors": 0}
+    measuring = False
+
+    async def worker(deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await call()
+            except Exception:
+                ok = False
+            if measuring:
+                latencies.append(time.perf_counter() - started)
+                counts["ok" if ok else "errors"] += 1
+
+    if warmup > 0:
+        await asyncio.gather(*(worker(time.perf_counter() + warmup) for _ in range(concurrency)))
+    measuring = True
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(started + duration) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    total = counts["ok"] + counts["errors"]
+    return {
+        "operations": total,
+        "errors": counts["errors"],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(counts["ok"] / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+class AsgiWebSocket:
+    """Just enough of a WebSocket client to talk to an ASGI app in-process"""
+
+    def __init__(self, app, path: str, query: str = ""):
+        self.app = app
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "AsgiWebSocket":
+        self._task = asyncio.create_task(self.app(self.scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self._task, 5)
+        except Exception:
+            self._task.cancel()
+
+    async def send(self, data) -> None:
+        key = "bytes" if isinstance(data, bytes) else "text"
+        await self._to_app.put({"type": "websocket.receive", key: data})
+
+    async def recv(self):
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket closed: {message}")
+        return message.get("text") or message.get("bytes")
+
+
+class Target:
+    """Where requests go: an HTTP client plus a WebSocket connector"""
+
+    mode = "asgi"
+
+    def __init__(self, client: httpx.AsyncClient, connect_websocket: Callable[[str], Any]):
+        self.client = client
+        self.connect_websocket = connect_websocket
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float, process: Optional[subprocess.Popen] = None) -> None:
+    """Poll ``/health/ready`` so no scenario runs before the first health probe"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if (await client.get("/api/v1/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("backend did not become ready in time")
+        await asyncio.sleep(0.2)
+
+
+@asynccontextmanager
+async def asgi_target(startup_timeout: float = 60.0) -> AsyncIterator[Target]:
+    from app.main import app
+
+    # httpx ends multipart bodies with a CRLF the parser warns about on every upload
+    logging.getLogger("python_multipart").setLevel(logging.ERROR)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await wait_ready(client, startup_timeout)
+
+            def connect(url: str) -> AsgiWebSocket:
+                parts = urlsplit(url)
+                return AsgiWebSocket(app, parts.path, parts.query)
+
+            yield Target(client, connect)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_target(workers: int = 1, startup_timeout: float = 60.0) -> AsyncIterator[Target]:
+    import websockets.asyncio.client
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            await wait_ready(client, startup_timeout, process)
+
+            def connect(url: str):
+                return websockets.asyncio.client.connect(f"ws://127.0.0.1:{port}{url}", max_size=None)
+
+            target = Target(client, connect)
+            target.mode = "uvicorn"
+            yield target
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def websocket_load(
+    target: Target,
+    url: str,
+    message: Callable[[], Any],
+    clients: int,
+    duration: float,
+    warmup: float,
+) -> dict:
+    """``clients`` sockets each sending ``message()`` and awaiting the reply, in a loop"""
+    connections = [target.connect_websocket(url) for _ in range(clients)]
+    sockets = await asyncio.gather(*(connection.__aenter__() for connection in connections))
+    queue: asyncio.Queue = asyncio.Queue()
+    for sock in sockets:
+        queue.put_nowait(sock)
+
+    async def round_trip() -> bool:
+        sock = await queue.get()
+        try:
+            payload = message()
+            await sock.send(payload if isinstance(payload, bytes) else json.dumps(payload))
+            json.loads(await sock.recv())
+            return True
+        finally:
+            queue.put_nowait(sock)
+
+    try:
+        result = await closed_loop(round_trip, clients, duration, warmup)
+    finally:
+        await asyncio.gather(
+            *(connection.__aexit__(None, None, None) for connection in connections), return_exceptions=True
+        )
+    result["clients"] = clients
+    return result
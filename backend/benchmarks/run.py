@@ -0,0 +1,144 @@
+"""
+Run the benchmark suite
+=======================
+From ``backend/`` (with the database the app is configured for)::
+
+    python -m benchmarks.run                          # in-process ASGI
+    python -m benchmarks.run --mode uvicorn --workers 4
+    python -m benchmarks.run --only 'iot.*' --only 'ct_mri.*' --duration 10
+
+Writes one JSON document (environment, git commit, parameters and a result
+per scenario) to ``--output``, by default
+``benchmarks/results/<commit>-<mode>-<timestamp>.json``; compare two runs
+with ``python -m benchmarks.compare``.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks import harness
+from benchmarks.scenarios import SCENARIOS, Context, Scenario, prepare
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def git_revision() -> dict:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=harness.BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def selected(patterns: List[str]) -> List[Scenario]:
+    if not patterns:
+        return list(SCENARIOS)
+    return [s for s in SCENARIOS if any(fnmatch.fnmatch(s.name, p) or s.router == p for p in patterns)]
+
+
+async def run_scenario(target: harness.Target, scenario: Scenario, ctx: Context, args) -> dict:
+    if scenario.kind == "websocket":
+        result = await harness.websocket_load(
+            target,
+            scenario.url(ctx),
+            lambda: scenario.message(ctx),
+            args.ws_clients,
+            args.duration,
+            args.warmup,
+        )
+    else:
+        async def call() -> bool:
+            response = await scenario.request(target.client, ctx)
+            return response.status_code == scenario.expect
+
+        result = await harness.closed_loop(call, args.concurrency, args.duration, args.warmup)
+        result["concurrency"] = args.concurrency
+    if scenario.kind == "upload":
+        result["upload_bytes"] = len(ctx.upload)
+        result["upload_mb_per_s"] = round(result["throughput_per_s"] * len(ctx.upload) / 2 ** 20, 2)
+    return {"name": scenario.name, "router": scenario.router, "kind": scenario.kind, **result}
+
+
+async def main(args) -> dict:
+    scenarios = selected(args.only)
+    target_context = (
+        harness.uvicorn_target(args.workers) if args.mode == "uvicorn" else harness.asgi_target()
+    )
+    results = []
+    async with target_context as target:
+        ctx = await prepare(target.client, args.upload_kb * 1024, args.frame_kb * 1024)
+        for scenario in scenarios:
+            try:
+                # Start every scenario from a ready backend (compaction, probes, pools settled)
+                await harness.wait_ready(target.client, 60.0)
+                result = await run_scenario(target, scenario, ctx, args)
+            except Exception as exc:
+                result = {"name": scenario.name, "router": scenario.router, "kind": scenario.kind, "failed": str(exc)}
+            results.append(result)
+            summary = result.get("latency_ms", {})
+            print(
+                f"{scenario.name:32} {result.get('throughput_per_s', 0):>10} /s"
+                f"  p50 {summary.get('p50')} ms  p99 {summary.get('p99')} ms"
+                f"  errors {result.get('errors', result.get('failed'))}",
+                file=sys.stderr,
+            )
+    return {
+        "git": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else None,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws_clients,
+            "upload_kb": args.upload_kb,
+            "frame_kb": args.frame_kb,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend API")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP requests")
+    parser.add_argument("--ws-clients", type=int, default=16, help="concurrent WebSocket clients")
+    parser.add_argument("--upload-kb", type=int, default=512, help="size of the uploaded scan")
+    parser.add_argument("--frame-kb", type=int, default=32, help="size of a rehabilitation video frame")
+    parser.add_argument("--only", action="append", default=[], help="scenario glob or router name (repeatable)")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/...)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = args.output
+    if output is None:
+        commit = (report["git"]["commit"] or "unknown")[:12]
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{commit}-{args.mode}-{time.strftime('%Y%m%d%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(output)
@@ -0,0 +1,267 @@
+"""
+Benchmark scenarios
+===================
+At least one scenario per router in ``app/api/router.py``. Each HTTP
+scenario builds one request from the shared ``Context`` (a registered
+patient, its token, an active IoT session and a few stored results) and
+states the status that counts as success.
+"""
+
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class Context:
+    email: str = ""
+    token: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    user_id: str = ""
+    iot_session_id: str = ""
+    scan_id: str = ""
+    blood_analysis_id: str = ""
+    questionnaire_result_id: str = ""
+    pss10_answers: List[dict] = field(default_factory=list)
+    upload: bytes = b""
+    frame: bytes = b""
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    kind: str  # "http", "upload" or "websocket"
+    request: Optional[Callable[[httpx.AsyncClient, Context], Any]] = None
+    expect: int = 200
+    # WebSocket scenarios: socket URL and the message each client sends
+    url: Optional[Callable[[Context], str]] = None
+    message: Optional[Callable[[Context], Any]] = None
+
+
+SCENARIOS: List[Scenario] = []
+
+
+def http(name: str, router: str, expect: int = 200, kind: str = "http"):
+    def register(request):
+        SCENARIOS.append(Scenario(name, router, kind, request, expect))
+        return request
+
+    return register
+
+
+def websocket(name: str, router: str, url: Callable[[Context], str], message: Callable[[Context], Any]) -> None:
+    SCENARIOS.append(Scenario(name, router, "websocket", url=url, message=message))
+
+
+def png_payload(size: int) -> bytes:
+    """A valid grayscale PNG of roughly ``size`` bytes (incompressible noise)"""
+    import numpy as np
+
+    side = max(int(size ** 0.5), 8)
+    pixels = np.random.default_rng(0).integers(0, 256, (side, side), dtype=np.uint8)
+    raw = b"".join(b"\x00" + row.tobytes() for row in pixels)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+
+    header = side.to_bytes(4, "big") * 2 + bytes([8, 0, 0, 0, 0])
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+async def prepare(client: httpx.AsyncClient, upload_bytes: int, frame_bytes: int) -> Context:
+    """Register a throwaway patient and create the records the scenarios read"""
+    ctx = Context(upload=png_payload(upload_bytes), frame=b"\xff\xd8" + bytes(frame_bytes))
+    ctx.email = email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+
+    async def call(method: str, path: str, **kwargs) -> dict:
+        response = await client.request(method, API + path, headers=ctx.headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    ctx.user_id = (await call("POST", "/auth/register", json={"name": "Benchmark", "email": email, "password": PASSWORD}))["id"]
+    ctx.token = (await call("POST", "/auth/login", json={"email": email, "password": PASSWORD}))["access_token"]
+    ctx.headers = {"Authorization": f"Bearer {ctx.token}"}
+
+    ctx.iot_session_id = (await call("POST", "/services/iot/session/start"))["session_id"]
+    ctx.scan_id = (await call("POST", "/services/ct-mri/analyze", files=_scan_file(ctx)))["id"]
+    ctx.blood_analysis_id = (await call("POST", "/services/blood/analyze", json=BLOOD_PANEL))["id"]
+    questionnaire = await call("GET", "/services/questionnaire/stress_pss10")
+    ctx.pss10_answers = [{"question_id": q["id"], "value": q.get("scale_min") or 0} for q in questionnaire["questions"]]
+    submitted = await call("POST", "/services/questionnaire/submit", json={
+        "questionnaire_id": "stress_pss10",
+        "answers": ctx.pss10_answers,
+    })
+    ctx.questionnaire_result_id = submitted["id"]
+    return ctx
+
+
+def _scan_file(ctx: Context) -> dict:
+    return {"file": ("scan.png", ctx.upload, "image/png")}
+
+
+BLOOD_PANEL = {
+    "markers": [
+        {"name": "NfL", "value": 12.5, "unit": "pg/mL"},
+        {"name": "Glucose", "value": 5.2, "unit": "mmol/L"},
+        {"name": "Vitamin B12", "value": 350, "unit": "pg/mL"},
+    ],
+    "sex": "FEMALE",
+}
+CAG_READS = ["ATG" + "CAG" * 42 + "CCGCCA", "GGC" + "CAG" * 19 + "CAACAG"]
+
+
+# Health and auth
+@http("health.liveness", "health")
+def _(client, ctx):
+    return client.get(f"{API}/health")
+
+
+@http("health.ready", "health")
+def _(client, ctx):
+    return client.get(f"{API}/health/ready")
+
+
+@http("auth.login", "auth")
+def _(client, ctx):
+    # Dominated by bcrypt at BCRYPT_ROUNDS
+    return client.post(f"{API}/auth/login", json={"email": ctx.email, "password": PASSWORD})
+
+
+@http("auth.me", "auth")
+def _(client, ctx):
+    return client.get(f"{API}/auth/me", headers=ctx.headers)
+
+
+@http("users.get_self", "users")
+def _(client, ctx):
+    return client.get(f"{API}/users/{ctx.user_id}", headers=ctx.headers)
+
+
+# S1: CT/MRI
+@http("ct_mri.analyze_upload", "ct_mri", kind="upload")
+def _(client, ctx):
+    return client.post(f"{API}/services/ct-mri/analyze", headers=ctx.headers, files=_scan_file(ctx))
+
+
+@http("ct_mri.history", "ct_mri")
+def _(client, ctx):
+    return client.get(f"{API}/services/ct-mri/history", headers=ctx.headers)
+
+
+@http("ct_mri.get_scan", "ct_mri")
+def _(client, ctx):
+    return client.get(f"{API}/services/ct-mri/scan/{ctx.scan_id}", headers=ctx.headers)
+
+
+@http("ct_mri.models", "ct_mri")
+def _(client, ctx):
+    return client.get(f"{API}/services/ct-mri/models", headers=ctx.headers)
+
+
+# S2: IoT
+@http("iot.submit_ppg", "iot")
+def _(client, ctx):
+    return client.post(f"{API}/services/iot/data/ppg", headers=ctx.headers, json={
+        "timestamp": "2025-01-01T00:00:00Z",
+        "heart_rate": 72,
+        "hrv_sdnn": 48.0,
+        "hrv_rmssd": 39.5,
+        "spo2": 98.1,
+        "stress_level": 31.0,
+        "session_id": ctx.iot_session_id,
+    })
+
+
+@http("iot.session_summary", "iot")
+def _(client, ctx):
+    return client.get(f"{API}/services/iot/session/{ctx.iot_session_id}", headers=ctx.headers)
+
+
+@http("iot.stress_analysis", "iot")
+def _(client, ctx):
+    return client.get(f"{API}/services/iot/stress/analysis", headers=ctx.headers)
+
+
+websocket(
+    "iot.ws_stream",
+    "iot",
+    url=lambda ctx: f"{API}/services/iot/ws/{ctx.iot_session_id}?token={ctx.token}",
+    message=lambda ctx: {"type": "ppg", "heart_rate": 72, "spo2": 98.0, "stress_level": 30.0},
+)
+
+
+# S3: Questionnaire
+@http("questionnaire.list", "questionnaire")
+def _(client, ctx):
+    return client.get(f"{API}/services/questionnaire/list", headers=ctx.headers)
+
+
+@http("questionnaire.submit", "questionnaire")
+def _(client, ctx):
+    return client.post(f"{API}/services/questionnaire/submit", headers=ctx.headers, json={
+        "questionnaire_id": "stress_pss10",
+        "answers": ctx.pss10_answers,
+    })
+
+
+@http("questionnaire.history", "questionnaire")
+def _(client, ctx):
+    return client.get(f"{API}/services/questionnaire/history", headers=ctx.headers)
+
+
+@http("questionnaire.get_result", "questionnaire")
+def _(client, ctx):
+    return client.get(f"{API}/services/questionnaire/result/{ctx.questionnaire_result_id}", headers=ctx.headers)
+
+
+# S4: Genetics
+@http("genetics.risk_factors", "genetics")
+def _(client, ctx):
+    return client.get(f"{API}/services/genetics/risk-factors", headers=ctx.headers)
+
+
+@http("genetics.repeat_scan", "genetics")
+def _(client, ctx):
+    return client.post(f"{API}/services/genetics/repeats/scan", headers=ctx.headers, json={"reads": CAG_READS})
+
+
+# S5: Blood
+@http("blood.analyze", "blood")
+def _(client, ctx):
+    return client.post(f"{API}/services/blood/analyze", headers=ctx.headers, json=BLOOD_PANEL)
+
+
+@http("blood.get_analysis", "blood")
+def _(client, ctx):
+    return client.get(f"{API}/services/blood/analysis/{ctx.blood_analysis_id}", headers=ctx.headers)
+
+
+@http("blood.markers", "blood")
+def _(client, ctx):
+    return client.get(f"{API}/services/blood/markers", headers=ctx.headers)
+
+
+# S6: Rehabilitation
+@http("rehabilitation.exercises", "rehabilitation")
+def _(client, ctx):
+    return client.get(f"{API}/services/rehabilitation/exercises", headers=ctx.headers)
+
+
+@http("rehabilitation.progress", "rehabilitation")
+def _(client, ctx):
+    return client.get(f"{API}/services/rehabilitation/progress", headers=ctx.headers)
+
+
+websocket(
+    "rehabilitation.ws_frames",
+    "rehabilitation",
+    url=lambda ctx: f"{API}/services/rehabilitation/ws/bench?token={ctx.token}",
+    message=lambda ctx: ctx.frame,
+)
@@ -0,0 +1,47 @@
+import importlib
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.security import create_access_token
+
+
+@pytest.fixture(autouse=True)
+def upload_path(tmp_path, monkeypatch):
+    """Uploads, indexes, trends and caches of each test live in its own directory"""
+    monkeypatch.setattr(settings, "UPLOAD_PATH", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client():
+    # No lifespan, so no database: tests patch the query functions they reach
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth():
+    """Authorization header for a token with the given claims"""
+
+    def headers(sub: str = "user-1", role: str = "PATIENT", pid: str = "patient-1") -> dict:
+        return {"Authorization": f"Bearer {create_access_token(sub, role=role, patient_id=pid)}"}
+
+    return headers
+
+
+@pytest.fixture
+def no_db(monkeypatch):
+    """Endpoint ``transaction()`` blocks get a dummy connection"""
+
+    @asynccontextmanager
+    async def transaction():
+        yield None
+
+    for name in ("ct_mri", "blood", "genetics", "iot", "questionnaire"):
+        module = importlib.import_module(f"app.api.endpoints.{name}")
+        if hasattr(module, "transaction"):
+            monkeypatch.setattr(module, "transaction", transaction)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+import pytest
+from passlib.context import CryptContext
+
+from app.api.endpoints import auth as auth_endpoints
+from app.core import security
+from app.core.security import PasswordHashingBusy, _HashExecutor
+
+CHEAP = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+def test_executor_sheds_load_beyond_its_queue():
+    executor = _HashExecutor(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordHashingBusy):
+            await executor.run(lambda: None)
+        release.set()
+        await running
+        return await executor.run(lambda: "ok")
+
+    assert asyncio.run(main()) == "ok"
+    assert executor.pending == 0
+
+
+def test_register_answers_503_when_hashing_is_saturated(client, monkeypatch):
+    monkeypatch.setattr(security._hash_executor, "max_pending", 0)
+    response = client.post(
+        "/api/v1/auth/register", json={"name": "A", "email": "a@example.com", "password": "pw"}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+@pytest.fixture
+def users(monkeypatch):
+    rehashed = {}
+    stored = {
+        "a@example.com": {
+            "id": "user-a",
+            "role": "PATIENT",
+            "patient_id": "patient-a",
+            "password": CHEAP.hash("correct horse"),
+        },
+    }
+
+    @asynccontextmanager
+    async def transaction():
+        yield None
+
+    async def get_user_by_email(conn, email):
+        return stored.get(email)
+
+    async def set_password_hash(conn, user_id, password_hash):
+        rehashed[user_id] = password_hash
+
+    monkeypatch.setattr(auth_endpoints, "transaction", transaction)
+    monkeypatch.setattr(auth_endpoints.users_db, "get_user_by_email", get_user_by_email)
+    monkeypatch.setattr(auth_endpoints.users_db, "set_password_hash", set_password_hash)
+    return rehashed
+
+
+def test_login_rehashes_at_the_configured_cost(client, users):
+    response = client.post("/api/v1/auth/login", json={"email": "a@example.com", "password": "correct horse"})
+    assert response.status_code == 200
+    assert security.decode_access_token(response.json()["access_token"])["pid"] == "patient-a"
+    assert security.verify_password("correct horse", users["user-a"])
+    assert f"${security.settings.BCRYPT_ROUNDS:02d}$" in users["user-a"]
+
+
+@pytest.mark.parametrize("email, password", [("a@example.com", "wrong"), ("nobody@example.com", "correct horse")])
+def test_failed_logins_look_alike(client, users, email, password):
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid email or password"
+    assert users == {}
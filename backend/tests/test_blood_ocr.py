@@ -0,0 +1,49 @@
+import pytest
+
+from app.services.blood.ocr import extract_markers
+
+
+@pytest.mark.parametrize(
+    "line, name, value, unit, reference",
+    [
+        ("Amyloid-beta 42 650 pg/mL 500-1000", "Amyloid-beta 42", 650, "pg/mL", (500, 1000)),
+        ("Aβ42: 650 pg/mL", "Aβ42", 650, "pg/mL", (None, None)),
+        ("p-tau181 2.1 pg/mL", "p-tau181", 2.1, "pg/mL", (None, None)),
+        ("Amyloid-beta 42 650 500-1000", "Amyloid-beta 42", 650, "", (500, 1000)),
+        ("NfL: 12,5 pg/mL (0-20)", "NfL", 12.5, "pg/mL", (0, 20)),
+        ("CRP 5.2 mg/L 0–3 H", "CRP", 5.2, "mg/L", (0, 3)),
+        ("Homocysteine 12 μmol/L", "Homocysteine", 12, "μmol/L", (None, None)),
+        ("Glucose 5,5 mmol/L 3,9-6,1", "Glucose", 5.5, "mmol/L", (3.9, 6.1)),
+    ],
+)
+def test_extract_marker_line(line, name, value, unit, reference):
+    [marker] = extract_markers(line)
+    assert marker["name"] == name
+    assert marker["value"] == pytest.approx(value)
+    assert marker["unit"] == unit
+    assert (marker["reference_min"], marker["reference_max"]) == reference
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Hemoglobin 135 g/L",  # untracked and no reference range
+        "Date 2024 01 05",
+        "Patient: Ivanov I.I.",
+        "",
+    ],
+)
+def test_extract_skips_lines_without_a_marker(line):
+    assert extract_markers(line) == []
+
+
+def test_extract_reads_every_marker_of_a_report():
+    text = "\n".join([
+        "LAB REPORT 12/2024",
+        "NfL 14 pg/mL 0-20",
+        "Aβ42: 420 pg/mL",
+        "Tau protein 310 pg/mL",
+    ])
+    assert [(marker["name"], marker["value"]) for marker in extract_markers(text)] == [
+        ("NfL", 14), ("Aβ42", 420), ("Tau protein", 310),
+    ]
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.blood.scoring import marker_key, score_panels
+
+
+def marker(name, value, unit="pg/mL", reference_min=None, reference_max=None):
+    return SimpleNamespace(name=name, value=value, unit=unit, reference_min=reference_min, reference_max=reference_max)
+
+
+def statuses(*markers):
+    [result] = score_panels([markers])
+    return [scored["status"] for scored in result["markers"]]
+
+
+@pytest.mark.parametrize(
+    "name, key",
+    [("p-tau181", "ptau181"), ("pTau217", "ptau217"), ("Total tau", "tau"), ("Aβ42", "abeta42"), ("Glucose", "")],
+)
+def test_marker_keys(name, key):
+    assert marker_key(name) == key
+
+
+def test_raised_p_tau_is_not_judged_on_the_total_tau_range():
+    assert statuses(marker("p-tau181", 4.0), marker("p-tau217", 0.9), marker("Tau", 4.0)) == [
+        "high", "critical", "normal",
+    ]
+    assert statuses(marker("p-tau181", 1.2), marker("p-tau217", 0.2)) == ["normal", "normal"]
+
+
+def test_units_are_converted_to_the_canonical_unit():
+    [result] = score_panels([[marker("NfL", 0.03, "ng/mL")]])
+    assert result["markers"][0]["value"] == pytest.approx(30.0)
+    assert result["markers"][0]["status"] == "high"
+
+
+def test_unknown_unit_is_unknown():
+    assert statuses(marker("NfL", 12, "mmol/L")) == ["unknown"]
+
+
+def test_untracked_marker_uses_the_lab_range():
+    assert statuses(marker("Glucose", 7.5, "mmol/L", 3.9, 6.1)) == ["high"]
+
+
+def test_low_amyloid_is_the_concern():
+    [result] = score_panels([[marker("Aβ42", 300)]])
+    assert result["markers"][0]["status"] == "low"
+    assert result["risk_factors"][0]["risk_level"] != "normal"
+
+
+def test_panels_are_scored_independently():
+    healthy, raised = score_panels([[marker("NfL", 10)], [marker("NfL", 45), marker("CRP", 9, "mg/L")]])
+    assert healthy["overall_risk"] == "low"
+    assert raised["overall_risk"] in ("high", "critical")
+    assert raised["neuro_markers"]["nfl_level"] == "critical"
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.services.blood.sketches import CohortSketches, TDigest, strata
+
+
+@pytest.fixture
+def values() -> np.ndarray:
+    return np.random.default_rng(3).lognormal(mean=2.5, sigma=0.5, size=20000)
+
+
+def test_quantiles_are_close_to_exact(values):
+    digest = TDigest(200)
+    digest.update(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert digest.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+    assert digest.cdf(np.median(values)) == pytest.approx(0.5, abs=0.01)
+    assert len(digest.means) < 1000
+
+
+def test_merged_digests_match_a_single_digest(values):
+    whole = TDigest(200)
+    whole.update(values)
+    merged = TDigest(200)
+    for part in np.array_split(values, 7):
+        shard = TDigest(200)
+        shard.update(part)
+        merged.merge(shard)
+    assert merged.count == whole.count == len(values)
+    assert merged.min == values.min() and merged.max == values.max()
+    for q in (0.05, 0.5, 0.95):
+        assert merged.quantile(q) == pytest.approx(whole.quantile(q), rel=0.02)
+
+
+def test_empty_digest():
+    assert np.isnan(TDigest().cdf(1.0))
+
+
+def test_strata_most_specific_first():
+    assert strata("FEMALE", 64) == ["sex=FEMALE|age=60-69", "sex=FEMALE", "age=60-69", "all"]
+    assert strata(None, None) == ["all"]
+
+
+def test_small_strata_fall_back_to_the_whole_cohort():
+    sketches = CohortSketches(None, 100, 30.0)
+    sketches.add("nfl", list(range(100)), sex="MALE", age=45)
+    sketches.add("nfl", [500.0] * 5, sex="FEMALE", age=45)
+    assert sketches.lookup("nfl", "MALE", 45)[0] == "sex=MALE|age=40-49"
+    assert sketches.lookup("nfl", "FEMALE", 45)[0] == "age=40-49"
+    assert sketches.lookup("nfl", "FEMALE", 20)[0] == "all"
+    assert sketches.percentile("crp", 1.0) is None
+
+
+def test_workers_converge_through_the_shared_file(tmp_path):
+    first = CohortSketches(tmp_path, 100, 3600.0)
+    second = CohortSketches(tmp_path, 100, 3600.0)
+    first.add("nfl", [float(v) for v in range(50)])
+    second.add("nfl", [float(v) for v in range(50, 100)])
+    first.flush()
+    second.flush()
+    first.flush()
+    for sketches in (first, second):
+        described = sketches.describe("nfl")
+        assert described["count"] == 100
+        assert described["quantiles"]["p50"] == pytest.approx(49.5, abs=1.5)
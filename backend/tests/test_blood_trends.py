@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.endpoints import blood
+from app.services.blood import trends
+from app.services.blood.trends import TrendStore
+
+DAY = 86400.0
+
+
+@pytest.mark.parametrize("patient_id", ["../etc", "a/b", "", "x" * 65])
+def test_patient_id_is_validated_before_use_as_a_path(tmp_path, patient_id):
+    with pytest.raises(ValueError):
+        TrendStore(tmp_path).append(patient_id, "nfl", [(0.0, 1.0)])
+
+
+def test_slope_and_trend():
+    store = TrendStore()
+    store.append("p1", "nfl", [(day * DAY, 10.0 + day) for day in range(10)])
+    summary = store.summary("p1", "nfl")
+    assert summary["count"] == 10
+    assert summary["slope_per_day"] == pytest.approx(1.0)
+    assert summary["trend"] == "worsening"
+
+    store.append("p1", "abeta42", [(day * DAY, 900.0 - 50 * day) for day in range(3)])
+    assert store.summary("p1", "abeta42")["trend"] == "worsening"  # falling Aβ42 is the concern
+
+
+def test_back_dated_points_are_kept_in_order():
+    store = TrendStore()
+    store.append("p1", "crp", [(3 * DAY, 3.0), (1 * DAY, 1.0)])
+    store.append("p1", "crp", [(2 * DAY, 2.0)])
+    assert [point["value"] for point in store.history("p1", "crp")] == [1.0, 2.0, 3.0]
+
+
+def test_evicted_series_reload_from_their_log(tmp_path):
+    store = TrendStore(tmp_path, max_series=2)
+    for patient in ("p1", "p2", "p3"):
+        store.append(patient, "nfl", [(0.0, 5.0), (DAY, 6.0)])
+    assert len(store._series) == 2
+    assert [point["value"] for point in store.history("p1", "nfl")] == [5.0, 6.0]
+    assert store.summary("p1", "nfl")["count"] == 2
+
+
+def test_points_written_by_another_worker_are_read(tmp_path):
+    writer, reader = TrendStore(tmp_path), TrendStore(tmp_path)
+    reader.summary("p1", "tau")
+    writer.append("p1", "tau", [(0.0, 100.0)])
+    assert reader.summary("p1", "tau")["count"] == 1
+
+
+def test_trends_endpoint_reads_the_callers_series(client, auth, no_db, monkeypatch):
+    monkeypatch.setattr(trends, "_store", None)
+
+    async def create_analysis(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(blood.analyses_db, "create_analysis", create_analysis)
+    start = datetime(2026, 1, 1)
+    for month, value in enumerate([10.0, 14.0, 19.0]):
+        panel = {
+            "markers": [{"name": "NfL", "value": value, "unit": "pg/mL"}],
+            "test_date": (start + timedelta(days=30 * month)).isoformat(),
+        }
+        assert client.post("/api/v1/services/blood/analyze", json=panel, headers=auth(pid="p1")).status_code == 200
+
+    mine = client.get("/api/v1/services/blood/trends/NfL", headers=auth(pid="p1")).json()
+    assert [point["value"] for point in mine["data_points"]] == [10.0, 14.0, 19.0]
+    assert mine["trend"] == "worsening"
+    other = client.get("/api/v1/services/blood/trends/NfL", headers=auth(pid="p2")).json()
+    assert other["data_points"] == []
@@ -0,0 +1,91 @@
+import asyncio
+
+from app.core.cache import LocalCache, NoStore, ResultCache
+
+
+def make_cache() -> ResultCache:
+    return ResultCache(LocalCache(max_size=8, ttl=60), NoStore(), ttl=60)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = make_cache()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"value": 1}] * 5
+    assert calls == 1
+    assert cache.stats["coalesced"] == 4
+
+
+def test_hit_skips_the_loader():
+    cache = make_cache()
+
+    async def main():
+        await cache.get_or_load("key", lambda: asyncio.sleep(0, result=1))
+        return await cache.get_or_load("key", lambda: asyncio.sleep(0, result=2))
+
+    assert asyncio.run(main()) == 1
+    assert cache.stats["l1_hits"] == 1
+
+
+def test_none_is_not_cached():
+    cache = make_cache()
+    results = iter([None, "loaded"])
+
+    async def load():
+        return next(results)
+
+    async def main():
+        return await cache.get_or_load("key", load), await cache.get_or_load("key", load)
+
+    assert asyncio.run(main()) == (None, "loaded")
+
+
+def test_invalidation_during_a_load_discards_its_result():
+    cache = make_cache()
+    versions = iter(["stale", "fresh"])
+
+    async def load():
+        value = next(versions)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        loading = asyncio.ensure_future(cache.get_or_load("key", load))
+        await asyncio.sleep(0)
+        await cache.invalidate("key")
+        stale = await loading
+        return stale, await cache.get_or_load("key", load)
+
+    assert asyncio.run(main()) == ("stale", "fresh")
+
+
+def test_put_and_invalidate():
+    cache = make_cache()
+
+    async def main():
+        await cache.put("key", {"id": 1})
+        hit = await cache.get_or_load("key", lambda: asyncio.sleep(0, result=None))
+        await cache.invalidate("key")
+        miss = await cache.get_or_load("key", lambda: asyncio.sleep(0, result=None))
+        return hit, miss
+
+    assert asyncio.run(main()) == ({"id": 1}, None)
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_size=2, ttl=60)
+    local.put("a", 1)
+    local.put("b", 2)
+    local.get("a")
+    local.put("c", 3)
+    assert len(local) == 2
+    assert local.get("a") == 1 and local.get("c") == 3
@@ -0,0 +1,91 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.catalog import Catalog, accepts_encoding, etag_matches
+
+
+@pytest.mark.parametrize(
+    "header, accepted",
+    [
+        (None, False),
+        ("gzip", True),
+        ("br, gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("identity, *;q=0", False),
+        ("gzip;q=0, *", False),
+        ("GZIP;q=bogus", False),
+    ],
+)
+def test_accepts_encoding(header, accepted):
+    assert accepts_encoding(header, "gzip") is accepted
+
+
+@pytest.mark.parametrize(
+    "header, matches",
+    [(None, False), ("*", True), ('"a", "b"', True), ('W/"b"', True), ('"c"', False), ('"b-gz"', False)],
+)
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"b"') is matches
+
+
+@pytest.fixture
+def catalog_client():
+    catalog = Catalog()
+    calls = []
+
+    def build(text):
+        def load():
+            calls.append(text)
+            return {"greeting": text}
+        return load
+
+    catalog.register("greetings", build("привет"))
+    catalog.register("greetings", build("hello"), locale="en")
+    app = FastAPI()
+
+    @app.get("/catalog/{name}")
+    def serve(name: str, request: Request):
+        return catalog.respond(request, name)
+
+    return TestClient(app), calls
+
+
+def test_catalog_is_built_once_per_locale(catalog_client):
+    client, calls = catalog_client
+    for _ in range(3):
+        assert client.get("/catalog/greetings").json() == {"greeting": "привет"}
+    assert client.get("/catalog/greetings", headers={"Accept-Language": "en-GB,ru;q=0.5"}).json() == {"greeting": "hello"}
+    assert calls == ["привет", "hello"]
+    assert client.get("/catalog/missing").status_code == 404
+
+
+def test_each_content_coding_has_its_own_etag(catalog_client):
+    client, _ = catalog_client
+    plain = client.get("/catalog/greetings", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/catalog/greetings", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gz"'
+    assert json.loads(zipped.content) == plain.json()
+
+    revalidated = client.get(
+        "/catalog/greetings", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    cross = client.get(
+        "/catalog/greetings", headers={"Accept-Encoding": "identity", "If-None-Match": zipped.headers["etag"]}
+    )
+    assert cross.status_code == 200
+
+
+def test_gzip_body_is_deterministic():
+    catalog = Catalog()
+    catalog.register("x", lambda: {"a": 1})
+    entry = catalog.entry("x")
+    assert gzip.decompress(entry.gzip_body) == entry.body == b'{"a":1}'
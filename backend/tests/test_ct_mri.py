@@ -0,0 +1,24 @@
+from app.api.endpoints import ct_mri
+
+
+def test_upload_is_stored_pending_without_findings(client, auth, no_db, monkeypatch):
+    stored = {}
+
+    async def create_analysis(conn, patient_id, service_type, result, **fields):
+        stored.update(fields, patient_id=patient_id, result=result)
+
+    monkeypatch.setattr(ct_mri.analyses_db, "create_analysis", create_analysis)
+    response = client.post(
+        "/api/v1/services/ct-mri/analyze",
+        files={"file": ("scan.png", b"\x89PNG", "image/png")},
+        headers=auth(pid="patient-7"),
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "pending"
+    assert body["findings"] == [] and body["confidence"] is None and body["risk_level"] is None
+
+    assert stored["patient_id"] == "patient-7"
+    assert stored["status"] == "PENDING"
+    assert stored["result"] == body
+    assert not {"findings", "confidence", "risk"} & stored.keys()
@@ -0,0 +1,106 @@
+import pytest
+
+from app.services.genetics import analysis
+
+GENETICS = "/api/v1/services/genetics"
+FASTA = b">chr_test\n" + b"ACGT" * 50 + b"\n"
+
+
+@pytest.fixture
+def sequence_id(client, auth):
+    response = client.post(
+        f"{GENETICS}/sequence/upload",
+        files={"file": ("sample.fasta", FASTA, "text/plain")},
+        headers=auth(sub="owner"),
+    )
+    assert response.status_code == 200
+    return response.json()["sequence_id"]
+
+
+def test_owner_reads_their_sequence(client, auth, sequence_id):
+    status = client.get(f"{GENETICS}/sequence/{sequence_id}", headers=auth(sub="owner"))
+    assert status.status_code == 200
+    assert status.json()["status"] == "parsed"
+
+    region = client.get(f"{GENETICS}/sequence/{sequence_id}/region?start=0&end=8", headers=auth(sub="owner"))
+    assert region.status_code == 200
+    assert region.json()["sequence"] == "ACGTACGT"
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["", "/region?start=0&end=8", "/variants?chrom=1&start=1&end=10", "/risk-variants", "/repeats"],
+)
+def test_other_users_get_404(client, auth, sequence_id, path):
+    response = client.get(f"{GENETICS}/sequence/{sequence_id}{path}", headers=auth(sub="someone-else"))
+    assert response.status_code == 404
+
+
+def test_batch_analysis_skips_other_users_samples(auth, sequence_id):
+    with pytest.raises(KeyError):
+        analysis.analyze_sequence_upload(sequence_id, "someone-else")
+    assert analysis.analyze_sequence_upload(sequence_id, "owner")["status"] == "completed"
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(analysis, "get_pool", lambda: pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_analysis_is_stored_and_fetched_by_id(client, auth, sequence_id, thread_pool):
+    started = client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="owner"))
+    assert started.status_code == 200
+    analysis_id = started.json()["analysis_id"]
+    assert analysis_id == f"analysis_{sequence_id}"
+
+    result = client.get(f"{GENETICS}/analysis/{analysis_id}", headers=auth(sub="owner"))
+    assert result.status_code == 200
+    assert result.json()["status"] == "completed"
+    assert result.json()["sequence_id"] == sequence_id
+    assert result.json()["risk_factors"] == []
+
+    again = client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="owner"))
+    assert again.json()["status"] == "completed"
+
+
+def test_batch_results_are_fetchable(client, auth, sequence_id, thread_pool):
+    batch = client.post(f"{GENETICS}/analyze/batch", json={"sequence_ids": [sequence_id]}, headers=auth(sub="owner"))
+    assert '"status": "completed"' in batch.text
+    result = client.get(f"{GENETICS}/analysis/analysis_{sequence_id}", headers=auth(sub="owner"))
+    assert result.status_code == 200
+
+
+@pytest.mark.parametrize("analysis_id", ["analysis_001", "analysis_seq_000000000000", "struct_001"])
+def test_unknown_analysis_is_404(client, auth, analysis_id):
+    assert client.get(f"{GENETICS}/analysis/{analysis_id}", headers=auth()).status_code == 404
+
+
+def test_other_users_analysis_is_404(client, auth, sequence_id, thread_pool):
+    client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="owner"))
+    response = client.get(f"{GENETICS}/analysis/analysis_{sequence_id}", headers=auth(sub="someone-else"))
+    assert response.status_code == 404
+    assert client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="someone-else")).status_code == 404
+
+
+def test_failed_analysis_is_reported(client, auth, thread_pool):
+    upload = client.post(
+        f"{GENETICS}/sequence/upload",
+        files={"file": ("broken.vcf", b"not a vcf\n", "text/plain")},
+        headers=auth(sub="owner"),
+    )
+    sequence_id = upload.json()["sequence_id"]
+    client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="owner"))
+    response = client.get(f"{GENETICS}/analysis/analysis_{sequence_id}", headers=auth(sub="owner"))
+    assert response.status_code == 422
+
+
+def test_cached_analysis_is_not_served_to_other_users(client, auth, sequence_id, thread_pool):
+    client.post(f"{GENETICS}/analyze?sequence_id={sequence_id}", headers=auth(sub="owner"))
+    path = f"{GENETICS}/analysis/analysis_{sequence_id}"
+    assert client.get(path, headers=auth(sub="owner")).status_code == 200  # now cached
+    assert client.get(path, headers=auth(sub="someone-else")).status_code == 404
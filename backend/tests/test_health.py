@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.core import health
+from app.core.config import settings
+from app.core.health import HealthMonitor
+
+
+async def ok():
+    return {"status": "ok"}
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    monkeypatch.setattr(health, "_queues", {})
+    monkeypatch.setattr(health, "_running", {})
+    for name in ("_probe_database", "_probe_redis", "_probe_models"):
+        monkeypatch.setattr(health, name, ok)
+    return monkeypatch
+
+
+def probed(monitor: HealthMonitor) -> HealthMonitor:
+    asyncio.run(monitor.probe())
+    return monitor
+
+
+def test_not_ready_until_probed(probes):
+    monitor = HealthMonitor()
+    assert monitor.readiness() == (False, ["health probes have not run yet"])
+    assert probed(monitor).readiness() == (True, [])
+    assert monitor.checks["database"]["latency_ms"] >= 0
+
+
+def test_failed_and_slow_probes_are_unavailable(probes):
+    async def down():
+        raise ConnectionRefusedError("connection refused")
+
+    async def hung():
+        await asyncio.sleep(1)
+
+    probes.setattr(health, "_probe_database", down)
+    probes.setattr(health, "_probe_redis", hung)
+    probes.setattr(settings, "HEALTH_PROBE_TIMEOUT_SECONDS", 0.01)
+    monitor = probed(HealthMonitor())
+    assert monitor.checks["database"]["status"] == "unavailable"
+    assert monitor.checks["database"]["error"] == "connection refused"
+    assert monitor.checks["redis"]["error"] == "probe timed out"
+    assert monitor.readiness() == (False, ["database unavailable"])
+
+
+def test_saturation_makes_the_worker_not_ready(probes):
+    monitor = probed(HealthMonitor())
+    health.register_queue("genetics", lambda: settings.READY_MAX_QUEUE_DEPTH, 100)
+    monitor.loop_lag.record(2 * settings.READY_MAX_LOOP_LAG_MS / 1000)
+    monitor.pool_wait = {"max_wait": 0.0, "timeouts": 3}
+    ready, reasons = monitor.readiness()
+    assert not ready
+    assert reasons[0].startswith("event loop lag")
+    assert reasons[1:] == [f"genetics queue depth {settings.READY_MAX_QUEUE_DEPTH}", "3 database pool timeouts"]
+
+
+def test_ready_endpoint_answers_from_the_last_probe(client, probes):
+    probes.setattr(health.monitor, "checks", {"database": {"status": "ok"}, "redis": {"status": "disabled"}})
+    probes.setattr(health.monitor, "checked_at", 1.0)
+    response = client.get("/api/v1/health/ready")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+
+    probes.setattr(health.monitor, "checks", {"database": {"status": "unavailable"}, "redis": {"status": "disabled"}})
+    response = client.get("/api/v1/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "not_ready", "reasons": ["database unavailable"]}
+    assert client.get("/api/v1/health/detailed").json()["status"] == "degraded"
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.api.endpoints import iot
+from app.services.iot import segments
+
+
+def make_columns(rows: int) -> dict:
+    columns = {"timestamp": 1_700_000_000_000 + 10 * np.arange(rows, dtype=np.int64)}
+    for n, name in enumerate(segments.COLUMNS):
+        columns[name] = (np.arange(rows) + n).astype(np.float32)
+    columns["spo2"][::2] = np.nan  # missing in every other reading
+    return columns
+
+
+def test_segment_round_trip(tmp_path):
+    columns = make_columns(1000)
+    path = tmp_path / "s.seg"
+    segments.write_segment(path, "s", columns)
+    decoded = segments.read_columns(path)
+    np.testing.assert_array_equal(decoded["timestamp"], columns["timestamp"])
+    for name in segments.COLUMNS:
+        np.testing.assert_array_equal(decoded[name], columns[name])
+
+
+def test_range_scan_decodes_only_the_requested_window(tmp_path):
+    columns = make_columns(100)
+    path = tmp_path / "s.seg"
+    segments.write_segment(path, "s", columns)
+    start, end = int(columns["timestamp"][10]), int(columns["timestamp"][19])
+    window = segments.read_columns(path, ["heart_rate"], start, end)
+    assert set(window) == {"timestamp", "heart_rate"}
+    np.testing.assert_array_equal(window["heart_rate"], columns["heart_rate"][10:20])
+
+
+def test_header_answers_summaries(tmp_path):
+    path = tmp_path / "s.seg"
+    segments.write_segment(path, "s", make_columns(10))
+    stats = segments.stats(segments.read_header(path))
+    assert stats["heart_rate"] == {"count": 10, "sum": 45.0, "min": 0.0, "max": 9.0}
+    assert stats["spo2"]["count"] == 5
+    assert segments.stats(segments.read_header(tmp_path / "missing.seg")) == segments.empty_stats()
+
+
+def test_large_gaps_and_single_rows(tmp_path):
+    columns = make_columns(3)
+    columns["timestamp"][2] += 2 ** 32  # needs 64-bit deltas
+    for rows, data in ((3, columns), (1, make_columns(1))):
+        path = tmp_path / f"{rows}.seg"
+        segments.write_segment(path, "s", data)
+        np.testing.assert_array_equal(segments.read_columns(path)["timestamp"], data["timestamp"])
+
+
+def test_merge_stats_skips_empty_tiers():
+    hot = {"stress_level": {"count": 2, "sum": 10.0, "min": 4.0, "max": 6.0}}
+    cold = {"stress_level": {"count": 0, "sum": 0.0, "min": None, "max": None}}
+    assert segments.merge_stats(cold, hot) == hot
+
+
+@pytest.fixture
+def session(no_db, monkeypatch):
+    stored = []
+
+    async def add_readings(conn, session_id, patient_id, readings):
+        stored.extend(readings)
+        return session_id == "active"
+
+    async def session_stats(conn, session_id, patient_id):
+        return {"stress_level": {"count": 2, "sum": 80.0, "min": 30.0, "max": 50.0}}
+
+    monkeypatch.setattr(iot.iot_db, "add_readings", add_readings)
+    monkeypatch.setattr(iot.iot_tiering, "session_stats", session_stats)
+    return stored
+
+
+def test_websocket_reports_the_session_mean_stress(client, auth, session):
+    path = "/api/v1/services/iot/ws/active?token=" + auth()["Authorization"].split()[1]
+    with client.websocket_connect(path) as websocket:
+        websocket.send_json({"type": "ppg", "heart_rate": 70, "stress_level": 70.0})
+        assert websocket.receive_json()["stress_level"] == 50.0
+        websocket.send_json({"type": "imu", "acceleration": {"x": 0.1, "y": 0.0, "z": 9.8}})
+        assert websocket.receive_json()["stress_level"] == 50.0
+    assert len(session) == 2
+
+
+def test_websocket_stress_is_null_without_readings(client, auth, session, monkeypatch):
+    async def session_stats(conn, session_id, patient_id):
+        return {"stress_level": {"count": 0, "sum": 0.0, "min": None, "max": None}}
+
+    monkeypatch.setattr(iot.iot_tiering, "session_stats", session_stats)
+    path = "/api/v1/services/iot/ws/active?token=" + auth()["Authorization"].split()[1]
+    with client.websocket_connect(path) as websocket:
+        websocket.send_json({"type": "emg", "muscle_activity": 12.0})
+        assert websocket.receive_json()["stress_level"] is None
@@ -0,0 +1,37 @@
+import pytest
+
+from app import main
+from app.core.config import settings
+from app.core.metrics import Registry
+
+
+def test_metrics_are_hidden_from_remote_clients(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_are_served_to_loopback_clients(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    monkeypatch.setattr(main, "LOOPBACK_HOSTS", {"testclient"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "http_requests_in_flight" in response.text
+
+
+@pytest.mark.parametrize("header, code", [(None, 404), ("Bearer wrong", 404), ("Bearer s3cret", 200)])
+def test_metrics_token(client, monkeypatch, header, code):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "LOOPBACK_HOSTS", {"testclient"})  # the token is required even locally
+    headers = {"Authorization": header} if header else {}
+    assert client.get("/metrics", headers=headers).status_code == code
+
+
+def test_registry_renders_labelled_samples():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs run", ("queue",))
+    counter.inc("genetics")
+    counter.inc("genetics", amount=2)
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{queue="genetics",pid="' in text
+    assert text.rstrip().endswith(" 3")
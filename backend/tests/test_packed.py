@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.genetics import packed
+from app.services.genetics.packed import PackedSequence, decode_kmer
+
+
+@pytest.fixture
+def sequence() -> str:
+    rng = random.Random(7)
+    bases = [rng.choice("ACGT") for _ in range(1001)]
+    bases[10:14] = "NNNN"
+    bases[500] = "R"
+    bases[777] = "a"  # lowercase is read as A
+    return "".join(bases)
+
+
+def test_round_trip(sequence):
+    seq = PackedSequence.from_string(sequence)
+    assert seq.fetch() == sequence.upper()
+    assert seq[8:16] == sequence[8:16]
+    assert seq[-1] == sequence[-1]
+    assert seq.nbytes < len(sequence) // 2
+
+
+def test_saved_file_is_memory_mapped(sequence, tmp_path):
+    path = tmp_path / "seq.2bit"
+    PackedSequence.from_string(sequence).save(path)
+    opened = PackedSequence.open(path)
+    assert isinstance(opened.packed, np.memmap)
+    assert len(opened) == len(sequence)
+    assert opened.fetch(495, 505) == sequence[495:505]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not.2bit"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        PackedSequence.open(path)
+
+
+def test_rna_and_reverse_complement():
+    rna = PackedSequence.from_string("AUGGCU")
+    assert rna.rna and rna.fetch() == "AUGGCU"
+    assert rna.reverse_complement() == "AGCCAU"
+    assert PackedSequence.from_string("AACGN").reverse_complement() == "NCGTT"
+
+
+def test_kmer_counts_skip_ambiguous_windows(sequence, monkeypatch):
+    monkeypatch.setattr(packed, "KMER_BLOCK", 64)  # exercise block edges
+    seq = PackedSequence.from_string(sequence)
+    counts = seq.kmer_counts(3)
+    upper = sequence.upper()
+    expected = {}
+    for i in range(len(upper) - 2):
+        window = upper[i: i + 3]
+        if set(window) <= set("ACGT"):
+            expected[window] = expected.get(window, 0) + 1
+    assert {decode_kmer(i, 3): int(n) for i, n in enumerate(counts) if n} == expected
+
+
+def test_invalid_k_and_region():
+    seq = PackedSequence.from_string("ACGT")
+    with pytest.raises(ValueError):
+        seq.kmer_counts(packed.MAX_KMER + 1)
+    with pytest.raises(IndexError):
+        seq.fetch(3, 1)
+    with pytest.raises(IndexError):
+        seq[4]
@@ -0,0 +1,97 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api import pagination
+from app.api.endpoints import ct_mri
+from app.db import pagination as keyset
+from app.db.tables import analyses
+
+HISTORY = "/api/v1/services/ct-mri/history"
+NOW = datetime(2026, 10, 1, 12, 0, 0, 123456)
+
+
+def row(number: int) -> dict:
+    return {
+        "id": f"a{number:03}",
+        "created_at": NOW - timedelta(minutes=number),
+        "input_data": {"scan_type": "MRI"},
+        "result": {},
+        "status": "COMPLETED",
+    }
+
+
+def test_cursor_round_trip():
+    cursor = keyset.encode_cursor({"created_at": NOW, "id": "cm|x"})
+    assert "=" not in cursor
+    assert keyset.decode_cursor(cursor) == (NOW, "cm|x")
+    assert keyset.decode_cursor(None) == keyset.START
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm8tc2VwYXJhdG9y", "//79"])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        keyset.decode_cursor(cursor)
+
+
+def test_split_page():
+    rows = [row(n) for n in range(3)]
+    assert keyset.split_page(rows, 3) == (rows, None)
+    page, next_cursor = keyset.split_page(rows, 2)
+    assert page == rows[:2]
+    assert keyset.decode_cursor(next_cursor) == (rows[1]["created_at"], "a001")
+
+
+def test_keyset_predicate_compares_the_pair():
+    sql = str(keyset.before_cursor(analyses).compile(dialect=postgresql.dialect()))
+    assert sql == '(analyses."createdAt", analyses.id) < (%(cursor_created_at)s, %(cursor_id)s)'
+
+
+@pytest.fixture
+def history(no_db, monkeypatch):
+    rows = [row(n) for n in range(5)]
+
+    async def list_analyses(conn, patient_id, service_type, limit, cursor):
+        below = [r for r in rows if (r["created_at"], r["id"]) < cursor]
+        return keyset.split_page(below[: limit + 1], limit)
+
+    async def stream_analyses(conn, patient_id, service_type, cursor):
+        for r in rows:
+            if (r["created_at"], r["id"]) < cursor:
+                yield r
+
+    @asynccontextmanager
+    async def transaction():
+        yield None
+
+    monkeypatch.setattr(ct_mri.analyses_db, "list_analyses", list_analyses)
+    monkeypatch.setattr(ct_mri.analyses_db, "stream_analyses", stream_analyses)
+    monkeypatch.setattr(pagination, "transaction", transaction)
+    monkeypatch.setattr(pagination, "EXPORT_BATCH_ROWS", 2)
+
+
+def test_history_pages_follow_the_next_cursor_header(client, auth, history):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(HISTORY, params=params, headers=auth())
+        assert response.status_code == 200
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert ids == [f"a{n:03}" for n in range(5)]
+
+
+def test_history_ndjson_export(client, auth, history):
+    response = client.get(HISTORY, params={"format": "ndjson"}, headers=auth())
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [f"a{n:03}" for n in range(5)]
+
+
+def test_history_rejects_a_bad_cursor(client, auth, history):
+    assert client.get(HISTORY, params={"cursor": "!!"}, headers=auth()).status_code == 400
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core import profiling
+from app.core.profiling import SlowCallbackDetector
+
+
+def spin_in_worker(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_collapses_stacks_per_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin_in_worker, args=(stop,), name="busy worker")
+    worker.start()
+    try:
+        stacks, rounds = profiling.sample(0.05, 0.005, worker.ident)
+    finally:
+        stop.set()
+        worker.join()
+    assert rounds > 1
+    assert sum(stacks.values()) == rounds
+    stack = next(iter(stacks))
+    assert stack.startswith("busy_worker;") and "test_profiling:spin_in_worker" in stack
+
+
+def test_one_profile_at_a_time():
+    with profiling._profiling:
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.sample(0.01, 0.005)
+
+
+def block_the_loop() -> None:
+    time.sleep(0.2)
+
+
+def test_detector_reports_a_blocking_callback(capsys):
+    detector = SlowCallbackDetector(threshold=0.05, depth=20)
+
+    async def main():
+        detector.start()
+        await asyncio.sleep(0.05)
+        block_the_loop()
+        await asyncio.sleep(0.1)
+        detector.stop()
+
+    asyncio.run(main())
+    [stall] = detector.snapshot()["recent"]
+    assert stall["duration_ms"] >= 150
+    assert stall["route"] == "-"
+    assert any("block_the_loop" in line for line in stall["stack"])
+    assert "Event loop blocked" in capsys.readouterr().out
+
+
+def test_profile_endpoint_is_admin_only(client, auth):
+    url = "/api/v1/admin/profile/cpu?seconds=0.02&interval_ms=5"
+    assert client.get(url, headers=auth()).status_code == 403
+    response = client.get(url, headers=auth(role="ADMIN", pid=None))
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-rounds"]) >= 1
+    assert client.get("/api/v1/admin/profile/slow-callbacks", headers=auth(role="ADMIN", pid=None)).status_code == 200
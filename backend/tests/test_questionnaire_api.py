@@ -0,0 +1,75 @@
+import pytest
+
+from app.api.endpoints import questionnaire
+
+RESCORE = "/api/v1/services/questionnaire/rescore/stored"
+
+
+def stored_row(number: int, answer: int = 2) -> dict:
+    return {
+        "id": f"r{number:03}",
+        "patient_id": "patient-1",
+        "questionnaire_id": "stress_pss10",
+        "answers": {f"q{i}": answer for i in range(1, 11)},
+    }
+
+
+@pytest.fixture
+def stored(no_db, monkeypatch):
+    rows = [stored_row(number) for number in range(5)] + [{**stored_row(5), "answers": {"q1": 1}}]
+    updated = []
+
+    async def list_for_rescore(conn, questionnaire_id, after_id, limit):
+        return [row for row in rows if row["id"] > after_id][:limit]
+
+    async def update_scores(conn, scored):
+        updated.extend(scored)
+
+    monkeypatch.setattr(questionnaire.questionnaires_db, "list_for_rescore", list_for_rescore)
+    monkeypatch.setattr(questionnaire.questionnaires_db, "update_scores", update_scores)
+    return updated
+
+
+def test_rescore_stored_pages_through_results(client, auth, stored):
+    admin = auth(role="ADMIN", pid=None)
+    after, pages = None, []
+    while True:
+        page = client.post(RESCORE, json={"questionnaire_id": "stress_pss10", "limit": 4, "after": after}, headers=admin)
+        assert page.status_code == 200
+        pages.append(page.json())
+        after = page.json()["next_after"]
+        if after is None:
+            break
+
+    assert [page["rescored"] for page in pages] == [4, 1]
+    assert [failure["id"] for failure in pages[-1]["failed"]] == ["r005"]
+    assert [result_id for result_id, _ in stored] == ["r000", "r001", "r002", "r003", "r004"]
+    assert stored[0][1]["scores"]["total_score"] == 20
+
+
+@pytest.mark.parametrize("role", ["PATIENT", "DOCTOR"])
+def test_rescore_stored_is_admin_only(client, auth, stored, role):
+    response = client.post(RESCORE, json={"questionnaire_id": "stress_pss10"}, headers=auth(role=role))
+    assert response.status_code == 403
+
+
+def test_rescore_stored_is_bounded(client, auth, stored, monkeypatch):
+    monkeypatch.setattr(questionnaire.settings, "QUESTIONNAIRE_RESCORE_MAX_SUBMISSIONS", 10)
+    response = client.post(
+        RESCORE, json={"questionnaire_id": "stress_pss10", "limit": 11}, headers=auth(role="ADMIN", pid=None)
+    )
+    assert response.status_code == 400
+
+
+def test_history_percentile_follows_current_norms():
+    row = {
+        **stored_row(0),
+        "total_score": 20,
+        "category": "moderate",
+        "percentile": 1.0,  # scored against older norms
+        "insights": [],
+        "recommendations": [],
+        "created_at": "2026-01-01T00:00:00",
+    }
+    [result] = questionnaire._stored_results([row])
+    assert result.scores["percentile"] != 1.0
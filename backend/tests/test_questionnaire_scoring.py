@@ -0,0 +1,26 @@
+import pytest
+
+from app.services.questionnaire.scoring import get_spec
+
+
+def psqi_answers(hours_asleep: float, minutes_to_sleep: float = 10) -> list:
+    answers = {f"q{i}": 0 for i in range(4, 18)}
+    answers.update(q1=10, q2=minutes_to_sleep, q3=hours_asleep)
+    return list(answers.items())
+
+
+@pytest.mark.parametrize(
+    "hours, expected",
+    [(4.5, 3), (5, 2), (5.5, 2), (6, 1), (6.5, 1), (7, 1), (7.5, 0), (8, 0)],
+)
+def test_psqi_sleep_duration_component(hours, expected):
+    [result] = get_spec("sleep_psqi").score([psqi_answers(hours)])
+    assert result["scores"]["sleep_duration"] == expected
+
+
+@pytest.mark.parametrize("minutes, expected", [(15, 0), (16, 1), (30, 1), (31, 1), (60, 1), (61, 2)])
+def test_psqi_sleep_latency_component(minutes, expected):
+    # One "right" flag keeps np.digitize semantics: minutes score 0-3 on right-closed
+    # bins, and their sum with item 5a (0 here) is binned again
+    [result] = get_spec("sleep_psqi").score([psqi_answers(8, minutes)])
+    assert result["scores"]["sleep_latency"] == expected
@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.genetics import repeats
+from app.services.genetics.packed import PackedSequence
+
+
+def test_scan_reads_finds_runs_per_read():
+    reads = ["TT" + "CAG" * 5 + "TT", "cagcag", "GG" + "CAG" * 40]
+    runs = repeats.scan_reads(reads, "CAG", min_repeats=3)
+    assert [(run.read, run.start, run.repeats) for run in runs] == [(0, 2, 5), (2, 2, 40)]
+    assert repeats.longest_per_read(runs, 3).tolist() == [5, 0, 40]
+
+
+def test_runs_do_not_span_reads():
+    runs = repeats.scan_reads(["CAGCAG", "CAGCAG"], "CAG", min_repeats=3)
+    assert runs == []
+
+
+def test_both_strands():
+    runs = repeats.scan_reads(["CTG" * 4], "CAG", min_repeats=3, both_strands=True)
+    assert [(run.motif, run.repeats) for run in runs] == [("CTG", 4)]
+
+
+def test_invalid_motif():
+    with pytest.raises(ValueError):
+        repeats.scan_reads(["ACGT"], "CAGN")
+
+
+def test_packed_scan_merges_runs_across_chunks(monkeypatch):
+    monkeypatch.setattr(repeats, "PACKED_CHUNK", 16)
+    sequence = "A" * 7 + "CAG" * 12 + "T" * 9 + "CAG" * 3 + "GG" + "CAG" * 2
+    runs = repeats.scan_packed(PackedSequence.from_string(sequence), "CAG", min_repeats=3)
+    assert [(run.start, run.repeats) for run in runs] == [(7, 12), (52, 3)]
+
+
+@pytest.mark.parametrize("count, label", [(20, "normal"), (30, "intermediate"), (38, "reduced_penetrance"), (45, "full_penetrance")])
+def test_htt_classes(count, label):
+    assert repeats.classify_htt_cag(count) == label
@@ -0,0 +1,72 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app import serve
+from app.core import model_store
+from app.core.config import settings
+
+
+def test_logged_out_token_is_rejected(client, auth):
+    headers = auth()
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 401
+
+
+def test_several_workers_share_revocations_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_REVOCATION_REDIS", None)
+    serve._share_revocations(4)
+    assert settings.AUTH_REVOCATION_REDIS is True
+
+
+def test_several_workers_refuse_local_revocation(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_REVOCATION_REDIS", False)
+    with pytest.raises(SystemExit):
+        serve._share_revocations(2)
+
+
+def test_single_worker_keeps_local_revocation(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_REVOCATION_REDIS", None)
+    serve._share_revocations(1)
+    assert not settings.AUTH_REVOCATION_REDIS
+
+
+@pytest.mark.parametrize(
+    "workers, pool, overflow, expected",
+    [(4, 10, 10, (10, 10)), (8, 10, 10, (6, 6)), (16, 20, 0, (6, 0)), (200, 10, 10, (1, 0))],
+)
+def test_db_connections_are_split_between_workers(monkeypatch, workers, pool, overflow, expected):
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 100)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", pool)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", overflow)
+    serve._share_db_pool(workers)
+    assert (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW) == expected
+
+
+def test_preloaded_models_are_shared(tmp_path, monkeypatch):
+    (tmp_path / "ct_mri").mkdir()
+    np.save(tmp_path / "ct_mri" / "encoder.npy", np.arange(8, dtype=np.float32))
+    (tmp_path / "labels.json").write_text('["a", "b"]')
+    monkeypatch.setattr(settings, "MODEL_PATH", str(tmp_path))
+    monkeypatch.setattr(model_store, "_models", {})
+
+    assert model_store.preload() == {"models": 2, "bytes": 32}
+    assert model_store.get("ct_mri/encoder") is model_store.get("ct_mri/encoder")
+    assert model_store.get("labels") == ["a", "b"]
+    with pytest.raises(KeyError):
+        model_store.get("missing")
+
+
+def test_worker_dying_at_start_is_respawned_with_backoff():
+    master = serve.Master(None, None, 1, None, "info")
+    pid = os.fork()
+    if pid == 0:
+        os._exit(3)
+    master.workers[pid], master.started[pid] = 0, time.monotonic()
+    os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+    master.reap()
+    assert master.workers == {}
+    assert master.delays[0] == 1.0
+    assert master.respawn[0] > time.monotonic()
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.genetics import structures
+from app.services.genetics.structures import PredictionScheduler, StructureCache, StubPredictor
+
+SEQUENCE = "MKTAYIAKQRQISFVKSHFSRQ"
+
+
+def make_scheduler(directory, **predictors) -> PredictionScheduler:
+    return PredictionScheduler(StructureCache(directory, 10 ** 7), predictors or {"esmfold": StubPredictor()})
+
+
+def test_concurrent_requests_share_one_prediction(tmp_path):
+    predictor = StubPredictor(delay_seconds=0.01)
+    scheduler = make_scheduler(tmp_path, esmfold=predictor)
+
+    async def main():
+        submitted = await asyncio.gather(*(scheduler.submit(SEQUENCE, "esmfold") for _ in range(5)))
+        record = await scheduler.predict(SEQUENCE, "esmfold")
+        return submitted, record
+
+    submitted, record = asyncio.run(main())
+    assert {key for key, _ in submitted} == {record.prediction_id}
+    assert predictor.calls == 1
+    assert record.length == len(SEQUENCE)
+
+
+def test_completed_structure_is_seen_by_every_scheduler(tmp_path):
+    first, second = make_scheduler(tmp_path), make_scheduler(tmp_path)
+    record = asyncio.run(first.predict(SEQUENCE, "esmfold"))
+    assert second.status(record.prediction_id) == "completed"
+    assert asyncio.run(second.submit(SEQUENCE.lower(), "esmfold")) == (record.prediction_id, "completed")
+
+
+def test_sequence_is_validated(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.submit("NOT A PROTEIN 123", "esmfold"))
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        structures.build_predictor("alphafold", "alphafold_local")
+
+
+@pytest.fixture
+def stub_scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROTEIN_PREDICTOR_BACKENDS", {"esmfold": "stub"})
+    monkeypatch.setattr(settings, "PROTEIN_CACHE_PATH", str(tmp_path / "structures"))
+    monkeypatch.setattr(structures, "_scheduler", None)
+
+
+def test_predict_defaults_to_a_configured_method(client, auth, stub_scheduler):
+    response = client.post(f"/api/v1/services/genetics/protein/predict?sequence={SEQUENCE}", headers=auth())
+    assert response.status_code == 200
+    assert response.json()["method"] == "esmfold"
+
+
+def test_predict_rejects_unconfigured_method(client, auth, stub_scheduler):
+    response = client.post(
+        f"/api/v1/services/genetics/protein/predict?sequence={SEQUENCE}&method=alphafold", headers=auth()
+    )
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def stored(stub_scheduler) -> str:
+    return asyncio.run(structures.get_scheduler().predict(SEQUENCE, "esmfold")).prediction_id
+
+
+def test_structure_is_sent_compressed_with_revalidation(client, auth, stored):
+    url = f"/api/v1/services/genetics/protein/{stored}/structure"
+    response = client.get(url, headers={**auth(), "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "ATOM" in response.text
+    etag = response.headers["etag"]
+    cached = client.get(url, headers={**auth(), "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+def test_structure_is_decompressed_for_identity_clients(client, auth, stored):
+    url = f"/api/v1/services/genetics/protein/{stored}/structure"
+    response = client.get(url, headers={**auth(), "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert "ATOM" in response.text
+    assert response.headers["etag"].endswith('-pdb"')
+    # The compressed representation's tag does not validate the plain one
+    gz_tag = response.headers["etag"][:-1] + '-gz"'
+    assert client.get(url, headers={**auth(), "Accept-Encoding": "identity", "If-None-Match": gz_tag}).status_code == 200
+    assert client.get(
+        url, headers={**auth(), "Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]}
+    ).status_code == 304
+
+
+def test_structure_download_errors(client, auth, stored):
+    assert client.get(f"/api/v1/services/genetics/protein/{stored}/structure?format=cif", headers=auth()).status_code == 406
+    assert client.get("/api/v1/services/genetics/protein/missing/structure", headers=auth()).status_code == 404
+
+
+def test_cache_evicts_least_recently_used_structures(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    first = asyncio.run(scheduler.predict(SEQUENCE, "esmfold"))
+    size = scheduler.cache.size_bytes
+    scheduler.cache.max_bytes = size + size // 2
+    second = asyncio.run(scheduler.predict(SEQUENCE[::-1], "esmfold"))
+    assert not scheduler.cache.contains(first.prediction_id)
+    assert scheduler.cache.contains(second.prediction_id)
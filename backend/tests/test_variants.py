@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+from app.services.genetics import risk
+from app.services.genetics.parsers import VcfRecord, parse_vcf
+from app.services.genetics.variants import VariantIndex
+
+E4 = ("19", 44908684, "rs429358", "T", "C")
+E2 = ("19", 44908822, "rs7412", "C", "T")
+
+
+def record(chrom, pos, rsid=".", ref="A", alt="G", genotype="0/1") -> VcfRecord:
+    return VcfRecord(chrom, pos, rsid, ref, (alt,), None, "PASS", ".", genotype)
+
+
+def apoe(e4_gt, e2_gt) -> VariantIndex:
+    records = []
+    if e4_gt:
+        records.append(record(*E4, genotype=e4_gt))
+    if e2_gt:
+        records.append(record(*E2, genotype=e2_gt))
+    return VariantIndex.build(records)
+
+
+@pytest.fixture
+def index() -> VariantIndex:
+    return VariantIndex.build([
+        record("chr1", 300),
+        record("1", 100, ref="ACGTACGTAC"),  # spans 100-109
+        record("1", 200),
+        record("chrX", 50),
+    ])
+
+
+def test_region_uses_binary_search_over_sorted_positions(index):
+    assert [v["pos"] for v in index.region("1", 1, 1000)] == [100, 200, 300]
+    assert [v["pos"] for v in index.region("chr1", 105, 105)] == [100]  # overlapping deletion
+    assert index.region("1", 110, 199) == []
+    assert index.region("2", 1, 1000) == []
+    assert [v["pos"] for v in index.region("1", 1, 1000, limit=2)] == [100, 200]
+    assert index.count("X", 1, 100) == 1
+    assert len(index) == 4
+
+
+def test_saved_index_loads_memory_mapped(index, tmp_path):
+    index.save(tmp_path / "index")
+    loaded = VariantIndex.load(tmp_path / "index")
+    assert loaded.region("1", 1, 1000) == index.region("1", 1, 1000)
+    assert loaded.region("X", 50, 50)[0]["genotype"] == "0/1"
+
+
+def test_parsed_vcf_keeps_the_first_sample_genotype():
+    vcf = (
+        b"##fileformat=VCFv4.2\n"
+        b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\tS2\n"
+        b"19\t44908684\trs429358\tT\tC\t50\tPASS\t.\tGT:DP\t1|1:30\t0/0:20\n"
+    )
+    [parsed] = parse_vcf(io.BytesIO(vcf))
+    assert parsed.genotype == "1|1"
+
+
+@pytest.mark.parametrize(
+    "e4_gt, e2_gt, genotype",
+    [
+        ("0/0", "0/0", "ε3/ε3"),
+        ("0/1", "0/0", "ε3/ε4"),
+        ("1/1", "0/0", "ε4/ε4"),
+        ("0/1", "0/1", "ε2/ε4"),
+        ("0/0", "1|1", "ε2/ε2"),
+        ("0/1", None, None),  # rs7412 not genotyped
+        ("./.", "0/0", None),
+        ("1/1", "1/1", None),  # more than two alleles
+    ],
+)
+def test_apoe_genotype_needs_both_sites(e4_gt, e2_gt, genotype):
+    assert risk.apoe_genotype(apoe(e4_gt, e2_gt)) == genotype
+
+
+def test_annotate_reports_the_apoe_genotype():
+    [factor] = risk.annotate(apoe("0/1", "0/0"))
+    assert factor["variant"] == "ε3/ε4"
+    assert factor["risk_level"] == "elevated"
+    assert risk.annotate(apoe("0/0", "0/0")) == []
+
+
+def test_risk_gene_counts_cover_every_gene():
+    index = VariantIndex.build([record("4", 89800000), record("4", 3100000), record("19", 44908684)])
+    counts = {entry["gene"]: entry["variants"] for entry in risk.gene_variant_counts(index)}
+    assert counts == {"APOE": 1, "SNCA": 1, "HTT": 1}